@@ -8,3 +8,16 @@
 #     'password': LAYMAN_PG_PASSWORD,
 # }
 PG_CONN = {}
+
+# It's expected to be set from another module
+# Example:
+# PG_POOL = {
+#     'size': LAYMAN_PG_POOL_SIZE,
+#     'max_overflow': LAYMAN_PG_POOL_MAX_OVERFLOW,
+#     'timeout': LAYMAN_PG_POOL_TIMEOUT,
+# }
+PG_POOL = {
+    'size': 5,
+    'max_overflow': 10,
+    'timeout': 30,
+}
@@ -12,3 +12,52 @@ from . import util
 ])
 def test_to_tsquery_string(input_string, exp_result):
     assert util.to_tsquery_string(input_string) == exp_result
+
+
+def test_connection_pool():
+    from layman import settings
+    from .pool import ConnectionPool
+    from .error import Error
+
+    pool = ConnectionPool(settings.PG_CONN, size=1, max_overflow=1, timeout=0)
+    conn1 = pool.getconn()
+    conn2 = pool.getconn()
+    stats = pool.get_stats()
+    assert stats['in_use'] == 2
+    assert stats['overflow'] == 1
+    assert stats['overflows'] == 1
+
+    with pytest.raises(Error):
+        pool.getconn()
+    assert pool.get_stats()['timeouts'] == 1
+
+    pool.putconn(conn2)
+    assert conn2.closed
+    pool.putconn(conn1)
+    assert not conn1.closed
+    stats = pool.get_stats()
+    assert (stats['in_use'], stats['idle']) == (0, 1)
+
+    assert pool.getconn() is conn1
+    pool.closeall()
+    assert conn1.closed
+
+
+def test_iter_query():
+    from layman import settings
+    from .pool import ConnectionPool
+
+    pool = ConnectionPool(settings.PG_CONN, size=1, max_overflow=0, timeout=0)
+    conn = pool.getconn()
+    conn_cur = (conn, conn.cursor())
+    rows = util.iter_query('select i from generate_series(1, 2500) i', conn_cur=conn_cur, itersize=1000)
+    assert [row[0] for row in rows] == list(range(1, 2501))
+    assert conn.autocommit
+
+    rows = util.iter_query('select i from generate_series(1, 2500) i', conn_cur=conn_cur, itersize=1000)
+    assert next(rows) == (1, )
+    rows.close()
+    assert conn.autocommit
+    assert util.run_query('select 1', conn_cur=conn_cur) == [(1, )]
+    pool.putconn(conn)
+    pool.closeall()
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+import psycopg2
+
+from .error import Error
+
+logger = logging.getLogger(__name__)
+
+
+def create_connection(conn_params):
+    try:
+        connection = psycopg2.connect(**conn_params)
+        connection.set_session(autocommit=True)
+    except BaseException as exc:
+        raise Error(1) from exc
+    return connection
+
+
+class ConnectionPool:  # pylint: disable=too-many-instance-attributes
+    """Thread-safe pool of autocommit connections.
+
+    Up to `size` connections are kept open and reused. If all of them are in use, up to `max_overflow`
+    additional connections are opened and closed again when returned. If even these are exhausted,
+    checkout waits at most `timeout` seconds for a returned connection.
+    """
+
+    def __init__(self, conn_params, size, max_overflow, timeout):
+        assert size >= 1 and max_overflow >= 0 and timeout >= 0
+        self._conn_params = conn_params
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self._idle = []
+        self._in_use = set()
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'overflows': 0,
+            'timeouts': 0,
+        }
+
+    def getconn(self):
+        with self._condition:
+            wait_start = None
+            while True:
+                while self._idle:
+                    connection = self._idle.pop()
+                    if not connection.closed:
+                        break
+                else:
+                    connection = None
+                if connection is not None or len(self._in_use) < self.size + self.max_overflow:
+                    break
+                if wait_start is None:
+                    wait_start = time.monotonic()
+                    self._stats['waits'] += 1
+                remaining = self.timeout - (time.monotonic() - wait_start)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise Error(1, data={'reason': 'Connection pool exhausted',
+                                         'timeout': self.timeout,
+                                         'in_use': len(self._in_use),
+                                         })
+                self._condition.wait(remaining)
+
+            if wait_start is not None:
+                wait_time = time.monotonic() - wait_start
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+            if connection is None and len(self._in_use) >= self.size:
+                self._stats['overflows'] += 1
+            self._stats['checkouts'] += 1
+            # reserve the slot before connecting, so that concurrent checkouts respect the limit
+            placeholder = object()
+            self._in_use.add(connection or placeholder)
+
+        if connection is None:
+            try:
+                connection = create_connection(self._conn_params)
+            finally:
+                with self._condition:
+                    self._in_use.discard(placeholder)
+                    if connection is not None:
+                        self._in_use.add(connection)
+                    self._condition.notify()
+        return connection
+
+    def putconn(self, connection):
+        with self._condition:
+            if connection not in self._in_use:
+                return
+            self._in_use.discard(connection)
+            keep = not connection.closed and len(self._idle) + len(self._in_use) < self.size
+            if keep:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    keep = False
+            if keep:
+                self._idle.append(connection)
+            elif not connection.closed:
+                connection.close()
+            self._condition.notify()
+
+    def closeall(self):
+        with self._condition:
+            for connection in self._idle + [c for c in self._in_use if hasattr(c, 'close')]:
+                if not connection.closed:
+                    connection.close()
+            self._idle = []
+            self._in_use = set()
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            result = dict(self._stats)
+            result.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'overflow': max(len(self._in_use) - self.size, 0),
+            })
+        return result
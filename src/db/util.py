@@ -1,22 +1,41 @@
 import logging
+import os
 import re
-import psycopg2
+import threading
+import uuid
 from flask import g
 
-from . import PG_CONN
+from . import PG_CONN, PG_POOL
 from .error import Error
+from .pool import ConnectionPool, create_connection
 
 logger = logging.getLogger(__name__)
 
 FLASK_CONN_CUR_KEY = f'{__name__}:CONN_CUR'
 
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool():
+    global _POOL, _POOL_PID
+    # connections must not be shared between forked processes (gunicorn and celery workers)
+    pid = os.getpid()
+    if _POOL is None or _POOL_PID != pid:
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != pid:
+                _POOL = ConnectionPool(PG_CONN, **PG_POOL)
+                _POOL_PID = pid
+    return _POOL
+
+
+def get_pool_stats():
+    return get_pool().get_stats()
+
 
 def create_connection_cursor():
-    try:
-        connection = psycopg2.connect(**PG_CONN)
-        connection.set_session(autocommit=True)
-    except BaseException as exc:
-        raise Error(1) from exc
+    connection = create_connection(PG_CONN)
     cursor = connection.cursor()
     return connection, cursor
 
@@ -24,11 +43,28 @@ def create_connection_cursor():
 def get_connection_cursor():
     key = FLASK_CONN_CUR_KEY
     if key not in g:
-        conn_cur = create_connection_cursor()
+        try:
+            connection = get_pool().getconn()
+        except Error:
+            logger.error(f"Checkout of DB connection failed, pool stats: {get_pool_stats()}")
+            raise
+        conn_cur = (connection, connection.cursor())
         g.setdefault(key, conn_cur)
     return g.get(key)
 
 
+def release_connection_cursor(_exc=None):
+    conn_cur = g.pop(FLASK_CONN_CUR_KEY, None)
+    if conn_cur is None:
+        return
+    connection, cursor = conn_cur
+    if not cursor.closed:
+        cursor.close()
+    get_pool().putconn(connection)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"DB connection returned, pool stats: {get_pool_stats()}")
+
+
 def run_query(query, data=None, conn_cur=None, encapsulate_exception=True, log_query=False):
     if conn_cur is None:
         conn_cur = get_connection_cursor()
@@ -66,6 +102,33 @@ def run_statement(query, data=None, conn_cur=None, encapsulate_exception=True, l
     return rows
 
 
+def iter_query(query, data=None, conn_cur=None, itersize=1000):
+    """Yield rows of the query fetched from server-side cursor in batches of `itersize` rows.
+
+    The connection is in transaction until the generator is exhausted or closed.
+    """
+    if conn_cur is None:
+        conn_cur = get_connection_cursor()
+    conn, _ = conn_cur
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn.cursor(name=f'iter_query_{uuid.uuid4().hex}') as cur:
+            cur.itersize = itersize
+            cur.execute(query, data)
+            yield from cur
+        conn.commit()
+    except GeneratorExit:
+        conn.rollback()
+        raise
+    except Exception as exc:
+        conn.rollback()
+        logger.error(f"iter_query, query={query}, data={data}, exc={exc}")
+        raise Error(2) from exc
+    finally:
+        conn.autocommit = autocommit
+
+
 def to_tsquery_string(value):
     value = re.sub(r'[\W_]+', ' ', value, flags=re.UNICODE).strip()
     value = value.replace(' ', ' | ')
@@ -14,6 +14,19 @@ GS_REST_USER = None
 GS_REST_WMS_SETTINGS = None
 GS_REST_WFS_SETTINGS = None
 
+# It's expected to be set from another module
+# Example:
+# GS_HTTP_POOL = {
+#     'size': LAYMAN_GS_HTTP_POOL_SIZE,
+#     'retries': LAYMAN_GS_HTTP_RETRIES,
+#     'backoff_factor': LAYMAN_GS_HTTP_BACKOFF_FACTOR,
+# }
+GS_HTTP_POOL = {
+    'size': 10,
+    'retries': 3,
+    'backoff_factor': 0.5,
+}
+
 
 def ensure_data_dir(data_dir, data_dir_initial):
     if not os.listdir(data_dir):
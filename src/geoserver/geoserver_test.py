@@ -1,3 +1,4 @@
+import types
 import pytest
 
 from . import util as gs_util, GS_AUTH
@@ -100,3 +101,46 @@ def test_proxy_base_url_management():
     assert gs_util.ensure_proxy_base_url(init_proxy_base_url, GS_AUTH)
     proxy_base_url = gs_util.get_proxy_base_url(GS_AUTH)
     assert proxy_base_url == init_proxy_base_url
+
+
+@pytest.mark.parametrize('responses, exp_requests', [
+    pytest.param({}, [
+        ('POST', 'ws1/datastores/postgresql/reset'),
+        ('POST', 'ws2/datastores/postgresql/reset'),
+    ], id='per_store'),
+    pytest.param({('POST', 'ws1/datastores/postgresql/reset'): 404,
+                  ('GET', 'ws1/datastores/postgresql'): 404}, [
+        ('POST', 'ws1/datastores/postgresql/reset'),
+        ('GET', 'ws1/datastores/postgresql'),
+        ('POST', 'ws2/datastores/postgresql/reset'),
+    ], id='missing_store'),
+    pytest.param({('POST', 'ws1/datastores/postgresql/reset'): 404}, [
+        ('POST', 'ws1/datastores/postgresql/reset'),
+        ('GET', 'ws1/datastores/postgresql'),
+        ('POST', 'reset'),
+    ], id='reset_not_found_fallback'),
+    pytest.param({('POST', 'ws1/datastores/postgresql/reset'): 405}, [
+        ('POST', 'ws1/datastores/postgresql/reset'),
+        ('POST', 'reset'),
+    ], id='reset_not_allowed_fallback'),
+])
+def test_reset_data_stores(monkeypatch, responses, exp_requests):
+    rest_url = 'http://geoserver/rest/'
+    requests = []
+
+    def request(method, url, **_):
+        path = url[len(rest_url):]
+        path = path[len('workspaces/'):] if path.startswith('workspaces/') else path
+        requests.append((method, path))
+        response = types.SimpleNamespace(status_code=responses.get((method, path), 200))
+        response.raise_for_status = lambda: None
+        return response
+
+    monkeypatch.setattr(gs_util, 'GS_REST', rest_url)
+    monkeypatch.setattr(gs_util, 'GS_REST_WORKSPACES', rest_url + 'workspaces/')
+    monkeypatch.setattr(gs_util, 'session', types.SimpleNamespace(
+        post=lambda url, **kwargs: request('POST', url, **kwargs),
+        get=lambda url, **kwargs: request('GET', url, **kwargs),
+    ))
+    gs_util.reset_data_stores(['ws2', 'ws1', 'ws2'], GS_AUTH)
+    assert requests == exp_requests
@@ -0,0 +1,74 @@
+import http.cookiejar
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import GS_HTTP_POOL
+
+_SESSIONS = {}
+_SESSIONS_PID = None
+_SESSIONS_LOCK = threading.Lock()
+
+
+def create_session(size, retries, backoff_factor):
+    """Session with pool of `size` keep-alive connections.
+
+    Requests with idempotent methods (Retry's default allowed methods, i.e. not POST) are retried `retries` times on
+    502, 503 and 504 responses. With `retries=0`, no request is retried.
+    """
+    session = requests.Session()
+    # GeoServer is called on behalf of different users, no cookie (e.g. JSESSIONID) can be shared between requests
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    retry = Retry(total=retries,
+                  backoff_factor=backoff_factor,
+                  status_forcelist=(502, 503, 504),
+                  raise_on_status=False,
+                  ) if retries else 0
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(retry=True):
+    """Session for Layman's own calls to GeoServer, or session without retries (`retry=False`)."""
+    global _SESSIONS, _SESSIONS_PID
+    # connections must not be shared between forked processes (gunicorn and celery workers)
+    pid = os.getpid()
+    if _SESSIONS_PID != pid or retry not in _SESSIONS:
+        with _SESSIONS_LOCK:
+            if _SESSIONS_PID != pid:
+                _SESSIONS = {}
+                _SESSIONS_PID = pid
+            if retry not in _SESSIONS:
+                pool = GS_HTTP_POOL if retry else {**GS_HTTP_POOL, 'retries': 0}
+                _SESSIONS[retry] = create_session(**pool)
+    return _SESSIONS[retry]
+
+
+def proxy_request(method, url, **kwargs):
+    """Forward request of a client to GeoServer. It is never retried, so client gets real status of GeoServer and
+    non-idempotent requests (e.g. WFS-T) are sent only once."""
+    return get_session(retry=False).request(method, url, **kwargs)
+
+
+def request(method, url, **kwargs):
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+
+def put(url, **kwargs):
+    return get_session().put(url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return get_session().delete(url, **kwargs)
@@ -0,0 +1,102 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import threading
+import pytest
+import requests
+
+from . import session as gs_session
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class):
+        super().__init__(server_address, handler_class)
+        self.connections = 0
+        self.requests = 0
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.server.requests += 1
+        if self.path == '/unavailable' and self.server.requests <= 2:
+            status = 503
+        else:
+            status = 200
+        body = b'ok'
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Set-Cookie', 'JSESSIONID=abc; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture()
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get_url(httpd, path='/'):
+    host, port = httpd.server_address
+    return f'http://{host}:{port}{path}'
+
+
+def test_connections_are_reused(server):
+    url = get_url(server)
+    session = gs_session.create_session(size=2, retries=0, backoff_factor=0)
+    for _ in range(20):
+        r = session.get(url, timeout=5)
+        assert r.status_code == 200
+    assert server.requests == 20
+    assert server.connections == 1
+
+    server.connections = 0
+    for _ in range(20):
+        r = requests.get(url, timeout=5)
+        assert r.status_code == 200
+    assert server.connections == 20
+
+
+def test_retry_on_unavailable(server):
+    url = get_url(server, '/unavailable')
+    session = gs_session.create_session(size=1, retries=3, backoff_factor=0)
+    r = session.get(url, timeout=5)
+    assert r.status_code == 200
+    assert server.requests == 3
+
+
+def test_cookies_not_shared(server):
+    url = get_url(server)
+    session = gs_session.create_session(size=1, retries=0, backoff_factor=0)
+    r = session.get(url, timeout=5)
+    assert r.cookies.get('JSESSIONID') == 'abc'
+    assert not session.cookies
+
+
+def test_proxy_request_not_retried(server, monkeypatch):
+    url = get_url(server, '/unavailable')
+    monkeypatch.setattr(gs_session, 'GS_HTTP_POOL', {'size': 1, 'retries': 3, 'backoff_factor': 0})
+    monkeypatch.setattr(gs_session, '_SESSIONS', {})
+    r = gs_session.proxy_request('GET', url, timeout=5)
+    assert r.status_code == 503
+    assert server.requests == 1
+
+    # Layman's own calls are still retried
+    r = gs_session.get(url, timeout=5)
+    assert r.status_code == 200
+    assert server.requests == 3
@@ -6,7 +6,7 @@ import xml.etree.ElementTree as ET
 import secrets
 import string
 from urllib.parse import urljoin
-import requests
+from . import session
 
 from . import GS_REST_ROLES, GS_REST_USERS, GS_REST_SECURITY_ACL_LAYERS, GS_REST_WORKSPACES, GS_REST_STYLES, GS_AUTH,\
     GS_REST_WMS_SETTINGS, GS_REST_WFS_SETTINGS, GS_REST_USER, GS_REST_SETTINGS, GS_REST
@@ -52,11 +52,11 @@ DEFAULT_DB_STORE_NAME = 'postgresql'
 
 def get_roles(auth):
     r_url = GS_REST_ROLES
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()['roleNames']
 
@@ -66,7 +66,7 @@ def ensure_role(role, auth):
     role_exists = role in roles
     if not role_exists:
         logger.info(f"Role {role} does not exist yet, creating.")
-        r = requests.post(
+        r = session.post(
             urljoin(GS_REST_ROLES, 'role/' + role),
             headers=headers_json,
             auth=auth,
@@ -80,7 +80,7 @@ def ensure_role(role, auth):
 
 
 def delete_role(role, auth):
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_ROLES, 'role/' + role),
         headers=headers_json,
         auth=auth,
@@ -95,11 +95,11 @@ def delete_role(role, auth):
 
 def get_usernames(auth):
     r_url = GS_REST_USERS
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     # logger.info(f"users={r.text}")
     usernames = [u['userName'] for u in r.json()['users']]
@@ -117,7 +117,7 @@ def ensure_user(user, password, auth):
             password = ''.join(secrets.choice(string.ascii_lowercase + string.digits) for _ in range(32))
             # we usually don't want to log passwords
             # logger.info(f"User {user}'s automatically generated password is {password}")
-        r = requests.post(
+        r = session.post(
             GS_REST_USERS,
             # https://osgeo-org.atlassian.net/browse/GEOS-8486
             # seems as it's not fixed in 2.13.0
@@ -144,7 +144,7 @@ def get_workspace_security_roles(workspace, type, auth):
 
 
 def get_security_roles(rule, auth):
-    r = requests.get(
+    r = session.get(
         GS_REST_SECURITY_ACL_LAYERS,
         headers=headers_json,
         auth=auth,
@@ -164,7 +164,7 @@ def ensure_security_roles(rule, roles, auth):
     roles_str = ', '.join(roles)
 
     logger.info(f"Ensure_security_roles rule={rule}, roles={roles}, roles_str={roles_str}")
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_SECURITY_ACL_LAYERS, rule),
         data=json.dumps(
             {rule: roles_str}),
@@ -175,7 +175,7 @@ def ensure_security_roles(rule, roles, auth):
     if r.status_code != 404:
         r.raise_for_status()
 
-    r = requests.post(
+    r = session.post(
         GS_REST_SECURITY_ACL_LAYERS,
         data=json.dumps(
             {rule: roles_str}),
@@ -197,7 +197,7 @@ def ensure_layer_security_roles(workspace, layername, roles, type, auth):
 
 
 def delete_feature_type(geoserver_workspace, feature_type_name, auth):
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_WORKSPACES,
                 geoserver_workspace + f'/datastores/{DEFAULT_DB_STORE_NAME}/featuretypes/' + feature_type_name),
         headers=headers_json,
@@ -234,7 +234,7 @@ def patch_feature_type(geoserver_workspace, feature_type_name, *, title=None, de
     body = {
         "featureType": ftype
     }
-    r = requests.put(
+    r = session.put(
         urljoin(GS_REST_WORKSPACES,
                 geoserver_workspace + '/datastores/postgresql/featuretypes/' + feature_type_name),
         data=json.dumps(body),
@@ -246,7 +246,7 @@ def patch_feature_type(geoserver_workspace, feature_type_name, *, title=None, de
 
 
 def delete_security_roles(rule, auth):
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_SECURITY_ACL_LAYERS, rule),
         headers=headers_json,
         auth=auth,
@@ -257,7 +257,7 @@ def delete_security_roles(rule, auth):
 
 
 def get_all_workspaces(auth):
-    r = requests.get(
+    r = session.get(
         GS_REST_WORKSPACES,
         headers=headers_json,
         auth=auth,
@@ -286,14 +286,14 @@ def get_workspace_style_url(geoserver_workspace, style=None):
 
 def post_workspace_sld_style(geoserver_workspace, layername, sld_file, launder_function):
     if sld_file is None:
-        r = requests.get(
+        r = session.get(
             urljoin(GS_REST_STYLES, 'generic.sld'),
             auth=GS_AUTH,
             timeout=5,
         )
         r.raise_for_status()
         sld_file = io.BytesIO(r.content)
-    r = requests.post(
+    r = session.post(
         get_workspace_style_url(geoserver_workspace),
         data=json.dumps(
             {
@@ -330,7 +330,7 @@ def post_workspace_sld_style(geoserver_workspace, layername, sld_file, launder_f
     )
     sld_file.seek(0)
 
-    r = requests.put(
+    r = session.put(
         get_workspace_style_url(geoserver_workspace, layername),
         data=sld_file.read(),
         headers={
@@ -343,20 +343,20 @@ def post_workspace_sld_style(geoserver_workspace, layername, sld_file, launder_f
     if r.status_code == 400:
         raise Error(1, data=r.text)
     r.raise_for_status()
-    r = requests.put(get_workspace_layer_url(geoserver_workspace, layername),
-                     data=json.dumps(
-                         {
-                             "layer": {
-                                 "defaultStyle": {
-                                     "name": geoserver_workspace + ':' + layername,
-                                     "workspace": geoserver_workspace,
-                                 },
-                             }
-                         }),
-                     headers=headers_json,
-                     auth=GS_AUTH,
-                     timeout=5,
-                     )
+    r = session.put(get_workspace_layer_url(geoserver_workspace, layername),
+                    data=json.dumps(
+                        {
+                            "layer": {
+                                "defaultStyle": {
+                                    "name": geoserver_workspace + ':' + layername,
+                                    "workspace": geoserver_workspace,
+                                },
+                            }
+                        }),
+                    headers=headers_json,
+                    auth=GS_AUTH,
+                    timeout=5,
+                    )
     # app.logger.info(r.text)
     r.raise_for_status()
 
@@ -365,11 +365,11 @@ def get_workspace_style_response(geoserver_workspace, stylename, headers=None, a
     if headers is None:
         headers = headers_sld
     url = get_workspace_style_url(geoserver_workspace, stylename)
-    r = requests.get(url,
-                     auth=auth,
-                     headers=headers,
-                     timeout=5,
-                     )
+    r = session.get(url,
+                    auth=auth,
+                    headers=headers,
+                    timeout=5,
+                    )
     return r
 
 
@@ -381,15 +381,15 @@ def delete_workspace_style(geoserver_workspace, stylename, auth=None):
     sld_stream = io.BytesIO(r.content)
 
     style_url = get_workspace_style_url(geoserver_workspace, stylename)
-    r = requests.delete(style_url,
-                        headers=headers_json,
-                        auth=GS_AUTH,
-                        params={
-                            'purge': 'true',
-                            'recurse': 'true',
-                        },
-                        timeout=5,
-                        )
+    r = session.delete(style_url,
+                       headers=headers_json,
+                       auth=GS_AUTH,
+                       params={
+                           'purge': 'true',
+                           'recurse': 'true',
+                       },
+                       timeout=5,
+                       )
     if r.status_code == 404:
         return {}
     r.raise_for_status()
@@ -398,7 +398,7 @@ def delete_workspace_style(geoserver_workspace, stylename, auth=None):
 
 def create_db_store(geoserver_workspace, auth, db_schema=None, pg_conn=None, ):
     db_schema = db_schema or geoserver_workspace
-    r = requests.post(
+    r = session.post(
         urljoin(GS_REST_WORKSPACES, geoserver_workspace + '/datastores'),
         data=json.dumps({
             "dataStore": {
@@ -445,7 +445,7 @@ def create_db_store(geoserver_workspace, auth, db_schema=None, pg_conn=None, ):
 
 
 def delete_db_store(geoserver_workspace, auth):
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_WORKSPACES, geoserver_workspace + f'/datastores/{DEFAULT_DB_STORE_NAME}'),
         headers=headers_json,
         auth=auth,
@@ -456,7 +456,7 @@ def delete_db_store(geoserver_workspace, auth):
 
 
 def create_wms_store(geoserver_workspace, auth, wms_store_name, get_capabilities_url):
-    r = requests.post(
+    r = session.post(
         urljoin(GS_REST_WORKSPACES, geoserver_workspace + '/wmsstores'),
         data=json.dumps({
             "wmsStore": {
@@ -474,7 +474,7 @@ def create_wms_store(geoserver_workspace, auth, wms_store_name, get_capabilities
 
 def delete_wms_store(geoserver_workspace, auth, wms_store_name):
     url = urljoin(GS_REST_WORKSPACES, geoserver_workspace + f'/wmsstores/{wms_store_name}')
-    r = requests.delete(
+    r = session.delete(
         url,
         headers=headers_json,
         auth=auth,
@@ -486,7 +486,7 @@ def delete_wms_store(geoserver_workspace, auth, wms_store_name):
 
 def delete_wms_layer(geoserver_workspace, layer, auth):
     url = urljoin(GS_REST_WORKSPACES, geoserver_workspace + f'/wmslayers/{layer}')
-    r = requests.delete(
+    r = session.delete(
         url,
         headers=headers_json,
         auth=auth,
@@ -505,25 +505,25 @@ def patch_wms_layer(geoserver_workspace, layer, *, auth, bbox):
         wms_layer['nativeBoundingBox'] = bbox_to_native_bbox(bbox)
         wms_layer['nativeCRS'] = 'EPSG:3857'
         # automatically recalculates also 'latLonBoundingBox'
-    r = requests.put(urljoin(GS_REST_WORKSPACES,
-                             f'{geoserver_workspace}/wmslayers/{layer}'),
-                     data=json.dumps({
-                         "wmsLayer": wms_layer
-                     }),
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.put(urljoin(GS_REST_WORKSPACES,
+                            f'{geoserver_workspace}/wmslayers/{layer}'),
+                    data=json.dumps({
+                        "wmsLayer": wms_layer
+                    }),
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
 
 
 def get_wms_layer(geoserver_workspace, layer, *, auth):
-    r = requests.get(urljoin(GS_REST_WORKSPACES,
-                             f'{geoserver_workspace}/wmslayers/{layer}'),
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(urljoin(GS_REST_WORKSPACES,
+                            f'{geoserver_workspace}/wmslayers/{layer}'),
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()['wmsLayer']
 
@@ -532,7 +532,7 @@ def ensure_workspace(geoserver_workspace, auth=None):
     auth = auth or GS_AUTH
     all_workspaces = get_all_workspaces(auth)
     if geoserver_workspace not in all_workspaces:
-        r = requests.post(
+        r = session.post(
             GS_REST_WORKSPACES,
             data=json.dumps({'workspace': {'name': geoserver_workspace}}),
             headers=headers_json,
@@ -549,7 +549,7 @@ def delete_workspace(geoserver_workspace, auth=None):
     delete_security_roles(geoserver_workspace + '.*.r', auth)
     delete_security_roles(geoserver_workspace + '.*.w', auth)
 
-    r = requests.delete(
+    r = session.delete(
         urljoin(GS_REST_WORKSPACES, geoserver_workspace),
         headers=headers_json,
         auth=auth,
@@ -565,7 +565,7 @@ def username_to_rolename(username):
 
 def delete_user(user, auth):
     r_url = urljoin(GS_REST_USER, user)
-    r = requests.delete(
+    r = session.delete(
         r_url,
         headers=headers_json,
         auth=auth,
@@ -591,11 +591,11 @@ def get_usernames_by_role(role, auth, usernames_to_ignore=None):
 
 def get_user_roles(user, auth):
     r_url = urljoin(GS_REST_ROLES, f'user/{user}/')
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()['roleNames']
 
@@ -606,7 +606,7 @@ def ensure_user_role(user, role, auth):
     if not association_exists:
         logger.info(f"Role {role} not associated with user {user} yet, associating.")
         r_url = urljoin(GS_REST_ROLES, f'role/{role}/user/{user}/')
-        r = requests.post(
+        r = session.post(
             r_url,
             headers=headers_json,
             auth=auth,
@@ -621,7 +621,7 @@ def ensure_user_role(user, role, auth):
 
 def delete_user_role(user, role, auth):
     r_url = urljoin(GS_REST_ROLES, f'role/{role}/user/{user}/')
-    r = requests.delete(
+    r = session.delete(
         r_url,
         headers=headers_json,
         auth=auth,
@@ -643,11 +643,11 @@ def get_service_url(service):
 
 def get_service_settings(service, auth):
     r_url = get_service_url(service)
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()[service]
 
@@ -678,7 +678,7 @@ def ensure_service_srs_list(service, srs_list, auth):
         }
         logger.info(f"Service {service}: Current SRS list {current_srs_list} not equals to requested {srs_list}, changing.")
         r_url = get_service_url(service)
-        r = requests.put(
+        r = session.put(
             r_url,
             data=json.dumps({
                 service: service_settings,
@@ -699,11 +699,11 @@ ensure_wfs_srs_list = partial(ensure_service_srs_list, WFS_SERVICE_TYPE)
 
 def get_global_settings(auth):
     r_url = GS_REST_SETTINGS
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=auth,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=auth,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()['global']
 
@@ -722,7 +722,7 @@ def ensure_proxy_base_url(proxy_base_url, auth):
         global_settings['settings']['proxyBaseUrl'] = proxy_base_url
         logger.info(f"Current Proxy Base URL {current_url} not equals to requested {proxy_base_url}, changing.")
         r_url = GS_REST_SETTINGS
-        r = requests.put(
+        r = session.put(
             r_url,
             data=json.dumps({
                 'global': global_settings
@@ -741,23 +741,56 @@ def ensure_proxy_base_url(proxy_base_url, auth):
 def reset(auth):
     logger.info(f"Resetting GeoServer")
     r_url = GS_REST + 'reset'
-    r = requests.post(r_url,
-                      headers=headers_json,
-                      auth=auth,
-                      timeout=5,
-                      )
+    r = session.post(r_url,
+                     headers=headers_json,
+                     auth=auth,
+                     timeout=5,
+                     )
     r.raise_for_status()
     logger.info(f"Resetting GeoServer done")
 
 
+def reset_data_stores(geoserver_workspaces, auth, data_store=DEFAULT_DB_STORE_NAME):
+    """Drop caches (e.g. structure of feature types) of data store in each of given workspaces only.
+
+    Data stores that do not exist are skipped. Falls back to global reset if GeoServer is not able to reset single data
+    store.
+    """
+    for geoserver_workspace in sorted(set(geoserver_workspaces)):
+        logger.info(f"Resetting GeoServer data store {geoserver_workspace}:{data_store}")
+        store_url = urljoin(GS_REST_WORKSPACES, f'{geoserver_workspace}/datastores/{data_store}')
+        r = session.post(store_url + '/reset',
+                         headers=headers_json,
+                         auth=auth,
+                         timeout=5,
+                         )
+        if r.status_code == 404:
+            # 404 means either missing workspace or data store, or GeoServer without reset endpoint of data store
+            r_store = session.get(store_url,
+                                  headers=headers_json,
+                                  auth=auth,
+                                  timeout=5,
+                                  )
+            if r_store.status_code == 404:
+                logger.warning(f"GeoServer data store {geoserver_workspace}:{data_store} does not exist, skipping reset")
+                continue
+            r_store.raise_for_status()
+        if r.status_code in (404, 405):
+            logger.warning(f"Not able to reset GeoServer data store {geoserver_workspace}:{data_store}, "
+                           f"status_code={r.status_code}, resetting whole GeoServer")
+            reset(auth)
+            return
+        r.raise_for_status()
+
+
 def reload(auth):
     logger.info(f"Reloading GeoServer")
     r_url = GS_REST + 'reload'
-    r = requests.post(r_url,
-                      headers=headers_json,
-                      auth=auth,
-                      timeout=20,
-                      )
+    r = session.post(r_url,
+                     headers=headers_json,
+                     auth=auth,
+                     timeout=20,
+                     )
     r.raise_for_status()
     logger.info(f"Reloading GeoServer done")
 
@@ -775,7 +808,7 @@ def get_square_bbox(bbox):
 
 
 def get_layer_thumbnail(wms_url, layername, bbox, headers=None, wms_version='1.3.0'):
-    r = requests.get(wms_url, params={
+    r = session.get(wms_url, params={
         'SERVICE': 'WMS',
         'REQUEST': 'GetMap',
         'VERSION': wms_version,
@@ -795,11 +828,11 @@ def get_feature_type(
         gs_rest_workspaces=GS_REST_WORKSPACES):
     r_url = urljoin(gs_rest_workspaces,
                     f'{workspace}/datastores/{data_store}/featuretypes/{feature_type}')
-    r = requests.get(r_url,
-                     headers=headers_json,
-                     auth=GS_AUTH,
-                     timeout=5,
-                     )
+    r = session.get(r_url,
+                    headers=headers_json,
+                    auth=GS_AUTH,
+                    timeout=5,
+                    )
     r.raise_for_status()
     return r.json()['featureType']
 
@@ -29,6 +29,11 @@ app.secret_key = os.environ['FLASK_SECRET_KEY']
 app.config['PREFERRED_URL_SCHEME'] = settings.LAYMAN_PUBLIC_URL_SCHEME
 logger = create_logger(app)
 
+from db import util as db_util
+
+# return pooled DB connection at the end of every request and every Celery task
+app.teardown_appcontext(db_util.release_connection_cursor)
+
 from .http import LaymanError
 from .make_celery import make_celery
 
@@ -105,6 +110,9 @@ with settings.LAYMAN_REDIS.pipeline() as pipe:
                         from .authn.redis import import_authn_to_redis
 
                         import_authn_to_redis()
+                        from .cache import publication_info as publication_info_cache
+
+                        publication_info_cache.delete_all()
 
                         logger.info(f'Ensure SRS output list for QGIS projects')
                         from .layer.qgis import output_srs
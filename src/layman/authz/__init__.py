@@ -1,11 +1,14 @@
 import json
 from functools import wraps
-from flask import after_this_request, request
+from flask import after_this_request, request, g
 
 from layman import LaymanError, settings, authn, util as layman_util
-from layman.common.prime_db_schema import workspaces, users
+from layman.common.prime_db_schema import workspaces, users, publications
 from layman.common.rest import parse_request_path
 
+FLASK_PUBLICATION_RIGHTS_KEY = f'{__name__}:PUBLICATION_RIGHTS'
+FLASK_FILTERED_BY_READER_KEY = f'{__name__}:FILTERED_BY_READER'
+
 
 def authorize(workspace, publication_type, publication_name, request_method, actor_name):
     is_multi_publication_request = not publication_name
@@ -39,18 +42,16 @@ def authorize(workspace, publication_type, publication_name, request_method, act
     else:
         if not workspaces.get_workspace_infos(workspace):
             raise LaymanError(40)  # Workspace not found
-        publ_info = layman_util.get_publication_infos(workspace, publication_type).get(
-            (workspace, publication_type, publication_name)
-        )
-        if not publ_info:
+        publ_rights = get_publication_rights(actor_name, workspace, publication_type, publication_name)
+        if not publ_rights:
             raise LaymanError(publication_not_found_code)
-        user_can_read = is_user_in_access_rule(actor_name, publ_info['access_rights']['read'])
+        user_can_read = publ_rights['read']
         if request_method in ['GET']:
             if user_can_read:
                 return
             raise LaymanError(publication_not_found_code)
         if request_method in ['POST', 'PUT', 'PATCH', 'DELETE']:
-            if is_user_in_access_rule(actor_name, publ_info['access_rights']['write']):
+            if publ_rights['write']:
                 return
             if user_can_read:
                 raise LaymanError(30)  # unauthorized request
@@ -58,9 +59,18 @@ def authorize(workspace, publication_type, publication_name, request_method, act
         raise LaymanError(31, {'method': request_method})  # unsupported method
 
 
+def set_filtered_by_reader(reader):
+    """Mark response of current multi-GET request as containing only publications readable by `reader`."""
+    setattr(g, FLASK_FILTERED_BY_READER_KEY, reader)
+
+
+def is_filtered_by_reader(reader):
+    return FLASK_FILTERED_BY_READER_KEY in g and g.get(FLASK_FILTERED_BY_READER_KEY) == reader
+
+
 def authorize_after_multi_get_request(actor_name, response):
     # print(f"authorize_after_request, status_code = {response.status_code}, workspace={workspace}, actor_name={actor_name}")
-    if response.status_code == 200:
+    if response.status_code == 200 and not is_filtered_by_reader(actor_name):
         publications_json = json.loads(response.get_data())
         publications_json = [
             publication_json for publication_json in publications_json
@@ -83,18 +93,26 @@ def can_user_create_public_workspace(username):
     return is_user_in_access_rule(username, settings.GRANT_CREATE_PUBLIC_WORKSPACE)
 
 
+def get_publication_rights(username, workspace, publication_type, publication_name):
+    key = FLASK_PUBLICATION_RIGHTS_KEY
+    if key not in g:
+        g.setdefault(key, dict())
+    publication_rights = g.get(key)
+    rights_key = (username, workspace, publication_type, publication_name)
+    if rights_key not in publication_rights:
+        publication_rights[rights_key] = publications.get_publication_rights(workspace, publication_type, publication_name,
+                                                                             username)
+    return publication_rights[rights_key]
+
+
 def can_user_read_publication(username, workspace, publication_type, publication_name):
-    publ_info = layman_util.get_publication_infos(workspace=workspace, publ_type=publication_type).get(
-        (workspace, publication_type, publication_name)
-    )
-    return publ_info and is_user_in_access_rule(username, publ_info['access_rights']['read'])
+    publ_rights = get_publication_rights(username, workspace, publication_type, publication_name)
+    return bool(publ_rights and publ_rights['read'])
 
 
 def can_user_write_publication(username, workspace, publication_type, publication_name):
-    publ_info = layman_util.get_publication_infos(workspace=workspace, publ_type=publication_type).get(
-        (workspace, publication_type, publication_name)
-    )
-    return publ_info and is_user_in_access_rule(username, publ_info['access_rights']['write'])
+    publ_rights = get_publication_rights(username, workspace, publication_type, publication_name)
+    return bool(publ_rights and publ_rights['write'])
 
 
 def can_i_edit(publ_type, workspace, publication_name):
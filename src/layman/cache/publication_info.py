@@ -0,0 +1,148 @@
+import copy
+import json
+import time
+import uuid
+from redis import WatchError
+
+from layman import settings
+from .mem import CACHE as MEM_CACHE
+
+# Partial infos of internal sources are cached per publication and source in one Redis hash (and in memory of each
+# process). Every cached partial info has a version. Invalidation assigns new version, so partial info computed before
+# invalidation is never written to the cache. Partial infos of sources reading external systems (GeoServer, Micka), that
+# can be changed also outside of Layman, expire sooner.
+
+
+def _get_key(workspace, publ_type, publ_name):
+    return f'{__name__}:{workspace}:{publ_type}:{publ_name}'
+
+
+def _get_version_field(source_name):
+    return f'{source_name}:version'
+
+
+def is_source_cached(source):
+    return getattr(source, 'CACHE_INFO', False)
+
+
+def get_source_cache_timeout(source):
+    if getattr(source, 'CACHE_INFO_EXTERNAL', False):
+        return settings.LAYMAN_CACHE_EXTERNAL_PUBLICATION_INFO_TIMEOUT
+    return settings.LAYMAN_CACHE_PUBLICATION_INFO_TIMEOUT
+
+
+def get_partial_infos(workspace, publ_type, publ_name, sources, info_method, concurrent=False, timeout=None):
+    """Call info_method of each source (the same method only once) and return results by source module.
+
+    Results of sources with CACHE_INFO = True are taken from the cache if available. With `concurrent=True`, not cached
+    sources are called in parallel and info of source not finished within `timeout` seconds is
+    layman.util.CALL_TIMED_OUT.
+    """
+    key = _get_key(workspace, publ_type, publ_name)
+    source_by_fn = {}
+    for source in sources:
+        source_by_fn.setdefault(getattr(source, info_method), source)
+
+    cached_source_names = [s.__name__ for s in source_by_fn.values() if is_source_cached(s)]
+    cached_infos, versions = _get_cached_infos(key, cached_source_names)
+
+    fns_to_call = [fn for fn, source in source_by_fn.items() if source.__name__ not in cached_infos]
+    from layman.util import call_fns_concurrently, CALL_TIMED_OUT
+    if concurrent:
+        called_infos = call_fns_concurrently([(fn, [workspace, publ_name], {}) for fn in fns_to_call], timeout=timeout)
+    else:
+        called_infos = [fn(workspace, publ_name) for fn in fns_to_call]
+    called_infos = dict(zip(fns_to_call, called_infos))
+
+    results = {}
+    for fn, source in source_by_fn.items():
+        source_name = source.__name__
+        if source_name in cached_infos:
+            info = cached_infos[source_name]
+        else:
+            info = called_infos[fn]
+            if info is CALL_TIMED_OUT:
+                results[source] = info
+                continue
+            info = info or {}
+            # empty info is not cached, it may be caused also by temporarily unavailable service (e.g. Micka)
+            if source_name in versions and info:
+                _set_cached_info(key, source_name, versions[source_name], info, get_source_cache_timeout(source))
+        results[source] = info
+    return results
+
+
+def _get_cached_infos(key, source_names):
+    if not source_names:
+        return {}, {}
+    rds = settings.LAYMAN_REDIS
+    versions = dict(zip(source_names, rds.hmget(key, [_get_version_field(name) for name in source_names])))
+
+    infos = {}
+    names_to_load = []
+    for source_name, version in versions.items():
+        if version is None:
+            continue
+        mem_obj = MEM_CACHE.get((key, source_name))
+        if mem_obj is not None and mem_obj['version'] == version:
+            infos[source_name] = copy.deepcopy(mem_obj['value'])
+        else:
+            names_to_load.append(source_name)
+
+    if names_to_load:
+        for source_name, string_value in zip(names_to_load, rds.hmget(key, names_to_load)):
+            if string_value is None:
+                continue
+            cached = json.loads(string_value)
+            # entries written by previous version of Layman have no expiration time
+            ttl = cached['expires_at'] - time.time() if 'expires_at' in cached else 0
+            if ttl <= 0:
+                continue
+            value = cached['value']
+            MEM_CACHE.set((key, source_name), {'version': versions[source_name], 'value': value}, ttl=ttl)
+            infos[source_name] = copy.deepcopy(value)
+    return infos, versions
+
+
+def _set_cached_info(key, source_name, version, info, timeout):
+    version_field = _get_version_field(source_name)
+    new_version = version or uuid.uuid4().hex
+    with settings.LAYMAN_REDIS.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.hget(key, version_field) != version:
+                # invalidated in the meantime
+                return
+            pipe.multi()
+            pipe.hset(key, mapping={
+                version_field: new_version,
+                source_name: json.dumps({'value': info, 'expires_at': time.time() + timeout}),
+            })
+            pipe.expire(key, settings.LAYMAN_CACHE_PUBLICATION_INFO_TIMEOUT)
+            pipe.execute()
+        except WatchError:
+            return
+    MEM_CACHE.set((key, source_name), {'version': new_version, 'value': copy.deepcopy(info)}, ttl=timeout)
+
+
+def invalidate(workspace, publ_type, publ_name, source_names):
+    if not source_names:
+        return
+    key = _get_key(workspace, publ_type, publ_name)
+    with settings.LAYMAN_REDIS.pipeline() as pipe:
+        pipe.hset(key, mapping={
+            _get_version_field(source_name): uuid.uuid4().hex
+            for source_name in source_names
+        })
+        pipe.hdel(key, *source_names)
+        pipe.expire(key, settings.LAYMAN_CACHE_PUBLICATION_INFO_TIMEOUT)
+        pipe.execute()
+    for source_name in source_names:
+        MEM_CACHE.delete((key, source_name))
+
+
+def delete_all():
+    rds = settings.LAYMAN_REDIS
+    keys = list(rds.scan_iter(match=f'{__name__}:*'))
+    if keys:
+        rds.delete(*keys)
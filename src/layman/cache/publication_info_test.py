@@ -0,0 +1,106 @@
+import time
+import types
+
+from layman import settings
+from layman.layer import LAYER_TYPE
+from . import publication_info
+
+
+def create_source(name, cache_info, get_info, external=False):
+    source = types.ModuleType(name)
+    source.get_layer_info = get_info
+    if cache_info:
+        source.CACHE_INFO = True
+    if external:
+        source.CACHE_INFO_EXTERNAL = True
+    return source
+
+
+def test_get_partial_infos():
+    workspace = 'test_publication_info_cache_workspace'
+    layername = 'test_publication_info_cache_layer'
+    calls = []
+    infos = {
+        'cached': {'wms': {'url': 'http://wms'}},
+        'not_cached': {'name': layername},
+    }
+
+    def create_get_info(source_name):
+        def get_info(_workspace, _layername):
+            calls.append(source_name)
+            return infos[source_name]
+        return get_info
+
+    sources = [
+        create_source(f'{__name__}.{source_name}', source_name == 'cached', create_get_info(source_name))
+        for source_name in ['cached', 'not_cached']
+    ]
+    cached_source_name = sources[0].__name__
+    publication_info.invalidate(workspace, LAYER_TYPE, layername, [cached_source_name])
+
+    def get_results():
+        results = publication_info.get_partial_infos(workspace, LAYER_TYPE, layername, sources, 'get_layer_info')
+        return [results[source] for source in sources]
+
+    assert get_results() == [infos['cached'], infos['not_cached']]
+    assert calls == ['cached', 'not_cached']
+
+    calls.clear()
+    results = get_results()
+    assert results == [infos['cached'], infos['not_cached']]
+    assert calls == ['not_cached']
+    # cached info can be changed by caller
+    results[0]['wms']['url'] = 'changed'
+    assert get_results()[0] == infos['cached']
+
+    calls.clear()
+    infos['cached'] = {'wms': {'url': 'http://new_wms'}}
+    publication_info.invalidate(workspace, LAYER_TYPE, layername, [cached_source_name])
+    assert get_results() == [infos['cached'], infos['not_cached']]
+    assert calls == ['cached', 'not_cached']
+
+    # info computed before invalidation is not cached
+    calls.clear()
+    publication_info.invalidate(workspace, LAYER_TYPE, layername, [cached_source_name])
+
+    def get_info_invalidated_meanwhile(_workspace, _layername):
+        calls.append('cached')
+        publication_info.invalidate(workspace, LAYER_TYPE, layername, [cached_source_name])
+        return {'wms': {'url': 'http://stale_wms'}}
+    sources[0].get_layer_info = get_info_invalidated_meanwhile
+    get_results()
+    sources[0].get_layer_info = create_get_info('cached')
+    infos['cached'] = {'wms': {'url': 'http://fresh_wms'}}
+    assert get_results()[0] == infos['cached']
+    assert calls == ['cached', 'not_cached', 'cached', 'not_cached']
+
+    settings.LAYMAN_REDIS.delete(publication_info._get_key(workspace, LAYER_TYPE, layername))
+
+
+def test_get_partial_infos_external_expiration(monkeypatch):
+    workspace = 'test_publication_info_cache_workspace'
+    layername = 'test_publication_info_cache_external_layer'
+    calls = []
+
+    def get_info(_workspace, _layername):
+        calls.append(1)
+        return {'metadata': {'identifier': f'm{len(calls)}'}}
+
+    monkeypatch.setattr(settings, 'LAYMAN_CACHE_EXTERNAL_PUBLICATION_INFO_TIMEOUT', 0.5)
+    source_name = f'{__name__}.external'
+    source = create_source(source_name, True, get_info, external=True)
+    publication_info.invalidate(workspace, LAYER_TYPE, layername, [source_name])
+
+    def get_result():
+        return publication_info.get_partial_infos(workspace, LAYER_TYPE, layername, [source], 'get_layer_info')[source]
+
+    assert get_result() == {'metadata': {'identifier': 'm1'}}
+    assert get_result() == {'metadata': {'identifier': 'm1'}}
+    assert len(calls) == 1
+
+    # info of external system changed outside of Layman is read again soon
+    time.sleep(0.6)
+    assert get_result() == {'metadata': {'identifier': 'm2'}}
+    assert len(calls) == 2
+
+    settings.LAYMAN_REDIS.delete(publication_info._get_key(workspace, LAYER_TYPE, layername))
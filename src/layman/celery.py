@@ -1,39 +1,99 @@
 import json
+import time
 from flask import current_app
 from celery.contrib.abortable import AbortableAsyncResult
+from kombu.utils import json as kombu_json
 
 from layman import settings
-from layman.common import redis as redis_util
+from layman.common import redis as redis_util, tasks as tasks_util
+from layman.http import LaymanError
 
 REDIS_CURRENT_TASK_NAMES = f"{__name__}:CURRENT_TASK_NAMES"
 PUBLICATION_CHAIN_INFOS = f'{__name__}:PUBLICATION_TASK_INFOS'
 TASK_ID_TO_PUBLICATION = f'{__name__}:TASK_ID_TO_PUBLICATION'
-
-
-def task_prerun(workspace, _publication_type, publication_name, _task_id, task_name):
+PUBLICATION_DEFERRED_CHAINS = f'{__name__}:PUBLICATION_DEFERRED_CHAINS'
+# sorted set of publications with running chain, score is expiration time of the mark
+RUNNING_CHAINS = f'{__name__}:RUNNING_CHAINS:{{workspace}}'
+PUBLICATION_DEFERRED_CHAINS_ACTIVITY = f'{__name__}:PUBLICATION_DEFERRED_CHAINS_ACTIVITY'
+PUBLICATION_CHAIN_STATE = f'{__name__}:PUBLICATION_CHAIN_STATE:{{publication}}'
+CHAIN_STATE_TASKS_FIELD = 'tasks'
+
+# Snapshot of chain progress has one field per task ID of current chain. Tasks of previous chains must not write there.
+_SET_TASK_STATE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return -1
+"""
+_set_task_state_script = None
+
+
+def task_prerun(workspace, publication_type, publication_name, task_id, task_name):
     current_app.logger.info(f"PRE task={task_name}, workspace={workspace}, publication_name={publication_name}")
     rds = settings.LAYMAN_REDIS
     key = REDIS_CURRENT_TASK_NAMES
     task_hash = _get_task_hash(task_name, workspace, publication_name)
     rds.sadd(key, task_hash)
+    set_task_state(workspace, publication_type, publication_name, task_id, 'STARTED')
+    redis_util.refresh_publication_lock(workspace, publication_type, publication_name)
+    refresh_running_chain(workspace, publication_type, publication_name)
 
 
-def task_postrun(workspace, publication_type, publication_name, task_id, task_name, task_state):
+def task_postrun(workspace, publication_type, publication_name, task_id, task_name, task_state, task_retval=None):
     current_app.logger.info(f"POST task={task_name}, workspace={workspace}, publication_name={publication_name}")
     rds = settings.LAYMAN_REDIS
     key = REDIS_CURRENT_TASK_NAMES
     task_hash = _get_task_hash(task_name, workspace, publication_name)
     rds.srem(key, task_hash)
+    error = task_retval.to_dict() if task_state == 'FAILURE' and isinstance(task_retval, LaymanError) else None
+    set_task_state(workspace, publication_type, publication_name, task_id, task_state, error=error)
+    redis_util.refresh_publication_lock(workspace, publication_type, publication_name)
+    refresh_running_chain(workspace, publication_type, publication_name)
+
+    # task names start with name of internal source the task changes
+    from layman.util import invalidate_publication_info
+    invalidate_publication_info(workspace, publication_type, publication_name, [task_name.rsplit('.', 1)[0]])
 
     key = TASK_ID_TO_PUBLICATION
     hash = task_id
     if rds.hexists(key, hash):
-        finnish_publication_task(task_id)
-    elif task_state == 'FAILURE':
         chain_info = get_publication_chain_info_dict(workspace, publication_type, publication_name)
-        if chain_info is not None:
-            last_task_id = chain_info['last']
-            finnish_publication_task(last_task_id)
+        with rds.pipeline() as pipe:
+            pipe.hdel(key, hash)
+            pipe.hmget(key, chain_info['last_tasks'])
+            _, last_tasks_publ_hashes = pipe.execute()
+        # chain with parallel branches is finished when last tasks of all branches are finished
+        if all(publ_hash is None for publ_hash in last_tasks_publ_hashes):
+            _finish_publication_chain(workspace, publication_type, publication_name, chain_info)
+            return
+    _finish_failed_publication_chain(workspace, publication_type, publication_name, task_id)
+
+
+def _finish_failed_publication_chain(workspace, publication_type, publication_name, task_id):
+    """If any task of the chain failed, abort tasks of other parallel branches and finish the chain when none of its
+    tasks is running."""
+    chain_info = get_publication_chain_info(workspace, publication_type, publication_name)
+    if chain_info is None or chain_info['finished'] or task_id not in [r.task_id for r in chain_info['by_order']]:
+        return
+    chain_state = get_publication_chain_state(workspace, publication_type, publication_name) or []
+    if not any(task_state['state'] == 'FAILURE' for _, task_state in chain_state):
+        return
+
+    # other branches would keep running after the lock is released and next chain could run alongside them
+    abort_task_chain(chain_info['by_order'], chain_info['by_name'], wait=False)
+    running = False
+    for task_name, task_state in chain_state:
+        task_result = chain_info['by_name'][task_name]
+        if task_state['state'] == 'STARTED' and task_result.task_id != task_id:
+            running = True
+        elif task_state['state'] == 'PENDING' and task_result.state == 'ABORTED':
+            # tasks that were never started have no postrun, so their final state is written here
+            set_task_state(workspace, publication_type, publication_name, task_result.task_id, 'ABORTED')
+    # otherwise postrun of the last running task finishes the chain
+    if not running:
+        # some of last tasks of parallel branches may be already finished
+        for last_task in chain_info['last_tasks']:
+            finnish_publication_task(last_task.task_id)
 
 
 def _get_task_hash(task_name, workspace, publication_name):
@@ -50,14 +110,20 @@ def finnish_publication_task(task_id):
     username, publication_type, publication_name = _hash_to_publication(publ_hash)
 
     chain_info = get_publication_chain_info_dict(username, publication_type, publication_name)
+    rds.hdel(key, hash, *chain_info['last_tasks'])
+    _finish_publication_chain(username, publication_type, publication_name, chain_info)
+
+
+def _finish_publication_chain(username, publication_type, publication_name, chain_info):
+    rds = settings.LAYMAN_REDIS
     chain_info['finished'] = True
     set_publication_chain_info_dict(username, publication_type, publication_name, chain_info)
 
-    rds.hdel(key, hash)
+    rds.zrem(_get_running_chains_key(username), _get_running_chain_member(publication_type, publication_name))
 
-    lock = redis_util.get_publication_lock(username, publication_type, publication_name)
-    if lock in ['patch', 'post', 'wfst', ]:
-        redis_util.unlock_publication(username, publication_type, publication_name)
+    # lock of another request, e.g. DELETE, is not released
+    redis_util.unlock_publication(username, publication_type, publication_name, token=chain_info.get('lock_token'),
+                                  lock_methods=['patch', 'post', 'wfst', ])
 
 
 def _hash_to_publication(hash):
@@ -102,6 +168,7 @@ def get_publication_chain_info(workspace, publication_type, publication_name):
             k: results[task_id] for k, task_id in chain_info['by_name'].items()
         }
         chain_info['last'] = results[chain_info['last']]
+        chain_info['last_tasks'] = [results[task_id] for task_id in chain_info['last_tasks']]
     return chain_info
 
 
@@ -113,40 +180,225 @@ def set_publication_chain_info_dict(workspace, publication_type, publication_nam
     rds.hset(key, hash, val)
 
 
-def set_publication_chain_info(workspace, publication_type, publication_name, tasks, task_result):
-    if task_result is None:
+def set_publication_chain_info(workspace, publication_type, publication_name, tasks, task_chain, lock_token=None):
+    """Store IDs of tasks of the chain, tasks are given in order of internal sources.
+
+    Chain can have parallel branches, see layman.common.tasks.get_chain_of_methods. Key `last` is ID of the last task
+    in order of internal sources, key `last_tasks` are IDs of all tasks that no other task waits for. Chain is started by
+    request holding the lock with fencing token `lock_token`, chain releases only this lock when it is finished.
+
+    Must be called before the chain is sent to workers, otherwise states of tasks that finish quickly would be lost.
+    """
+    if not tasks:
         return
-    chained_results = [task_result]
-    prev_result = task_result
-    while prev_result.parent is not None:
-        prev_result = prev_result.parent
-        chained_results.insert(0, prev_result)
+    task_ids = {sig.task: sig.id for sig in tasks_util.get_canvas_signatures(task_chain)}
     chain_info = {
-        'last': task_result.task_id,
+        'last': task_ids[tasks[-1].name],
+        'last_tasks': [sig.id for sig in tasks_util.get_canvas_last_signatures(task_chain)],
         'by_name': {
-            tasks[idx].name: r.task_id for idx, r in enumerate(chained_results)
+            task.name: task_ids[task.name] for task in tasks
         },
-        'by_order': [r.task_id for r in chained_results],
+        'by_order': [task_ids[task.name] for task in tasks],
         'finished': False,
+        'lock_token': lock_token,
     }
     set_publication_chain_info_dict(workspace, publication_type, publication_name, chain_info)
+    _init_chain_state(workspace, publication_type, publication_name, [
+        (task.name, task_ids[task.name]) for task in tasks
+    ])
 
     rds = settings.LAYMAN_REDIS
     key = TASK_ID_TO_PUBLICATION
     val = _get_publication_hash(workspace, publication_type, publication_name)
-    hash = chain_info['last']
-    rds.hset(key, hash, val)
+    rds.hset(key, mapping={
+        task_id: val for task_id in chain_info['last_tasks']
+    })
+    running_chains_key = _get_running_chains_key(workspace)
+    with rds.pipeline() as pipe:
+        # marks of chains that were never finished (e.g. worker crashed) are removed
+        pipe.zremrangebyscore(running_chains_key, '-inf', time.time())
+        pipe.zadd(running_chains_key, {
+            _get_running_chain_member(publication_type, publication_name): _get_running_chain_expiration(),
+        })
+        pipe.execute()
+
+
+def _get_chain_state_key(workspace, publication_type, publication_name):
+    return PUBLICATION_CHAIN_STATE.format(publication=_get_publication_hash(workspace, publication_type, publication_name))
+
+
+def _init_chain_state(workspace, publication_type, publication_name, tasks):
+    key = _get_chain_state_key(workspace, publication_type, publication_name)
+    with settings.LAYMAN_REDIS.pipeline() as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping={
+            CHAIN_STATE_TASKS_FIELD: json.dumps(tasks),
+            **{
+                task_id: json.dumps({'state': 'PENDING'})
+                for _, task_id in tasks
+            },
+        })
+        pipe.execute()
+
+
+def set_task_state(workspace, publication_type, publication_name, task_id, state, *, error=None, progress=None):
+    """Write state of the task to the snapshot of publication chain. Tasks not belonging to current chain are ignored."""
+    global _set_task_state_script
+    if _set_task_state_script is None:
+        _set_task_state_script = settings.LAYMAN_REDIS.register_script(_SET_TASK_STATE_SCRIPT)
+    task_state = {'state': state}
+    if error is not None:
+        task_state['error'] = error
+    if progress is not None:
+        task_state['progress'] = progress
+    key = _get_chain_state_key(workspace, publication_type, publication_name)
+    _set_task_state_script(keys=[key], args=[task_id, json.dumps(task_state)])
+
+
+def get_publication_chain_state(workspace, publication_type, publication_name):
+    """Read progress of publication chain from its snapshot by one Redis call, without asking Celery result backend.
+
+    Returns None if there is no chain, otherwise list of (task_name, task_state) in order of the chain, where
+    task_state is dict with key `state` and optionally `error` and `progress`.
+    """
+    key = _get_chain_state_key(workspace, publication_type, publication_name)
+    snapshot = settings.LAYMAN_REDIS.hgetall(key)
+    if CHAIN_STATE_TASKS_FIELD not in snapshot:
+        return None
+    return [
+        (task_name, json.loads(snapshot[task_id]))
+        for task_name, task_id in json.loads(snapshot[CHAIN_STATE_TASKS_FIELD])
+    ]
+
+
+def is_chain_state_successful(chain_state):
+    return all(task_state['state'] == 'SUCCESS' for _, task_state in chain_state)
+
+
+def _get_running_chains_key(workspace):
+    return RUNNING_CHAINS.format(workspace=workspace)
+
+
+def _get_running_chain_member(publication_type, publication_name):
+    return f"{publication_type}:{publication_name}"
+
+
+def _get_running_chain_expiration():
+    return time.time() + settings.LAYMAN_PUBLICATION_LOCK_TIMEOUT
+
+
+def refresh_running_chain(workspace, publication_type, publication_name, pipe=None):
+    """Postpone expiration of mark of running chain, if the publication has one.
+
+    Mark of running chain expires in the same time as publication lock, so chain that is never finished (e.g. its worker
+    crashed) is not considered running forever.
+    """
+    rds = pipe or settings.LAYMAN_REDIS
+    rds.zadd(_get_running_chains_key(workspace), {
+        _get_running_chain_member(publication_type, publication_name): _get_running_chain_expiration(),
+    }, xx=True)
+
+
+def is_publication_chain_running(workspace, publication_type, publication_name):
+    """Cheap alternative to `not is_chain_ready(...)`, without asking Celery result backend."""
+    rds = settings.LAYMAN_REDIS
+    expiration = rds.zscore(_get_running_chains_key(workspace), _get_running_chain_member(publication_type, publication_name))
+    return expiration is not None and expiration > time.time()
+
+
+def defer_chain(workspace, publication_type, publication_name, task_chain):
+    """Store the chain until run_deferred_chain is called.
+
+    Tasks without ID get one assigned, so that chain info can be set before the chain is sent to workers. Returns result
+    of the last task of the chain.
+    """
+    from layman import celery_app
+    tasks_util.ensure_task_ids(task_chain)
+    last_task_id = tasks_util.get_canvas_signatures(task_chain)[-1].id
+
+    rds = settings.LAYMAN_REDIS
+    hash = _get_publication_hash(workspace, publication_type, publication_name)
+    with rds.pipeline() as pipe:
+        pipe.hset(PUBLICATION_DEFERRED_CHAINS, hash, kombu_json.dumps(task_chain))
+        pipe.zadd(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, {hash: time.time()})
+        pipe.execute()
+    return AbortableAsyncResult(last_task_id, backend=celery_app.backend)
+
+
+def touch_deferred_chain(workspace, publication_type, publication_name):
+    """Record activity of deferred chain. Returns False if there is no deferred chain of the publication.
+
+    Lock of the publication and mark of running chain do not expire while its deferred chain is active (e.g. during
+    chunk upload).
+    """
+    rds = settings.LAYMAN_REDIS
+    hash = _get_publication_hash(workspace, publication_type, publication_name)
+    with rds.pipeline() as pipe:
+        pipe.zadd(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, {hash: time.time()}, xx=True, ch=True)
+        redis_util.refresh_publication_lock(workspace, publication_type, publication_name, pipe=pipe)
+        refresh_running_chain(workspace, publication_type, publication_name, pipe=pipe)
+        changed, _, _ = pipe.execute()
+    return changed > 0
+
+
+def get_deferred_chain_activity(workspace, publication_type, publication_name):
+    """Time of last activity of deferred chain, None if there is no deferred chain of the publication."""
+    rds = settings.LAYMAN_REDIS
+    hash = _get_publication_hash(workspace, publication_type, publication_name)
+    return rds.zscore(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, hash)
+
+
+def run_deferred_chain(workspace, publication_type, publication_name):
+    """Send deferred chain to workers. Only the first of concurrent callers sends it."""
+    from layman import celery_app
+    rds = settings.LAYMAN_REDIS
+    hash = _get_publication_hash(workspace, publication_type, publication_name)
+    with rds.pipeline() as pipe:
+        pipe.hget(PUBLICATION_DEFERRED_CHAINS, hash)
+        pipe.hdel(PUBLICATION_DEFERRED_CHAINS, hash)
+        pipe.zrem(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, hash)
+        val, _, _ = pipe.execute()
+    if val is None:
+        return None
+    current_app.logger.info(f"Running deferred chain of {hash}")
+    task_chain = celery_app.signature(kombu_json.loads(val))
+    return task_chain.apply_async()
+
+
+def run_inactive_deferred_chains(publication_type, max_inactivity_time):
+    rds = settings.LAYMAN_REDIS
+    hashes = rds.zrangebyscore(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, '-inf', time.time() - max_inactivity_time)
+    for hash in hashes:
+        workspace, publ_type, publication_name = _hash_to_publication(hash)
+        if publ_type == publication_type:
+            run_deferred_chain(workspace, publ_type, publication_name)
 
 
 def abort_chain(chain_info):
-    if chain_info is None or is_chain_ready(chain_info):
+    # failed chain may still have running tasks of other parallel branches
+    if chain_info is None or chain_info['finished'] or is_chain_successful(chain_info):
         return
 
+    last_task_ids = [task_result.task_id for task_result in chain_info['last_tasks']]
+    publ_hash = next((h for h in settings.LAYMAN_REDIS.hmget(TASK_ID_TO_PUBLICATION, last_task_ids) if h is not None), None)
+    if publ_hash is not None:
+        _delete_deferred_chain(publ_hash)
     abort_task_chain(chain_info['by_order'], chain_info['by_name'])
-    finnish_publication_task(chain_info['last'].task_id)
+    if publ_hash is not None:
+        # tasks that were never started have no postrun, so their final state is written here
+        workspace, publication_type, publication_name = _hash_to_publication(publ_hash)
+        for task_result in chain_info['by_order']:
+            if task_result.state == 'ABORTED':
+                set_task_state(workspace, publication_type, publication_name, task_result.task_id, 'ABORTED')
+    for last_task_id in last_task_ids:
+        finnish_publication_task(last_task_id)
 
 
-def abort_task_chain(results_by_order, results_by_name=None):
+def abort_task_chain(results_by_order, results_by_name=None, wait=True):
+    """Abort tasks that are not ready yet. With `wait=True`, wait until aborted running tasks are finished.
+
+    Waiting is not possible from inside a task, e.g. from task_postrun.
+    """
     results_by_name = results_by_name or {}
     task_results = [r for r in results_by_order if not r.ready()]
     current_app.logger.info(
@@ -162,7 +414,7 @@ def abort_task_chain(results_by_order, results_by_name=None):
         current_app.logger.info(f'aborting result {task_name} {task_result.id} with state {task_result.state}')
         task_result.abort()
         assert task_result.state == 'ABORTED'
-        if prev_task_state == 'STARTED':
+        if prev_task_state == 'STARTED' and wait:
             current_app.logger.info(
                 f'waiting for result of {task_name} {task_result.id} with state {task_result.state}')
             # if hangs forever, see comment in src/layman/layer/rest_workspace_test.py::test_post_layers_simple
@@ -171,7 +423,7 @@ def abort_task_chain(results_by_order, results_by_name=None):
 
 
 def is_chain_successful(chain_info):
-    return chain_info['last'].successful()
+    return all(task_result.successful() for task_result in chain_info['last_tasks'])
 
 
 def is_chain_failed(chain_info):
@@ -187,19 +439,27 @@ def _get_publication_hash(workspace, publication_type, publication_name):
     return hash
 
 
+def _delete_deferred_chain(publ_hash):
+    rds = settings.LAYMAN_REDIS
+    rds.hdel(PUBLICATION_DEFERRED_CHAINS, publ_hash)
+    rds.zrem(PUBLICATION_DEFERRED_CHAINS_ACTIVITY, publ_hash)
+
+
 def delete_publication(workspace, publication_type, publication_name):
+    rds = settings.LAYMAN_REDIS
+    hash = _get_publication_hash(workspace, publication_type, publication_name)
+    _delete_deferred_chain(hash)
+    rds.zrem(_get_running_chains_key(workspace), _get_running_chain_member(publication_type, publication_name))
+    rds.delete(_get_chain_state_key(workspace, publication_type, publication_name))
+
     chain_info = get_publication_chain_info_dict(workspace, publication_type, publication_name)
     if chain_info is None:
         return
-    task_id = chain_info['last']
-
-    rds = settings.LAYMAN_REDIS
     key = PUBLICATION_CHAIN_INFOS
-    hash = _get_publication_hash(workspace, publication_type, publication_name)
     rds.hdel(key, hash)
 
     key = TASK_ID_TO_PUBLICATION
-    rds.hdel(key, task_id)
+    rds.hdel(key, *chain_info['last_tasks'])
 
 
 class AbortedException(Exception):
@@ -1,15 +1,20 @@
 import importlib
+import os
+import shutil
 import time
 import sys
 from test import flask_client
 import pytest
-from celery import chain
+from celery import chain, group
 from celery.contrib.abortable import AbortableAsyncResult
 
 del sys.modules['layman']
 
-from layman import app, celery_app
-from layman.layer.filesystem import input_chunk
+from layman import app, celery_app, settings
+from layman.layer import LAYER_TYPE
+from layman.layer.db import tasks as db_tasks
+from layman.layer.filesystem import input_chunk, input_file
+from layman.layer.geoserver import tasks as geoserver_tasks
 from layman import celery as celery_util
 from layman.common import tasks as tasks_util
 
@@ -54,27 +59,119 @@ def test_single_abortable_task():
         tasks_util._get_task_signature(workspace, layername, t, task_options, 'layername')
         for t in tasks
     ])
-    task_result = task_chain()
-
-    results = [task_result]
+    with app.app_context():
+        task_result = celery_util.defer_chain(workspace, LAYER_TYPE, layername, task_chain)
     results_copy = [
         AbortableAsyncResult(task_result.task_id, backend=celery_app.backend)
-        for task_result in results
     ]
+    assert task_result.state == results_copy[0].state == 'PENDING'
+
+    # upload is not finished, so inactivity sweep sends the chain and the task fails
+    with app.app_context():
+        celery_util.run_inactive_deferred_chains(LAYER_TYPE, 0)
+        assert celery_util.run_deferred_chain(workspace, LAYER_TYPE, layername) is None
+    task_result.get(propagate=False, timeout=10)
+    assert task_result.state == results_copy[0].state == 'FAILURE'
+    with app.app_context():
+        input_chunk.delete_layer(workspace, layername)
+
+
+@pytest.mark.usefixtures('client')
+def test_abort_started_task_chain():
+    tasks = [
+        db_tasks.refresh_table,
+        geoserver_tasks.refresh_wfs,
+    ]
+    task_options = {
+        'crs_id': 'EPSG:4326',
+        'description': 'bla',
+        'title': 'bla',
+        'ensure_user': True,
+    }
+    workspace = 'test_abort_user'
+    layername = 'test_abort_layer3'
+    with app.app_context():
+        input_file_dir = input_file.ensure_layer_input_file_dir(workspace, layername)
+    # import of big file takes a while, so the task can be aborted while it is running
+    shutil.copy('tmp/naturalearth/10m/cultural/ne_10m_admin_0_countries.geojson',
+                os.path.join(input_file_dir, f'{layername}.geojson'))
+    task_chain = chain(*[
+        tasks_util._get_task_signature(workspace, layername, t, task_options, 'layername')
+        for t in tasks
+    ])
+    task_result = task_chain()
+    results = [AbortableAsyncResult(sig.id, backend=celery_app.backend)
+               for sig in tasks_util.get_canvas_signatures(task_chain)]
+    assert results[-1].task_id == task_result.task_id
 
     i = 1
-    while i <= 20 and not results[0].state == results_copy[0].state == 'STARTED':
-        print(f"results[0].state={results[0].state}, results_copy[0].state={results_copy[0].state}")
+    while i <= 50 and not results[0].state == 'STARTED':
         time.sleep(0.1)
         i += 1
+    assert results[0].state == 'STARTED'
+    assert results[1].state == 'PENDING'
 
-    assert results[0].state == results_copy[0].state == 'STARTED'
     with app.app_context():
-        celery_util.abort_task_chain(results_copy)
+        celery_util.abort_task_chain(results)
     # first one is failure, because it throws AbortedException
-    assert results[0].state == results_copy[0].state == 'FAILURE'
+    assert results[0].state == 'FAILURE'
+    # second one was aborted before it was started
+    assert results[1].state == 'ABORTED'
     with app.app_context():
-        input_chunk.delete_layer(workspace, layername)
+        input_file.delete_layer(workspace, layername)
+
+
+@pytest.mark.usefixtures('client')
+def test_failed_parallel_branch_aborts_other_branch():
+    tasks = [
+        db_tasks.refresh_table,
+        geoserver_tasks.refresh_wfs,
+    ]
+    task_options = {
+        'crs_id': 'EPSG:4326',
+        'description': 'bla',
+        'title': 'bla',
+        'ensure_user': True,
+    }
+    workspace = 'test_abort_user'
+    layername = 'test_abort_layer4'
+    with app.app_context():
+        input_file_dir = input_file.ensure_layer_input_file_dir(workspace, layername)
+    shutil.copy('tmp/naturalearth/10m/cultural/ne_10m_admin_0_countries.geojson',
+                os.path.join(input_file_dir, f'{layername}.geojson'))
+    table_sig, wfs_sig = [
+        tasks_util._get_task_signature(workspace, layername, t, task_options, 'layername')
+        for t in tasks
+    ]
+    task_chain = chain(group(table_sig, wfs_sig))
+    tasks_util.ensure_task_ids(task_chain)
+    with app.app_context():
+        celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, tasks, task_chain)
+    table_result = table_sig.apply_async()
+
+    i = 1
+    while i <= 50 and not table_result.state == 'STARTED':
+        time.sleep(0.1)
+        i += 1
+    assert table_result.state == 'STARTED'
+
+    # the other branch fails while refresh_table is still running
+    with app.app_context():
+        celery_util.set_task_state(workspace, LAYER_TYPE, layername, wfs_sig.id, 'STARTED')
+        celery_util.task_postrun(workspace, LAYER_TYPE, layername, wfs_sig.id, geoserver_tasks.refresh_wfs.name,
+                                 'FAILURE')
+
+    # running branch is aborted and its postrun finishes the chain
+    table_result.get(propagate=False, timeout=60)
+    assert table_result.state == 'FAILURE'
+    with app.app_context():
+        assert not celery_util.is_publication_chain_running(workspace, LAYER_TYPE, layername)
+        chain_info = celery_util.get_publication_chain_info_dict(workspace, LAYER_TYPE, layername)
+        assert chain_info['finished'] is True
+        assert [task_state['state'] for _, task_state in
+                celery_util.get_publication_chain_state(workspace, LAYER_TYPE, layername)] == ['FAILURE', 'FAILURE']
+        input_file.delete_layer(workspace, layername)
+        celery_util.delete_publication(workspace, LAYER_TYPE, layername)
 
 
 @pytest.mark.usefixtures('client')
@@ -107,14 +204,20 @@ def test_abortable_task_chain():
         tasks_util._get_task_signature(workspace, layername, t, task_options, 'layername')
         for t in tasks
     ])
-    task_result = task_chain()
+    with app.app_context():
+        task_result = celery_util.defer_chain(workspace, LAYER_TYPE, layername, task_chain)
+        celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, tasks, task_chain)
+        assert celery_util.is_publication_chain_running(workspace, LAYER_TYPE, layername)
+        assert celery_util.get_publication_chain_state(workspace, LAYER_TYPE, layername) == [
+            (task.name, {'state': 'PENDING'}) for task in tasks
+        ]
 
-    results = [task_result]
-    prev_result = task_result
-    while prev_result.parent is not None:
-        prev_result = prev_result.parent
-        results.insert(0, prev_result)
+    results = [
+        AbortableAsyncResult(sig.id, backend=celery_app.backend)
+        for sig in tasks_util.get_canvas_signatures(task_chain)
+    ]
     assert len(results) == 3
+    assert results[-1].task_id == task_result.task_id
 
     results_copy = [
         AbortableAsyncResult(task_result.task_id, backend=celery_app.backend)
@@ -123,16 +226,52 @@ def test_abortable_task_chain():
 
     time.sleep(1)
 
-    assert results[0].state == results_copy[0].state == 'STARTED'
-    assert results[1].state == results_copy[1].state == 'PENDING'
-    assert results[2].state == results_copy[2].state == 'PENDING'
+    # chain waits for upload to finish, no task was sent to workers
+    for result, result_copy in zip(results, results_copy):
+        assert result.state == result_copy.state == 'PENDING'
 
     with app.app_context():
-        celery_util.abort_task_chain(results_copy)
-    # first one is failure, because it throws AbortedException
-    assert results[0].state == results_copy[0].state == 'FAILURE'
-    # second one (and all others) was revoked, but it was not started at all because of previous failure, so it's pending for ever
-    assert results[1].state == results_copy[1].state == 'ABORTED'
-    assert results[2].state == results_copy[2].state == 'ABORTED'
+        chain_info = celery_util.get_publication_chain_info(workspace, LAYER_TYPE, layername)
+        celery_util.abort_chain(chain_info)
+        assert not celery_util.is_publication_chain_running(workspace, LAYER_TYPE, layername)
+        assert celery_util.get_publication_chain_state(workspace, LAYER_TYPE, layername) == [
+            (task.name, {'state': 'ABORTED'}) for task in tasks
+        ]
+    for result, result_copy in zip(results, results_copy):
+        assert result.state == result_copy.state == 'ABORTED'
     with app.app_context():
+        # aborted chain is never sent to workers
+        assert celery_util.run_deferred_chain(workspace, LAYER_TYPE, layername) is None
         input_chunk.delete_layer(workspace, layername)
+        celery_util.delete_publication(workspace, LAYER_TYPE, layername)
+        assert celery_util.get_publication_chain_state(workspace, LAYER_TYPE, layername) is None
+
+
+@pytest.mark.usefixtures('client')
+def test_running_chain_expiration(monkeypatch):
+    workspace = 'test_running_chain_user'
+    layername = 'test_running_chain_layer'
+    tasks = [db_tasks.refresh_table]
+    task_chain = chain(*[
+        tasks_util._get_task_signature(workspace, layername, t, {}, 'layername')
+        for t in tasks
+    ])
+    tasks_util.ensure_task_ids(task_chain)
+    with app.app_context():
+        celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, tasks, task_chain, lock_token='42')
+        assert celery_util.is_publication_chain_running(workspace, LAYER_TYPE, layername)
+        # token of the lock is recorded as given, not read back from Redis
+        assert celery_util.get_publication_chain_info_dict(workspace, LAYER_TYPE, layername)['lock_token'] == '42'
+
+        # chain that is never finished (e.g. worker crashed) is not running forever
+        monkeypatch.setattr(settings, 'LAYMAN_PUBLICATION_LOCK_TIMEOUT', -1)
+        celery_util.refresh_running_chain(workspace, LAYER_TYPE, layername)
+        assert not celery_util.is_publication_chain_running(workspace, LAYER_TYPE, layername)
+
+        # expired marks are removed when next chain is started
+        celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername + '2', tasks, task_chain)
+        running_chains_key = celery_util._get_running_chains_key(workspace)
+        assert settings.LAYMAN_REDIS.zscore(running_chains_key, f'{LAYER_TYPE}:{layername}') is None
+
+        celery_util.delete_publication(workspace, LAYER_TYPE, layername)
+        celery_util.delete_publication(workspace, LAYER_TYPE, layername + '2')
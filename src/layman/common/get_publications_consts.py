@@ -13,3 +13,10 @@ ORDERING_BBOX = 'ordering_bbox'
 
 LIMIT = 'limit'
 OFFSET = 'offset'
+CURSOR = 'cursor'
+
+TOTAL_COUNT = 'total_count'
+TOTAL_COUNT_EXACT = 'exact'
+TOTAL_COUNT_ESTIMATE = 'estimate'
+TOTAL_COUNT_NONE = 'none'
+TOTAL_COUNT_MODES = [TOTAL_COUNT_EXACT, TOTAL_COUNT_ESTIMATE, TOTAL_COUNT_NONE, ]
@@ -1,4 +1,6 @@
+import json
 import logging
+import re
 import psycopg2.extras
 
 from db import util as db_util
@@ -13,6 +15,9 @@ DB_SCHEMA = settings.LAYMAN_PRIME_SCHEMA
 ROLE_EVERYONE = settings.RIGHTS_EVERYONE_ROLE
 psycopg2.extras.register_uuid()
 
+NUMERIC_KEY_PATTERN = r'^-?[0-9]+(\.[0-9]+)?$'
+TIMESTAMPTZ_KEY_PATTERN = r'^(infinity|[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?[+-][0-9]{2}(:[0-9]{2})?)$'
+
 
 def get_publication_infos(workspace_name=None, pub_type=None, style_type=None,
                           reader=None, writer=None,
@@ -21,6 +26,38 @@ def get_publication_infos(workspace_name=None, pub_type=None, style_type=None,
                                                reader, writer,)['items']
 
 
+def get_publication_info(workspace_name, pub_type, name):
+    # all three key columns are filtered, so the query is answered by publications_name_type_key index
+    infos = get_publication_infos_with_metainfo(workspace_name, pub_type, publication_name=name)['items']
+    return infos.get((workspace_name, pub_type, name), dict())
+
+
+def get_principals(actor_name):
+    """Return names that give actor access to publication if they are in can_read_users or can_write_users."""
+    return [actor_name, ROLE_EVERYONE] if is_user_with_name(actor_name) else [ROLE_EVERYONE]
+
+
+def get_publication_rights(workspace_name, pub_type, name, actor_name):
+    query = f"""
+select p.can_read_users && %s::text[] as can_read,
+       p.can_write_users && %s::text[] as can_write
+from {DB_SCHEMA}.workspaces w inner join
+     {DB_SCHEMA}.publications p on p.id_workspace = w.id
+where w.name = %s
+  and p.type = %s
+  and p.name = %s
+"""
+    principals = get_principals(actor_name)
+    params = (principals, principals, workspace_name, pub_type, name, )
+    values = db_util.run_query(query, params)
+    if not values:
+        return None
+    can_read, can_write = values[0]
+    return {'read': can_read,
+            'write': can_write,
+            }
+
+
 def get_publication_infos_with_metainfo(workspace_name=None, pub_type=None, style_type=None,
                                         reader=None, writer=None,
                                         limit=None, offset=None,
@@ -29,8 +66,23 @@ def get_publication_infos_with_metainfo(workspace_name=None, pub_type=None, styl
                                         order_by_list=None,
                                         ordering_full_text=None,
                                         ordering_bbox=None,
+                                        publication_name=None,
+                                        after=None,
+                                        total_count_mode=consts.TOTAL_COUNT_EXACT,
+                                        stream=False,
                                         ):
+    """Return page of publications.
+
+    Page starts either at `offset`, or just behind publication with ordering keys `after`, that are taken from
+    `next_keys` of previous page (keyset pagination). Keyset pagination does not need to skip previous rows, so its
+    cost does not depend on depth of the page.
+
+    If `stream` is true, `items` is generator of (key, info) pairs read from server-side cursor. It can be used only
+    without `limit` and must be consumed within the request.
+    """
     order_by_list = order_by_list or []
+    assert offset is None or after is None
+    assert total_count_mode in consts.TOTAL_COUNT_MODES
 
     full_text_tsquery = db_util.to_tsquery_string(full_text_filter) if full_text_filter else None
     full_text_like = '%' + full_text_filter + '%' if full_text_filter else None
@@ -39,65 +91,61 @@ def get_publication_infos_with_metainfo(workspace_name=None, pub_type=None, styl
     where_params_def = [
         (workspace_name, 'w.name = %s', (workspace_name,)),
         (pub_type, 'p.type = %s', (pub_type,)),
+        (publication_name, 'p.name = %s', (publication_name,)),
         (style_type, 'p.style_type::text = %s', (style_type,)),
-        (reader and not is_user_with_name(reader), 'p.everyone_can_read = TRUE', tuple()),
-        (is_user_with_name(reader), f"""(p.everyone_can_read = TRUE
-                        or (u.id is not null and w.name = %s)
-                        or EXISTS(select 1
-                                  from {DB_SCHEMA}.rights r inner join
-                                       {DB_SCHEMA}.users u2 on r.id_user = u2.id inner join
-                                       {DB_SCHEMA}.workspaces w2 on w2.id = u2.id_workspace
-                                  where r.id_publication = p.id
-                                    and r.type = 'read'
-                                    and w2.name = %s))""", (reader, reader,)),
-        (writer and not is_user_with_name(writer), 'p.everyone_can_write = TRUE', tuple()),
-        (is_user_with_name(writer), f"""(p.everyone_can_write = TRUE
-                        or (u.id is not null and w.name = %s)
-                        or EXISTS(select 1
-                                  from {DB_SCHEMA}.rights r inner join
-                                       {DB_SCHEMA}.users u2 on r.id_user = u2.id inner join
-                                       {DB_SCHEMA}.workspaces w2 on w2.id = u2.id_workspace
-                                  where r.id_publication = p.id
-                                    and r.type = 'write'
-                                    and w2.name = %s))""", (writer, writer,)),
-        (full_text_filter, '(_prime_schema.my_unaccent(p.title) @@ to_tsquery(unaccent(%s))'
-                           'or lower(unaccent(p.title)) like lower(unaccent(%s)))', (full_text_tsquery, full_text_like,)),
-        (bbox_filter, 'p.bbox && ST_MakeBox2D(ST_MakePoint(%s, %s), ST_MakePoint(%s, %s))', bbox_filter),
+        (reader, 'p.can_read_users && %s::text[]', (get_principals(reader),)),
+        (writer, 'p.can_write_users && %s::text[]', (get_principals(writer),)),
+        # title_tsv is GIN-indexed, title_unaccent is GIN-indexed by trigrams, so both conditions use index
+        (full_text_filter, '(p.title_tsv @@ to_tsquery(unaccent(%s))'
+                           'or p.title_unaccent like lower(unaccent(%s)))', (full_text_tsquery, full_text_like,)),
+        # bbox is GiST-indexed as geometry
+        (bbox_filter, 'p.bbox::geometry && ST_MakeEnvelope(%s, %s, %s, %s)', bbox_filter),
     ]
 
+    # Every ordering is defined by key expression, its params, direction and SQL type of the key used in keyset
+    # pagination. Float ranks are ordered as numeric, so that their text representation in keys is exact.
     order_by_definition = {
-        consts.ORDER_BY_FULL_TEXT: ('ts_rank_cd(_prime_schema.my_unaccent(p.title), to_tsquery(unaccent(%s))) DESC',
-                                    (ordering_full_text_tsquery,)),
-        consts.ORDER_BY_TITLE: ('lower(unaccent(p.title)) ASC', tuple()),
-        consts.ORDER_BY_LAST_CHANGE: ('updated_at DESC', tuple()),
+        consts.ORDER_BY_FULL_TEXT: ('ts_rank_cd(p.title_tsv, to_tsquery(unaccent(%s)))::float8::numeric',
+                                    (ordering_full_text_tsquery,), 'DESC', 'numeric'),
+        consts.ORDER_BY_TITLE: ('p.title_unaccent', tuple(), 'ASC', 'text'),
+        # NULL values go first as in case of ordering by plain updated_at DESC
+        consts.ORDER_BY_LAST_CHANGE: ("coalesce(p.updated_at, 'infinity'::timestamptz)", tuple(), 'DESC', 'timestamptz'),
         consts.ORDER_BY_BBOX: ("""
-            -- A∩B / (A + B)
+            -- A∩B / (A + B), computed by box arithmetic without constructing geometries
             CASE
                 -- if there is any intersection
-                WHEN p.bbox && ST_MakeBox2D(ST_MakePoint(%s, %s),
-                                            ST_MakePoint(%s, %s))
+                WHEN ST_XMIN(p.bbox) <= %s::float8 AND ST_XMAX(p.bbox) >= %s::float8
+                 AND ST_YMIN(p.bbox) <= %s::float8 AND ST_YMAX(p.bbox) >= %s::float8
                     THEN
                         -- in cases, when area of intersection is 0, we want it rank higher than no intersection
-                        GREATEST(st_area(st_intersection(p.bbox, ST_MakeBox2D(ST_MakePoint(%s, %s),
-                                                                              ST_MakePoint(%s, %s)))),
+                        GREATEST((LEAST(ST_XMAX(p.bbox), %s::float8) - GREATEST(ST_XMIN(p.bbox), %s::float8))
+                                 * (LEAST(ST_YMAX(p.bbox), %s::float8) - GREATEST(ST_YMIN(p.bbox), %s::float8)),
                                  1)
                         -- we have to solve division by 0
-                        / (GREATEST(st_area(p.bbox), 1) +
-                           GREATEST(st_area(ST_MakeBox2D(ST_MakePoint(%s, %s),
-                                                         ST_MakePoint(%s, %s))),
-                                    1)
-                           )
+                        / (GREATEST((ST_XMAX(p.bbox) - ST_XMIN(p.bbox)) * (ST_YMAX(p.bbox) - ST_YMIN(p.bbox)), 1)
+                           + %s::float8)
                 -- if there is no intersection, result is 0 in all cases
                 ELSE
                     0
-            END DESC
-            """, ordering_bbox + ordering_bbox + ordering_bbox if ordering_bbox else tuple()),
+            END::numeric
+            """, get_bbox_ordering_params(ordering_bbox) if ordering_bbox else tuple(), 'DESC', 'numeric'),
     }
 
     assert all(ordering_item in order_by_definition.keys() for ordering_item in order_by_list)
 
+    # publications are uniquely and totally ordered, which is necessary for keyset pagination
+    order_by_keys = [order_by_definition[order_by_part] for order_by_part in order_by_list] + [
+        ('w.name', tuple(), 'ASC', 'text'),
+        ('p.name', tuple(), 'ASC', 'text'),
+        ('p.type', tuple(), 'ASC', 'text'),
+    ]
+    order_by_keys_count = len(order_by_list)
+    if after is not None:
+        check_keys(after, order_by_keys)
+
     #########################################################
     # SELECT clause
+    order_keys_columns = ', '.join(f'({expression})::text' for expression, _, _, _ in order_by_keys[:order_by_keys_count])
     select_clause = f"""
 select p.id as id_publication,
        w.name as workspace_name,
@@ -111,30 +159,14 @@ select p.id as id_publication,
        ST_YMIN(p.bbox) as ymin,
        ST_XMAX(p.bbox) as xmax,
        ST_YMAX(p.bbox) as ymax,
-       (select rtrim(concat(case when u.id is not null then w.name || ',' end,
-                            string_agg(w2.name, ',') || ',',
-                            case when p.everyone_can_read then %s || ',' end
-                            ), ',')
-        from {DB_SCHEMA}.rights r inner join
-             {DB_SCHEMA}.users u2 on r.id_user = u2.id inner join
-             {DB_SCHEMA}.workspaces w2 on w2.id = u2.id_workspace
-        where r.id_publication = p.id
-          and r.type = 'read') can_read_users,
-       (select rtrim(concat(case when u.id is not null then w.name || ',' end,
-                            string_agg(w2.name, ',') || ',',
-                            case when p.everyone_can_write then %s || ',' end
-                            ), ',')
-        from {DB_SCHEMA}.rights r inner join
-             {DB_SCHEMA}.users u2 on r.id_user = u2.id inner join
-             {DB_SCHEMA}.workspaces w2 on w2.id = u2.id_workspace
-        where r.id_publication = p.id
-          and r.type = 'write') can_write_users,
-       count(*) OVER() AS full_count
-from {DB_SCHEMA}.workspaces w inner join
-     {DB_SCHEMA}.publications p on p.id_workspace = w.id left join
-     {DB_SCHEMA}.users u on u.id_workspace = w.id
+       p.can_read_users,
+       p.can_write_users,
+       ARRAY[{order_keys_columns}]::text[] AS order_keys
 """
-    select_params = (ROLE_EVERYONE, ROLE_EVERYONE, )
+    from_clause = f"""from {DB_SCHEMA}.workspaces w inner join
+     {DB_SCHEMA}.publications p on p.id_workspace = w.id
+"""
+    select_params = tuple(param for _, params, _, _ in order_by_keys[:order_by_keys_count] for param in params)
 
     #########################################################
     # WHERE clause
@@ -148,16 +180,19 @@ from {DB_SCHEMA}.workspaces w inner join
     if where_parts:
         where_clause = 'WHERE ' + '\n  AND '.join(where_parts) + '\n'
 
+    seek_clause = ''
+    seek_params = tuple()
+    if after is not None:
+        seek_condition, seek_params = get_seek_condition(order_by_keys, after)
+        seek_clause = ('AND ' if where_clause else 'WHERE ') + seek_condition + '\n'
+
     #########################################################
     # ORDER BY clause
     order_by_params = tuple()
     order_by_parts = list()
-    for order_by_part in order_by_list:
-        order_by_parts.append(order_by_definition[order_by_part][0])
-        order_by_params = order_by_params + order_by_definition[order_by_part][1]
-
-    order_by_parts.append('w.name ASC')
-    order_by_parts.append('p.name ASC')
+    for expression, params, direction, _ in order_by_keys:
+        order_by_parts.append(f'{expression} {direction}')
+        order_by_params = order_by_params + params
     order_by_clause = 'ORDER BY ' + ', '.join(order_by_parts)
 
     #########################################################
@@ -168,7 +203,8 @@ from {DB_SCHEMA}.workspaces w inner join
     if limit is not None:
         assert limit >= 0
         assert isinstance(limit, int)
-        pagination_clause = pagination_clause + f' LIMIT {limit} '
+        # one more row says if there is next page
+        pagination_clause = pagination_clause + f' LIMIT {limit + 1} '
     if offset is not None:
         assert offset >= 0
         assert isinstance(offset, int)
@@ -176,56 +212,142 @@ from {DB_SCHEMA}.workspaces w inner join
 
     #########################################################
     # Put it together
-    sql_params = select_params + where_params + order_by_params + pagination_params
-    select = select_clause + where_clause + order_by_clause + pagination_clause
-    values = db_util.run_query(select, sql_params)
+    sql_params = select_params + where_params + seek_params + order_by_params + pagination_params
+    select = select_clause + from_clause + where_clause + seek_clause + order_by_clause + pagination_clause
 
     # print(f'get_publication_infos:\n\nselect={select}\n\nsql_params={sql_params}\n\n&&&&&&&&&&&&&&&&&')
 
-    infos = {(workspace_name,
-              type,
-              publication_name,): {'id': id_publication,
-                                   'name': publication_name,
-                                   'title': title,
-                                   'uuid': uuid,
-                                   'type': type,
-                                   'style_type': style_type,
-                                   'updated_at': updated_at,
-                                   'bounding_box': [xmin, ymin, xmax, ymax],
-                                   'access_rights': {'read': can_read_users.split(','),
-                                                     'write': can_write_users.split(',')}
-                                   }
-             for id_publication, workspace_name, type, publication_name, title, uuid, style_type, updated_at, xmin, ymin, xmax, ymax,
-             can_read_users, can_write_users, _
-             in values}
-
-    if values:
-        total_count = values[0][-1]
-    else:
-        count_clause = f"""
-        select count(*) AS full_count
-        from {DB_SCHEMA}.workspaces w inner join
-             {DB_SCHEMA}.publications p on p.id_workspace = w.id left join
-             {DB_SCHEMA}.users u on u.id_workspace = w.id
-        """
-        sql_params = where_params
-        select = count_clause + where_clause
-        count = db_util.run_query(select, sql_params)
-        total_count = count[0][-1]
+    if stream:
+        assert limit is None
+        return get_streamed_result(select, sql_params, from_clause + where_clause, where_params, offset, after,
+                                   total_count_mode)
+
+    values = db_util.run_query(select, sql_params)
+
+    next_keys = None
+    if limit is not None and len(values) > limit:
+        values = values[:limit]
+        if values:
+            last_row = values[-1]
+            next_keys = last_row[-1] + [last_row[1], last_row[3], last_row[2]]
+
+    infos = dict(row_to_info(row) for row in values)
+
+    total_count = None
+    total_count_estimate = None
+    if total_count_mode == consts.TOTAL_COUNT_EXACT:
+        if next_keys is None and not offset and after is None and (infos or limit != 0):
+            # whole filtered set was selected
+            total_count = len(infos)
+        else:
+            total_count = get_count(from_clause + where_clause, where_params)
+    elif total_count_mode == consts.TOTAL_COUNT_ESTIMATE:
+        total_count_estimate = get_estimated_count(from_clause + where_clause, where_params)
 
     if infos:
         start = offset + 1 if offset else 1
-        content_range = (start, start + len(infos) - 1)
+        content_range = (start, start + len(infos) - 1) if after is None else None
     else:
         content_range = (0, 0)
 
     result = {'items': infos,
               'total_count': total_count,
+              'total_count_estimate': total_count_estimate,
+              'content_range': content_range,
+              'next_keys': next_keys,
+              }
+    return result
+
+
+def get_streamed_result(select, sql_params, from_where_clause, where_params, offset, after, total_count_mode):
+    # all rows of the filtered set behind offset are returned, so the range is known from total count
+    total_count = None
+    total_count_estimate = None
+    content_range = None
+    if total_count_mode == consts.TOTAL_COUNT_EXACT:
+        total_count = get_count(from_where_clause, where_params)
+        start = offset + 1 if offset else 1
+        if after is None:
+            content_range = (start, total_count) if total_count >= start else (0, 0)
+    elif total_count_mode == consts.TOTAL_COUNT_ESTIMATE:
+        total_count_estimate = get_estimated_count(from_where_clause, where_params)
+
+    result = {'items': (row_to_info(row) for row in db_util.iter_query(select, sql_params)),
+              'total_count': total_count,
+              'total_count_estimate': total_count_estimate,
               'content_range': content_range,
+              'next_keys': None,
               }
     return result
 
 
+def row_to_info(row):
+    id_publication, workspace_name, type, publication_name, title, uuid, style_type, updated_at, xmin, ymin, xmax, ymax, \
+        can_read_users, can_write_users, _ = row
+    return (workspace_name, type, publication_name,), {'id': id_publication,
+                                                       'name': publication_name,
+                                                       'title': title,
+                                                       'uuid': uuid,
+                                                       'type': type,
+                                                       'style_type': style_type,
+                                                       'updated_at': updated_at,
+                                                       'bounding_box': [xmin, ymin, xmax, ymax],
+                                                       'access_rights': {'read': can_read_users,
+                                                                         'write': can_write_users}
+                                                       }
+
+
+def get_count(from_where_clause, params):
+    return db_util.run_query('select count(*) AS full_count\n' + from_where_clause, params)[0][0]
+
+
+def get_bbox_ordering_params(ordering_bbox):
+    xmin, ymin, xmax, ymax = ordering_bbox
+    area = max((xmax - xmin) * (ymax - ymin), 1)
+    return (xmax, xmin, ymax, ymin) * 2 + (area, )
+
+
+def check_keys(keys, order_by_keys):
+    valid = isinstance(keys, list) and len(keys) == len(order_by_keys) and all(isinstance(key, str) for key in keys)
+    if valid:
+        for key, (_, _, _, sql_type) in zip(keys, order_by_keys):
+            if sql_type == 'numeric':
+                valid = re.match(NUMERIC_KEY_PATTERN, key) is not None
+            elif sql_type == 'timestamptz':
+                valid = re.match(TIMESTAMPTZ_KEY_PATTERN, key) is not None
+            if not valid:
+                break
+    if not valid:
+        raise LaymanError(2, {'parameter': consts.CURSOR, 'expected': 'Value of cursor taken from previous page'})
+
+
+def get_seek_condition(order_by_keys, keys):
+    """Return condition selecting rows following the row with given keys in the order defined by order_by_keys."""
+    condition = None
+    params = tuple()
+    for (expression, expression_params, direction, sql_type), key in reversed(list(zip(order_by_keys, keys))):
+        operator = '<' if direction == 'DESC' else '>'
+        if condition is None:
+            condition = f'{expression} {operator} %s::{sql_type}'
+            params = expression_params + (key, )
+        else:
+            condition = f'({expression} {operator} %s::{sql_type} OR ({expression} = %s::{sql_type} AND {condition}))'
+            params = expression_params + (key, ) + expression_params + (key, ) + params
+    # redundant bound of the first key allows to use index on the key
+    expression, expression_params, direction, sql_type = order_by_keys[0]
+    operator = '<=' if direction == 'DESC' else '>='
+    condition = f'{expression} {operator} %s::{sql_type} AND {condition}'
+    params = expression_params + (keys[0], ) + params
+    return condition, params
+
+
+def get_estimated_count(from_where_clause, params):
+    plan = db_util.run_query('EXPLAIN (FORMAT JSON) select 1\n' + from_where_clause, params)[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
 def only_valid_names(users_list):
     usernames_for_check = set(users_list)
     usernames_for_check.discard(ROLE_EVERYONE)
@@ -353,10 +475,9 @@ def update_publication(workspace_name, info):
         }
 
     if info.get("access_rights") and (info["access_rights"].get("read") or info["access_rights"].get("write")):
-        info_old = get_publication_infos(workspace_name,
-                                         info["publ_type_name"])[(workspace_name,
-                                                                  info["publ_type_name"],
-                                                                  info["name"],)]
+        info_old = get_publication_info(workspace_name,
+                                        info["publ_type_name"],
+                                        info["name"],)
         for right_type in right_type_list:
             access_rights_changes[right_type]['username_list_old'] = info_old["access_rights"][right_type]
             info["access_rights"][right_type + "_old"] = access_rights_changes[right_type]['username_list_old']
@@ -403,7 +524,7 @@ returning id
 def delete_publication(workspace_name, type, name):
     workspace_info = workspaces.get_workspace_infos(workspace_name).get(workspace_name)
     if workspace_info:
-        id_publication = get_publication_infos(workspace_name, type).get((workspace_name, type, name), dict()).get("id")
+        id_publication = get_publication_info(workspace_name, type, name).get("id")
         if id_publication:
             rights.delete_rights_for_publication(id_publication)
             id_workspace = workspace_info["id"]
@@ -1,9 +1,13 @@
+import hashlib
+import json
 import uuid
 from test import process_client, prime_db_schema_client
 import pytest
 
+from db import util as db_util
 from layman import settings, app as app, LaymanError
 from layman.layer import LAYER_TYPE
+from layman.common import get_publications_consts as consts
 from layman.map import MAP_TYPE
 from . import publications, workspaces, users
 
@@ -49,6 +53,9 @@ def test_publication_basic():
             assert pubs[(username, publication_type, publication_name)].get('name') == publication_name
             assert pubs[(username, publication_type, publication_name)].get('title') == publication_title
             assert pubs[(username, publication_type, publication_name)].get('uuid') == str(uuid_str)
+            pub = publications.get_publication_info(username, publication_type, publication_name)
+            assert pub == pubs[(username, publication_type, publication_name)]
+            assert publications.get_publication_info(username, publication_type, publication_name + '_not_existing') == dict()
 
             db_info = {"name": publication_name,
                        "title": publication_title2,
@@ -83,6 +90,7 @@ def test_publication_basic():
             publications.delete_publication(username, publication_type, publication_name)
             pubs = publications.get_publication_infos(username, publication_type)
             assert pubs.get((username, publication_type, publication_name)) is None
+            assert publications.get_publication_info(username, publication_type, publication_name) == dict()
 
             workspaces.delete_workspace(username)
 
@@ -470,6 +478,53 @@ class TestSelectPublicationsComplex:
         assert expected_result['total_count'] == infos['total_count']
         assert expected_result['content_range'] == infos['content_range']
 
+    @staticmethod
+    @pytest.mark.parametrize('query_params', [
+        dict(),
+        {'order_by_list': ['full_text'], 'ordering_full_text': 'jedna'},
+        {'order_by_list': ['title'], },
+        {'order_by_list': ['last_change'], },
+        {'order_by_list': ['bbox'], 'ordering_bbox': (2999, 2999, 5001, 5001), },
+        {'bbox_filter': (3001, 3001, 4999, 4999), },
+    ])
+    @pytest.mark.parametrize('limit', [1, 2, 3])
+    @pytest.mark.usefixtures('provide_data')
+    def test_get_publication_infos_with_metainfo_keyset(query_params, limit):
+        with app.app_context():
+            all_infos = publications.get_publication_infos_with_metainfo(**query_params)
+            expected_publications = list(all_infos['items'].keys())
+
+            walked_publications = []
+            after = None
+            while True:
+                infos = publications.get_publication_infos_with_metainfo(**query_params, limit=limit, after=after,
+                                                                         total_count_mode=consts.TOTAL_COUNT_NONE)
+                assert infos['total_count'] is None
+                assert len(infos['items']) <= limit
+                walked_publications += list(infos['items'].keys())
+                after = infos['next_keys']
+                if after is None:
+                    break
+        assert walked_publications == expected_publications
+
+    @staticmethod
+    @pytest.mark.usefixtures('provide_data')
+    def test_get_publication_infos_with_metainfo_total_count():
+        with app.app_context():
+            infos = publications.get_publication_infos_with_metainfo(limit=2, total_count_mode=consts.TOTAL_COUNT_ESTIMATE)
+            assert infos['total_count'] is None
+            assert infos['total_count_estimate'] >= 0
+            assert infos['content_range'] == (1, 2)
+
+            infos = publications.get_publication_infos_with_metainfo(limit=2, total_count_mode=consts.TOTAL_COUNT_NONE)
+            assert infos['total_count'] is None
+            assert infos['total_count_estimate'] is None
+
+            with pytest.raises(LaymanError) as exc_info:
+                publications.get_publication_infos_with_metainfo(order_by_list=['last_change'], limit=2,
+                                                                 after=['yesterday', 'a', 'b', 'c'])
+            assert exc_info.value.code == 2
+
 
 def test_only_valid_names():
     workspace_name = 'test_only_valid_names_workspace'
@@ -648,6 +703,10 @@ def assert_access_rights(workspace_name,
     pubs = publications.get_publication_infos(workspace_name, publication_type)
     assert pubs[(workspace_name, publication_type, publication_name)]["access_rights"]["read"] == read_to_test
     assert pubs[(workspace_name, publication_type, publication_name)]["access_rights"]["write"] == write_to_test
+    for actor_name in {workspace_name, settings.ANONYM_USER, }.union(read_to_test).union(write_to_test).difference({settings.RIGHTS_EVERYONE_ROLE}):
+        publ_rights = publications.get_publication_rights(workspace_name, publication_type, publication_name, actor_name)
+        assert publ_rights['read'] == (settings.RIGHTS_EVERYONE_ROLE in read_to_test or actor_name in read_to_test), actor_name
+        assert publ_rights['write'] == (settings.RIGHTS_EVERYONE_ROLE in write_to_test or actor_name in write_to_test), actor_name
 
 
 def test_insert_rights():
@@ -948,3 +1007,81 @@ def test_publications_same_name():
     process_client.delete_workspace_map(username, publ_name)
     process_client.delete_workspace_layer(username2, publ_name)
     process_client.delete_workspace_map(username2, publ_name)
+
+
+class TestSearchScale:
+    workspace = 'test_search_scale_workspace'
+    publications_count = 100000
+
+    @pytest.fixture(scope="class")
+    def provide_data(self):
+        id_workspace = prime_db_schema_client.ensure_workspace(self.workspace)
+        with app.app_context():
+            db_util.run_statement(f"""
+insert into {DB_SCHEMA}.publications
+    (id_workspace, name, title, type, uuid, everyone_can_read, everyone_can_write, updated_at, bbox)
+select %s,
+       'map_' || i,
+       'Mapa ' || md5(i::text) || ' číslo ' || i,
+       %s,
+       md5(%s || i)::uuid,
+       TRUE,
+       TRUE,
+       current_timestamp,
+       ST_MakeBox2D(ST_Point(i * 100, i * 100), ST_Point(i * 100 + 50, i * 100 + 50))
+from generate_series(1, %s) i
+;
+analyze {DB_SCHEMA}.publications;""", (id_workspace, MAP_TYPE, self.workspace, self.publications_count, ))
+        yield
+        with app.app_context():
+            db_util.run_statement(f"""delete from {DB_SCHEMA}.publications where id_workspace = %s;
+analyze {DB_SCHEMA}.publications;""", (id_workspace, ))
+        prime_db_schema_client.clear_workspaces([self.workspace])
+
+    @staticmethod
+    @pytest.mark.timeout(300)
+    @pytest.mark.parametrize('full_text_filter, expected_name', [
+        (hashlib.md5(b'12345').hexdigest(), 'map_12345'),
+        (hashlib.md5(b'54321').hexdigest()[5:20].upper(), 'map_54321'),
+    ])
+    @pytest.mark.usefixtures('provide_data')
+    def test_full_text_filter_uses_indexes(full_text_filter, expected_name):
+        workspace = TestSearchScale.workspace
+        with app.app_context():
+            infos = publications.get_publication_infos_with_metainfo(workspace_name=workspace,
+                                                                     full_text_filter=full_text_filter,
+                                                                     order_by_list=['full_text'],
+                                                                     ordering_full_text=full_text_filter,
+                                                                     limit=10)
+            assert list(infos['items'].keys()) == [(workspace, MAP_TYPE, expected_name)]
+
+            plan = db_util.run_query(f"""EXPLAIN (FORMAT JSON) select p.id
+from {DB_SCHEMA}.publications p
+where p.title_tsv @@ to_tsquery(unaccent(%s))
+   or p.title_unaccent like lower(unaccent(%s))""", (db_util.to_tsquery_string(full_text_filter),
+                                                     f'%{full_text_filter}%', ))[0][0]
+        plan_str = json.dumps(plan)
+        assert 'publications_title_tsv_idx' in plan_str
+        assert 'publications_title_unaccent_trgm_idx' in plan_str
+        assert 'Seq Scan' not in plan_str
+
+    @staticmethod
+    @pytest.mark.timeout(300)
+    @pytest.mark.usefixtures('provide_data')
+    def test_bbox_filter_uses_index():
+        workspace = TestSearchScale.workspace
+        bbox = (1234525, 1234525, 1234725, 1234725)
+        with app.app_context():
+            infos = publications.get_publication_infos_with_metainfo(workspace_name=workspace,
+                                                                     bbox_filter=bbox,
+                                                                     order_by_list=['bbox'],
+                                                                     ordering_bbox=bbox,
+                                                                     limit=10)
+            assert list(infos['items'].keys()) == [(workspace, MAP_TYPE, f'map_{idx}') for idx in [12346, 12345, 12347]]
+
+            plan = db_util.run_query(f"""EXPLAIN (FORMAT JSON) select p.id
+from {DB_SCHEMA}.publications p
+where p.bbox::geometry && ST_MakeEnvelope(%s, %s, %s, %s)""", bbox)[0][0]
+        plan_str = json.dumps(plan)
+        assert 'publications_bbox_idx' in plan_str
+        assert 'Seq Scan' not in plan_str
@@ -1,16 +1,87 @@
 from functools import wraps
-from flask import request, current_app
+from flask import request, current_app, g
 
 from layman import settings, celery as celery_util
 from layman import LaymanError
 
-PUBLICATION_LOCKS_KEY = f'{__name__}:PUBLICATION_LOCKS'
+PUBLICATION_LOCK_KEY = f'{__name__}:PUBLICATION_LOCK:{{publication}}'
+PUBLICATION_LOCK_TOKEN_KEY = f'{__name__}:PUBLICATION_LOCK_TOKEN'
+FLASK_LOCK_TOKEN_KEY = f'{__name__}:LOCK_TOKEN'
+
+# Lock of a publication is a hash with lock method and fencing token, that expires unless it is refreshed.
+# Checking of current lock and acquiring the new one is done by one script, so it is atomic.
+_LOCK_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'method')
+local method = ARGV[1]
+local status = 'locked'
+if current and ARGV[4] ~= '1' then
+    if (current == 'patch' or current == 'post' or current == 'delete') and method == 'patch' then
+        return {'conflict', '', current}
+    end
+    if current == 'wfst' and redis.call('ZSCORE', KEYS[3], ARGV[2]) then
+        -- refresh after WFS-T is waiting for the end of burst of WFS-T requests
+        if method == 'patch' then
+            return {'conflict', '', current}
+        end
+        if method == 'wfst' then
+            redis.call('PEXPIRE', KEYS[1], ARGV[3])
+            return {'kept', redis.call('HGET', KEYS[1], 'token'), current}
+        end
+    end
+    if method ~= 'delete' then
+        if current == 'wfst' and method == 'wfst' then
+            status = 'abort'
+        else
+            return {'unexpected', '', current}
+        end
+    end
+end
+local token = tostring(redis.call('INCR', KEYS[2]))
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'method', method, 'token', token)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return {status, token, current or ''}
+"""
+_UNLOCK_SCRIPT = """
+local lock = redis.call('HMGET', KEYS[1], 'method', 'token')
+if not lock[1] or (ARGV[1] ~= '' and lock[2] ~= ARGV[1]) then
+    return 0
+end
+if #ARGV > 1 then
+    for idx = 2, #ARGV do
+        if ARGV[idx] == lock[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+    end
+    return 0
+end
+return redis.call('DEL', KEYS[1])
+"""
+_scripts = {}
+
+
+def _get_script(script):
+    if script not in _scripts:
+        _scripts[script] = settings.LAYMAN_REDIS.register_script(script)
+    return _scripts[script]
 
 
 def create_lock(workspace, publication_type, publication_name, error_code, method):
+    """Lock the publication if current lock allows it and return fencing token of the lock."""
     method = method.lower()
-    solve_locks(workspace, publication_type, publication_name, error_code, method)
-    lock_publication(workspace, publication_type, publication_name, method)
+    if method not in ['patch', 'delete', 'wfst', ]:
+        raise Exception(f"Unknown method to check: {method}")
+    status, token, current_lock = _lock(workspace, publication_type, publication_name, method)
+    if status == 'conflict':
+        raise LaymanError(error_code)
+    assert status != 'unexpected', \
+        f'current_lock={current_lock}, method={method},' \
+        f'workspace, publication_type, publication_name={(workspace, publication_type, publication_name)}'
+    if status == 'abort':
+        # chain of previous WFS-T request does not hold the new lock, so aborting it does not release the lock
+        chain_info = celery_util.get_publication_chain_info(workspace, publication_type, publication_name)
+        celery_util.abort_chain(chain_info)
+    return token
 
 
 def create_lock_decorator(publication_type, publication_name_key, error_code, is_chain_ready_fn):
@@ -19,17 +90,18 @@ def create_lock_decorator(publication_type, publication_name_key, error_code, is
         def decorated_function(*args, **kwargs):
             username = request.view_args['workspace']
             publication_name = request.view_args[publication_name_key]
-            create_lock(username, publication_type, publication_name, error_code, request.method)
+            lock_token = create_lock(username, publication_type, publication_name, error_code, request.method)
+            g.setdefault(FLASK_LOCK_TOKEN_KEY, lock_token)
             try:
                 result = f(*args, **kwargs)
                 if is_chain_ready_fn(username, publication_name):
-                    unlock_publication(username, publication_type, publication_name)
+                    unlock_publication(username, publication_type, publication_name, token=lock_token)
             except Exception as e:
                 try:
                     if is_chain_ready_fn(username, publication_name):
-                        unlock_publication(username, publication_type, publication_name)
+                        unlock_publication(username, publication_type, publication_name, token=lock_token)
                 finally:
-                    unlock_publication(username, publication_type, publication_name)
+                    unlock_publication(username, publication_type, publication_name, token=lock_token)
                 raise e
             return result
 
@@ -38,56 +110,77 @@ def create_lock_decorator(publication_type, publication_name_key, error_code, is
     return lock_decorator
 
 
+def get_request_lock_token():
+    """Fencing token of the lock created by lock_decorator for current request."""
+    return g.get(FLASK_LOCK_TOKEN_KEY)
+
+
 def get_publication_lock(workspace, publication_type, publication_name):
     rds = settings.LAYMAN_REDIS
-    key = PUBLICATION_LOCKS_KEY
-    hash = _get_publication_hash(workspace, publication_type, publication_name)
-    return rds.hget(key, hash)
+    key = _get_publication_lock_key(workspace, publication_type, publication_name)
+    return rds.hget(key, 'method')
+
+
+def get_publication_lock_token(workspace, publication_type, publication_name):
+    rds = settings.LAYMAN_REDIS
+    key = _get_publication_lock_key(workspace, publication_type, publication_name)
+    return rds.hget(key, 'token')
+
+
+def get_publication_locks():
+    """Return lock methods by publication hash, meant for checks only."""
+    rds = settings.LAYMAN_REDIS
+    keys = list(rds.scan_iter(match=PUBLICATION_LOCK_KEY.format(publication='*')))
+    with rds.pipeline() as pipe:
+        for key in keys:
+            pipe.hget(key, 'method')
+        methods = pipe.execute()
+    prefix_len = len(PUBLICATION_LOCK_KEY.format(publication=''))
+    return {
+        key[prefix_len:]: method for key, method in zip(keys, methods)
+        if method is not None
+    }
 
 
 def lock_publication(workspace, publication_type, publication_name, lock_method):
+    """Lock the publication regardless of current lock and return fencing token of the lock."""
     current_app.logger.info(f"Locking {workspace}:{publication_type}:{publication_name} with {lock_method.upper()}")
-    rds = settings.LAYMAN_REDIS
-    key = PUBLICATION_LOCKS_KEY
-    hash = _get_publication_hash(workspace, publication_type, publication_name)
-    value = lock_method.lower()
-    rds.hset(key, hash, value)
+    _, token, _ = _lock(workspace, publication_type, publication_name, lock_method.lower(), force=True)
+    return token
 
 
-def unlock_publication(workspace, publication_type, publication_name):
+def _lock(workspace, publication_type, publication_name, lock_method, force=False):
+    publ_hash = _get_publication_hash(workspace, publication_type, publication_name)
+    keys = [
+        _get_publication_lock_key(workspace, publication_type, publication_name),
+        PUBLICATION_LOCK_TOKEN_KEY,
+        celery_util.PUBLICATION_DEFERRED_CHAINS_ACTIVITY,
+    ]
+    args = [lock_method, publ_hash, settings.LAYMAN_PUBLICATION_LOCK_TIMEOUT * 1000, '1' if force else '0']
+    status, token, current_lock = _get_script(_LOCK_SCRIPT)(keys=keys, args=args)
+    return status, token, current_lock
+
+
+def refresh_publication_lock(workspace, publication_type, publication_name, pipe=None):
+    """Postpone expiration of current lock of the publication, if there is any."""
+    rds = pipe or settings.LAYMAN_REDIS
+    key = _get_publication_lock_key(workspace, publication_type, publication_name)
+    rds.pexpire(key, settings.LAYMAN_PUBLICATION_LOCK_TIMEOUT * 1000)
+
+
+def unlock_publication(workspace, publication_type, publication_name, token=None, lock_methods=None):
+    """Release lock of the publication.
+
+    If token is given, the lock is released only if it is still the same lock. If lock methods are given, the lock is
+    released only if it was created by one of them.
+    """
     current_app.logger.info(f"Unlocking {workspace}:{publication_type}:{publication_name}")
-    rds = settings.LAYMAN_REDIS
-    key = PUBLICATION_LOCKS_KEY
-    hash = _get_publication_hash(workspace, publication_type, publication_name)
-    rds.hdel(key, hash)
-
-
-def solve_locks(workspace, publication_type, publication_name, error_code, method):
-    current_lock = get_publication_lock(
-        workspace,
-        publication_type,
-        publication_name,
-    )
-    if current_lock is None:
-        return
-    if method not in ['patch', 'delete', 'wfst', ]:
-        raise Exception(f"Unknown method to check: {method}")
-    if current_lock not in ['patch', 'delete', 'post', 'wfst', ]:
-        raise Exception(f"Unknown current lock: {current_lock}")
-    if current_lock in ['patch', 'post']:
-        if method in ['patch', 'post']:
-            raise LaymanError(error_code)
-    elif current_lock in ['delete']:
-        if method in ['patch', 'post']:
-            raise LaymanError(error_code)
-    if method not in ['delete']:
-        if (current_lock, method) == ('wfst', 'wfst'):
-            chain_info = celery_util.get_publication_chain_info(workspace, publication_type, publication_name)
-            celery_util.abort_chain(chain_info)
-        else:
-            assert current_lock not in ['wfst', ] and method not in ['wfst', ],\
-                f'current_lock={current_lock}, method={method},' \
-                f'workspace, publication_type, publication_name={(workspace, publication_type, publication_name)}'
+    key = _get_publication_lock_key(workspace, publication_type, publication_name)
+    _get_script(_UNLOCK_SCRIPT)(keys=[key], args=[token or ''] + list(lock_methods or []))
+
+
+def _get_publication_lock_key(workspace, publication_type, publication_name):
+    return PUBLICATION_LOCK_KEY.format(publication=_get_publication_hash(workspace, publication_type, publication_name))
 
 
 def _get_publication_hash(workspace, publication_type, publication_name):
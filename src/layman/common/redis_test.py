@@ -0,0 +1,37 @@
+import pytest
+
+from layman import app, settings, LaymanError
+from layman.layer import LAYER_TYPE
+from . import redis as redis_util
+
+WORKSPACE = 'test_redis_lock_workspace'
+LAYERNAME = 'test_redis_lock_layer'
+
+
+def test_publication_lock():
+    with app.app_context():
+        redis_util.unlock_publication(WORKSPACE, LAYER_TYPE, LAYERNAME)
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) is None
+
+        token = redis_util.create_lock(WORKSPACE, LAYER_TYPE, LAYERNAME, 19, 'patch')
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) == 'patch'
+        assert redis_util.get_publication_lock_token(WORKSPACE, LAYER_TYPE, LAYERNAME) == token
+        key = redis_util._get_publication_lock_key(WORKSPACE, LAYER_TYPE, LAYERNAME)
+        assert 0 < settings.LAYMAN_REDIS.pttl(key) <= settings.LAYMAN_PUBLICATION_LOCK_TIMEOUT * 1000
+
+        with pytest.raises(LaymanError) as exc_info:
+            redis_util.create_lock(WORKSPACE, LAYER_TYPE, LAYERNAME, 19, 'patch')
+        assert exc_info.value.code == 19
+        assert redis_util.get_publication_lock_token(WORKSPACE, LAYER_TYPE, LAYERNAME) == token
+
+        delete_token = redis_util.create_lock(WORKSPACE, LAYER_TYPE, LAYERNAME, 19, 'delete')
+        assert int(delete_token) > int(token)
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) == 'delete'
+
+        # lock of former PATCH request was replaced, so it is not released by that request
+        redis_util.unlock_publication(WORKSPACE, LAYER_TYPE, LAYERNAME, token=token)
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) == 'delete'
+        redis_util.unlock_publication(WORKSPACE, LAYER_TYPE, LAYERNAME, token=delete_token, lock_methods=['patch'])
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) == 'delete'
+        redis_util.unlock_publication(WORKSPACE, LAYER_TYPE, LAYERNAME, token=delete_token)
+        assert redis_util.get_publication_lock(WORKSPACE, LAYER_TYPE, LAYERNAME) is None
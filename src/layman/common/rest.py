@@ -1,5 +1,8 @@
+import base64
+import binascii
 import re
-from flask import jsonify, make_response
+import urllib.parse
+from flask import json, request, stream_with_context, Response
 
 from layman import settings, util as layman_util, LaymanError
 from layman.authn import is_user_with_name
@@ -200,6 +203,18 @@ def get_publications(publication_type, user, request_args=None, workspace=None):
     # Pagination
     limit = get_integer_from_param(request_args, consts.LIMIT, negative=False)
     offset = get_integer_from_param(request_args, consts.OFFSET, negative=False)
+    after = get_cursor_keys_from_param(request_args, consts.CURSOR, order_by_value)
+
+    if after is not None and offset is not None:
+        raise LaymanError(48, f'Parameters "{consts.CURSOR}" and "{consts.OFFSET}" cannot be used together.')
+
+    total_count_mode = request_args.get(consts.TOTAL_COUNT) or (consts.TOTAL_COUNT_NONE if after is not None
+                                                                else consts.TOTAL_COUNT_EXACT)
+    if total_count_mode not in consts.TOTAL_COUNT_MODES:
+        raise LaymanError(2, {'parameter': consts.TOTAL_COUNT, 'supported_values': consts.TOTAL_COUNT_MODES})
+
+    # whole listing is streamed from DB cursor, pages are small enough to be selected at once
+    stream = limit is None
 
     #########################################################
     publication_infos_whole = layman_util.get_publication_infos_with_metainfo(publ_type=publication_type,
@@ -213,9 +228,16 @@ def get_publications(publication_type, user, request_args=None, workspace=None):
                                                                               order_by_list=order_by_list,
                                                                               ordering_full_text=ordering_full_text,
                                                                               ordering_bbox=ordering_bbox,
+                                                                              after=after,
+                                                                              total_count_mode=total_count_mode,
+                                                                              stream=stream,
                                                                               )
+    # publications not readable by user were filtered out by the query, no need to check them again
+    from layman import authz
+    authz.set_filtered_by_reader(user)
 
-    infos = [
+    items = publication_infos_whole['items'] if stream else publication_infos_whole['items'].items()
+    infos = (
         {
             'name': name,
             'workspace': workspace,
@@ -226,10 +248,56 @@ def get_publications(publication_type, user, request_args=None, workspace=None):
             'updated_at': info['updated_at'].isoformat(),
             'bounding_box': info['bounding_box'],
         }
-        for (workspace, _, name), info in publication_infos_whole['items'].items()
-    ]
-    response = make_response(jsonify(infos), 200)
-    response.headers['X-Total-Count'] = publication_infos_whole['total_count']
-    response.headers['Content-Range'] = f'items {publication_infos_whole["content_range"][0]}-' \
-                                        f'{publication_infos_whole["content_range"][1]}/{publication_infos_whole["total_count"]}'
+        for (workspace, _, name), info in items
+    )
+    response = Response(stream_with_context(iter_json_array(infos)), 200, mimetype='application/json')
+    total_count = publication_infos_whole['total_count']
+    if total_count is not None:
+        response.headers['X-Total-Count'] = total_count
+    if publication_infos_whole['total_count_estimate'] is not None:
+        response.headers['X-Total-Count-Estimate'] = publication_infos_whole['total_count_estimate']
+    if publication_infos_whole['content_range'] is not None:
+        response.headers['Content-Range'] = f'items {publication_infos_whole["content_range"][0]}-' \
+                                            f'{publication_infos_whole["content_range"][1]}/' \
+                                            f'{total_count if total_count is not None else "*"}'
+    if publication_infos_whole['next_keys'] is not None:
+        next_cursor = encode_cursor(order_by_value, publication_infos_whole['next_keys'])
+        response.headers['Link'] = f'<{get_next_page_url(request_args, next_cursor)}>; rel="next"'
     return response
+
+
+def iter_json_array(items):
+    yield '['
+    for idx, item in enumerate(items):
+        yield (',' if idx else '') + json.dumps(item)
+    yield ']'
+
+
+def encode_cursor(order_by_value, keys):
+    cursor_json = json.dumps({'order_by': order_by_value, 'keys': keys}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(cursor_json.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def get_cursor_keys_from_param(request_args, param_name, order_by_value):
+    keys = None
+    if request_args.get(param_name):
+        cursor = request_args[param_name]
+        try:
+            cursor_obj = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            cursor_obj = None
+        if not isinstance(cursor_obj, dict) or not isinstance(cursor_obj.get('keys'), list):
+            raise LaymanError(2, {'parameter': param_name, 'expected': 'Value of cursor taken from previous page'})
+        if cursor_obj.get('order_by') != order_by_value:
+            raise LaymanError(48, f'Parameter "{param_name}" can be used only with the same ordering as the '
+                                  f'previous page.')
+        keys = cursor_obj['keys']
+    return keys
+
+
+def get_next_page_url(request_args, cursor):
+    query_params = [(key, value) for key, values in request_args.lists() for value in values
+                    if key not in (consts.CURSOR, consts.OFFSET)]
+    query_params.append((consts.CURSOR, cursor))
+    url = layman_util.url_for(request.endpoint, **request.view_args)
+    return url + '?' + urllib.parse.urlencode(query_params)
@@ -1,13 +1,16 @@
+from collections import OrderedDict
 import importlib
 import inspect
-from celery import chain
+from celery import chain, group
+from celery.canvas import maybe_signature
+from celery.utils import uuid
 
 from layman import settings
 
 
 def get_task_chain(publ_type, workspace, publ_name, task_options, start_at, publ_param_name):
     methods = get_task_methods(publ_type, workspace, publ_name, task_options, start_at)
-    return get_chain_of_methods(workspace, publ_name, methods, task_options, publ_param_name)
+    return get_chain_of_methods(workspace, publ_name, methods, task_options, publ_param_name, publ_type=publ_type)
 
 
 def get_task_methods(publ_type, workspace, publ_name, task_options, start_at):
@@ -49,11 +52,120 @@ def get_source_task_methods(publ_type, method_name):
     return task_methods
 
 
-def get_chain_of_methods(workspace, publ_name, task_methods, task_options, publ_param_name):
-    return chain(*[
-        _get_task_signature(workspace, publ_name, t, task_options, publ_param_name)
+def get_chain_of_methods(workspace, publ_name, task_methods, task_options, publ_param_name, publ_type=None):
+    """Build Celery canvas of task methods given in order of internal sources.
+
+    If publication type is given, tasks independent on each other according to its `task_dependencies` run in
+    parallel (as groups), otherwise tasks run one after another. Every task has its ID assigned in advance.
+    """
+    signatures = OrderedDict(
+        (t.name, _get_task_signature(workspace, publ_name, t, task_options, publ_param_name))
         for t in task_methods
-    ])
+    )
+    for sig in signatures.values():
+        sig.set(task_id=uuid())
+    if publ_type is None:
+        return chain(*signatures.values())
+    if not signatures:
+        return chain()
+    ancestors = _get_task_ancestors(publ_type, list(signatures.keys()))
+    canvas = _get_canvas(list(signatures.keys()), signatures, ancestors)
+    return canvas if canvas.subtask_type == 'chain' else chain(canvas)
+
+
+def get_task_source_name(task_name):
+    # task names start with name of internal source the task changes
+    return task_name.rsplit('.', 1)[0]
+
+
+def _get_source_dependencies(publ_type, source_name):
+    dependencies = publ_type.get('task_dependencies', {})
+    if source_name in dependencies:
+        return dependencies[source_name]
+    # by default, task of internal source depends on task of preceding internal source
+    source_names = list(publ_type['internal_sources'].keys())
+    source_idx = source_names.index(source_name)
+    return source_names[source_idx - 1:source_idx]
+
+
+def _get_task_ancestors(publ_type, task_names):
+    """Return all (also indirect) dependencies of each task among given tasks.
+
+    Dependency on internal source without task among given tasks is replaced by dependencies of that source.
+    """
+    task_names_by_source = {get_task_source_name(task_name): task_name for task_name in task_names}
+
+    def get_source_ancestors(source_name):
+        result = set()
+        for dep_source_name in _get_source_dependencies(publ_type, source_name):
+            if dep_source_name in task_names_by_source:
+                result.add(task_names_by_source[dep_source_name])
+            result.update(get_source_ancestors(dep_source_name))
+        return result
+
+    return {
+        task_name: get_source_ancestors(get_task_source_name(task_name))
+        for task_name in task_names
+    }
+
+
+def _get_components(task_names, ancestors):
+    """Split tasks into groups of tasks dependent on each other, keeping order of tasks."""
+    components = []
+    for task_name in task_names:
+        related = [c for c in components if ancestors[task_name].intersection(c)]
+        component = [name for c in related for name in c] + [task_name]
+        components = [c for c in components if c not in related]
+        components.append(component)
+    components.sort(key=lambda c: task_names.index(c[0]))
+    return [sorted(c, key=task_names.index) for c in components]
+
+
+def _get_canvas(task_names, signatures, ancestors):
+    components = _get_components(task_names, ancestors)
+    if len(components) > 1:
+        return group(*[_get_canvas(c, signatures, ancestors) for c in components])
+    steps = []
+    rest = task_names
+    while len(rest) > 1 and len(_get_components(rest, ancestors)) == 1:
+        # split where every following task depends on every preceding one, so no parallelism is lost
+        cut_idx = next((
+            idx for idx in range(1, len(rest))
+            if all(ancestors[name].issuperset(rest[:idx]) for name in rest[idx:])
+        ), 1)
+        steps.append(_get_canvas(rest[:cut_idx], signatures, ancestors))
+        rest = rest[cut_idx:]
+    steps.append(_get_canvas(rest, signatures, ancestors) if len(rest) > 1 else signatures[rest[0]])
+    return chain(*steps) if len(steps) > 1 else steps[0]
+
+
+def get_canvas_signatures(canvas):
+    """Signatures of all tasks of the canvas (chain, group, chord, or single task)."""
+    canvas = maybe_signature(canvas)
+    if canvas.subtask_type in ('chain', 'group', 'chord'):
+        result = [sig for task in canvas.tasks for sig in get_canvas_signatures(task)]
+        if canvas.subtask_type == 'chord':
+            result += get_canvas_signatures(canvas.body)
+        return result
+    return [canvas]
+
+
+def get_canvas_last_signatures(canvas):
+    """Signatures of tasks of the canvas that no other task of the canvas waits for."""
+    canvas = maybe_signature(canvas)
+    if canvas.subtask_type == 'chain':
+        return get_canvas_last_signatures(canvas.tasks[-1]) if canvas.tasks else []
+    if canvas.subtask_type == 'group':
+        return [sig for task in canvas.tasks for sig in get_canvas_last_signatures(task)]
+    if canvas.subtask_type == 'chord':
+        return get_canvas_last_signatures(canvas.body)
+    return [canvas]
+
+
+def ensure_task_ids(canvas):
+    for sig in get_canvas_signatures(canvas):
+        if sig.id is None:
+            sig.set(task_id=uuid())
 
 
 def _get_task_signature(workspace, publ_name, task, task_options, publ_param_name):
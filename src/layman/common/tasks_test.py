@@ -0,0 +1,61 @@
+import pytest
+
+from layman.layer import get_layer_type_def
+from layman.layer.db import tasks as db_tasks
+from layman.layer.filesystem import tasks as filesystem_tasks
+from layman.layer.geoserver import tasks as geoserver_tasks
+from layman.layer.micka import tasks as micka_tasks
+from layman.layer.prime_db_schema import tasks as prime_db_schema_tasks
+from layman.layer.qgis import tasks as qgis_tasks
+from . import tasks as tasks_util
+
+LAYER_TASKS = [
+    filesystem_tasks.refresh_input_chunk,
+    db_tasks.refresh_table,
+    prime_db_schema_tasks.refresh_bbox,
+    qgis_tasks.refresh_wms,
+    geoserver_tasks.refresh_wfs,
+    geoserver_tasks.refresh_wms,
+    geoserver_tasks.refresh_sld,
+    filesystem_tasks.refresh_thumbnail,
+    micka_tasks.refresh_soap,
+]
+
+
+@pytest.mark.parametrize('tasks, expected_last_tasks, expected_parallel_tasks', [
+    pytest.param(LAYER_TASKS, [filesystem_tasks.refresh_thumbnail, micka_tasks.refresh_soap], [
+        (qgis_tasks.refresh_wms, geoserver_tasks.refresh_wfs),
+        (geoserver_tasks.refresh_sld, micka_tasks.refresh_soap),
+        (filesystem_tasks.refresh_thumbnail, micka_tasks.refresh_soap),
+    ], id='post'),
+    pytest.param(LAYER_TASKS[4:], [filesystem_tasks.refresh_thumbnail, micka_tasks.refresh_soap], [
+        (geoserver_tasks.refresh_sld, micka_tasks.refresh_soap),
+    ], id='patch_from_wfs'),
+    pytest.param([qgis_tasks.refresh_wms, geoserver_tasks.refresh_wfs, micka_tasks.refresh_soap], [micka_tasks.refresh_soap], [
+        (qgis_tasks.refresh_wms, geoserver_tasks.refresh_wfs),
+    ], id='skipped_tasks'),
+])
+def test_get_chain_of_methods(tasks, expected_last_tasks, expected_parallel_tasks):
+    publ_type = get_layer_type_def()
+    task_names = [t.name for t in tasks]
+    canvas = tasks_util.get_chain_of_methods('workspace', 'layername', tasks, {}, 'layername', publ_type=publ_type)
+    signatures = tasks_util.get_canvas_signatures(canvas)
+    assert [sig.task for sig in signatures] == task_names
+    assert len({sig.id for sig in signatures}) == len(tasks)
+    assert [sig.task for sig in tasks_util.get_canvas_last_signatures(canvas)] == [t.name for t in expected_last_tasks]
+
+    ancestors = tasks_util._get_task_ancestors(publ_type, task_names)
+    parallel_tasks = [
+        (task_name, other_task_name)
+        for idx, task_name in enumerate(task_names)
+        for other_task_name in task_names[idx + 1:]
+        if task_name not in ancestors[other_task_name]
+    ]
+    assert parallel_tasks == [(t1.name, t2.name) for t1, t2 in expected_parallel_tasks]
+
+
+def test_get_chain_of_methods_linear():
+    canvas = tasks_util.get_chain_of_methods('workspace', 'layername', LAYER_TASKS, {}, 'layername')
+    signatures = tasks_util.get_canvas_signatures(canvas)
+    assert [sig.task for sig in signatures] == [t.name for t in LAYER_TASKS]
+    assert tasks_util.get_canvas_last_signatures(canvas) == signatures[-1:]
@@ -1,16 +1,18 @@
+import io
+import itertools
 import re
 import traceback
 
-import requests
 from lxml import etree as ET
 
 from flask import Blueprint, g, current_app as app, request, Response
 
-from geoserver.util import reset as gs_reset
+from geoserver import session as gs_session, util as gs_util
 from layman import authn, authz, settings
 from layman.authn import authenticate, is_user_with_name
 from layman.common import redis
 from layman.layer import db, LAYER_TYPE, util as layer_util
+from layman.layer.geoserver import wms as gs_wms
 from layman.layer.qgis import wms as qgis_wms
 from layman.layer.util import LAYERNAME_PATTERN, ATTRNAME_PATTERN, patch_after_wfst
 from layman.util import USERNAME_ONLY_PATTERN
@@ -18,6 +20,12 @@ from layman.util import USERNAME_ONLY_PATTERN
 
 bp = Blueprint('geoserver_proxy_bp', __name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+# WFS-T can come with any content type (e.g. text/plain or application/x-www-form-urlencoded), so beginning of every POST
+# body is read to find out if it is XML
+BODY_PREFIX_SIZE = 1024
+XML_BOMS = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff', )
+
 
 @bp.before_request
 @authenticate
@@ -26,38 +34,79 @@ def before_request():
 
 
 def extract_attributes_and_layers_from_wfs_t(binary_data):
-    xml_tree = ET.XML(binary_data)
-    version = xml_tree.get('version')[0:4]
-    service = xml_tree.get('service').upper()
+    return extract_attributes_and_layers_from_wfs_t_stream(io.BytesIO(binary_data))
+
+
+def extract_attributes_and_layers_from_wfs_t_stream(source):
+    """Extract edited attributes and layers from WFS-T document using incremental parsing.
+
+    Only names of actions, features, properties and value references are read, every element is cleared as soon as
+    it is parsed, so memory does not grow with the number of features.
+    """
     attribs = set()
     layers = set()
     result = (attribs, layers)
-    if service != 'WFS':
-        return result
-    if version not in ["2.0.", "1.0.", "1.1."]:
-        app.logger.warning(f"WFS Proxy: only xml versions 2.0, 1.1, 1.0 are supported. Request "
-                           f"only redirected. Version={xml_tree.get('version')}")
-        return result
+    checked_feature_attribs = set()
+    depth = 0
+    action = None
+    action_layer = None
+    feature_layer = None
 
-    for action in xml_tree:
-        action_qname = ET.QName(action)
-        if action_qname.localname in ('Insert', 'Replace',):
-            extracted_attribs = extract_attributes_from_wfs_t_insert_replace(action)
-            attribs.update(extracted_attribs)
-        elif action_qname.localname in ('Update',):
-            extracted_attribs = extract_attributes_from_wfs_t_update(action,
-                                                                     xml_tree,
-                                                                     major_version=version[0:1])
-            attribs.update(extracted_attribs)
-        elif action_qname.localname in ('Delete',):
-            layer = extract_layer_from_wfs_t_delete(action)
-            if layer:
-                layers.add(layer)
+    # body comes from public endpoint, so default limits of libxml2 (size, depth, entity expansion) are kept
+    for event, elem in ET.iterparse(source, events=('start', 'end'), resolve_entities=False):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                if elem.getroottree().docinfo.internalDTD is not None:
+                    # WFS-T does not need DTD, entities declared in it are never expanded
+                    raise ValueError('WFS-T with internal DTD subset is not supported')
+                version = elem.get('version')[0:4]
+                service = elem.get('service').upper()
+                if service != 'WFS':
+                    return result
+                if version not in ["2.0.", "1.0.", "1.1."]:
+                    app.logger.warning(f"WFS Proxy: only xml versions 2.0, 1.1, 1.0 are supported. Request "
+                                       f"only redirected. Version={elem.get('version')}")
+                    return result
+                wfs_namespace = ET.QName(elem).namespace
+                value_ref_string = "Name" if version[0:1] == "1" else "ValueReference"
+                property_tag = ET.QName(wfs_namespace, 'Property').text
+                value_ref_tag = ET.QName(wfs_namespace, value_ref_string).text
+            elif depth == 2:
+                action = ET.QName(elem)
+                action_layer = None
+                if action.localname in ('Update',):
+                    ws_namespace, ws_name, layer_name = extract_layer_info_from_wfs_t_update_delete(elem)
+                    if layer_name and ws_name:
+                        action_layer = (ws_namespace, ws_name, layer_name)
+                elif action.localname in ('Delete',):
+                    layer = extract_layer_from_wfs_t_delete(elem)
+                    if layer:
+                        layers.add(layer)
+            elif depth == 3 and action.localname in ('Insert', 'Replace',):
+                feature_layer = extract_layer_info_from_wfs_t_insert_replace(elem, action)
+            elif depth == 4 and action.localname in ('Insert', 'Replace',) and feature_layer \
+                    and (feature_layer, elem.tag) not in checked_feature_attribs:
+                # features of the same layer usually repeat the same properties, each is checked only once
+                checked_feature_attribs.add((feature_layer, elem.tag))
+                attrib = extract_attribute_from_wfs_t_insert_replace(elem, feature_layer)
+                if attrib:
+                    attribs.add(attrib)
+        else:
+            if depth == 4 and action.localname in ('Update',) and action_layer \
+                    and elem.tag == value_ref_tag and elem.getparent().tag == property_tag:
+                attrib = extract_attribute_from_wfs_t_update(elem.text, action_layer)
+                if attrib:
+                    attribs.add(attrib)
+            depth -= 1
+            if depth > 0:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
 
     for attrib in attribs:
         layers.add(attrib[:2])
 
-    result = (attribs, layers)
     return result
 
 
@@ -67,11 +116,17 @@ def ensure_wfs_t_attributes(attribs):
     created_attributes = db.ensure_attributes(editable_attribs)
     if created_attributes:
         changed_layers = {(workspace, layer) for workspace, layer, _ in created_attributes}
-        qgis_changed_layers = {(workspace, layer) for workspace, layer in changed_layers
-                               if layer_util.get_layer_info(workspace, layer, context={'keys': ['style_type'], })['style_type'] == 'qml'}
+        style_types = {(workspace, layer): layer_util.get_layer_info(workspace, layer, context={'keys': ['style_type'], })['style_type']
+                       for workspace, layer in changed_layers}
+        qgis_changed_layers = {(workspace, layer) for (workspace, layer), style_type in style_types.items()
+                               if style_type == 'qml'}
         for workspace, layer in qgis_changed_layers:
             qgis_wms.save_qgs_file(workspace, layer)
-        gs_reset(settings.LAYMAN_GS_AUTH)
+        # feature types of WFS, and of WMS in case of SLD style, are published from DB stores
+        gs_workspaces = {workspace for workspace, _ in changed_layers}
+        gs_workspaces.update(gs_wms.get_geoserver_workspace(workspace) for (workspace, _), style_type in style_types.items()
+                             if style_type == 'sld')
+        gs_util.reset_data_stores(gs_workspaces, settings.LAYMAN_GS_AUTH)
 
 
 def extract_layer_from_wfs_t_delete(action):
@@ -101,70 +156,96 @@ def extract_layer_info_from_wfs_t_update_delete(action):
     return result
 
 
-def extract_attributes_from_wfs_t_update(action, xml_tree, major_version="2"):
-    attribs = set()
-    ws_namespace, ws_name, layer_name = extract_layer_info_from_wfs_t_update_delete(action)
-    if not (layer_name and ws_name):
-        return attribs
-    value_ref_string = "Name" if major_version == "1" else "ValueReference"
-    properties = action.xpath('wfs:Property/wfs:' + value_ref_string, namespaces=xml_tree.nsmap)
-    for prop in properties:
-        split_text = prop.text.split(':')
-        # No namespace in element text
-        if len(split_text) == 1:
-            attrib_name = split_text[0]
-        # There is namespace in element text
-        elif len(split_text) == 2:
-            if split_text[0] != ws_namespace:
-                app.logger.warning(f"WFS Proxy: skipping due to different namespace in layer and in "
-                                   f"property. Layer namespace={ws_namespace}, "
-                                   f"property namespace={split_text[0]}")
-                continue
-            attrib_name = split_text[1]
-        attrib_match = re.match(ATTRNAME_PATTERN, attrib_name)
-        if not attrib_match:
-            app.logger.warning(f"WFS Proxy: skipping due to wrong attribute name. "
-                               f"Property={attrib_name}")
-            continue
-        attribs.add((ws_name,
-                     layer_name,
-                     attrib_name))
-    return attribs
-
-
-def extract_attributes_from_wfs_t_insert_replace(action):
-    attribs = set()
-    for layer in action:
-        layer_qname = ET.QName(layer)
-        ws_namespace = layer_qname.namespace
-        ws_match = re.match(r"^http://(" + USERNAME_ONLY_PATTERN + ")$", ws_namespace)
-        if ws_match:
-            ws_name = ws_match.group(1)
-        else:
-            if ws_namespace != 'http://www.opengis.net/ogc' and not ws_namespace.startswith('http://www.opengis.net/fes/'):
-                app.logger.warning(f"WFS Proxy: skipping due to wrong namespace name. Namespace={ws_namespace}, action={ET.QName(action)}")
-            continue
-        layer_name = layer_qname.localname
-        layer_match = re.match(LAYERNAME_PATTERN, layer_name)
-        if not layer_match:
-            app.logger.warning(f"WFS Proxy: skipping due to wrong layer name. Layer name={layer_name}")
-            continue
-        for attrib in layer:
-            attrib_qname = ET.QName(attrib)
-            if attrib_qname.namespace != ws_namespace:
-                app.logger.warning(f"WFS Proxy: skipping due to different namespace in layer and in "
-                                   f"property. Layer namespace={ws_namespace}, "
-                                   f"property namespace={attrib_qname.namespace}")
-                continue
-            attrib_name = attrib_qname.localname
-            attrib_match = re.match(ATTRNAME_PATTERN, attrib_name)
-            if not attrib_match:
-                app.logger.warning(f"WFS Proxy: skipping due to wrong property name. Property name={attrib_name}")
-                continue
-            attribs.add((ws_name,
-                         layer_name,
-                         attrib_name))
-    return attribs
+def extract_attribute_from_wfs_t_update(value_reference, layer_info):
+    ws_namespace, ws_name, layer_name = layer_info
+    split_text = value_reference.split(':')
+    # No namespace in element text
+    if len(split_text) == 1:
+        attrib_name = split_text[0]
+    # There is namespace in element text
+    elif len(split_text) == 2:
+        if split_text[0] != ws_namespace:
+            app.logger.warning(f"WFS Proxy: skipping due to different namespace in layer and in "
+                               f"property. Layer namespace={ws_namespace}, "
+                               f"property namespace={split_text[0]}")
+            return None
+        attrib_name = split_text[1]
+    attrib_match = re.match(ATTRNAME_PATTERN, attrib_name)
+    if not attrib_match:
+        app.logger.warning(f"WFS Proxy: skipping due to wrong attribute name. "
+                           f"Property={attrib_name}")
+        return None
+    return (ws_name,
+            layer_name,
+            attrib_name)
+
+
+def extract_layer_info_from_wfs_t_insert_replace(layer, action_qname):
+    layer_qname = ET.QName(layer)
+    ws_namespace = layer_qname.namespace
+    ws_match = re.match(r"^http://(" + USERNAME_ONLY_PATTERN + ")$", ws_namespace)
+    if ws_match:
+        ws_name = ws_match.group(1)
+    else:
+        if ws_namespace != 'http://www.opengis.net/ogc' and not ws_namespace.startswith('http://www.opengis.net/fes/'):
+            app.logger.warning(f"WFS Proxy: skipping due to wrong namespace name. Namespace={ws_namespace}, action={action_qname}")
+        return None
+    layer_name = layer_qname.localname
+    layer_match = re.match(LAYERNAME_PATTERN, layer_name)
+    if not layer_match:
+        app.logger.warning(f"WFS Proxy: skipping due to wrong layer name. Layer name={layer_name}")
+        return None
+    return (ws_namespace, ws_name, layer_name)
+
+
+def extract_attribute_from_wfs_t_insert_replace(attrib, layer_info):
+    ws_namespace, ws_name, layer_name = layer_info
+    attrib_qname = ET.QName(attrib)
+    if attrib_qname.namespace != ws_namespace:
+        app.logger.warning(f"WFS Proxy: skipping due to different namespace in layer and in "
+                           f"property. Layer namespace={ws_namespace}, "
+                           f"property namespace={attrib_qname.namespace}")
+        return None
+    attrib_name = attrib_qname.localname
+    attrib_match = re.match(ATTRNAME_PATTERN, attrib_name)
+    if not attrib_match:
+        app.logger.warning(f"WFS Proxy: skipping due to wrong property name. Property name={attrib_name}")
+        return None
+    return (ws_name,
+            layer_name,
+            attrib_name)
+
+
+def read_stream_prefix(stream, size=BODY_PREFIX_SIZE):
+    prefix = b''
+    while len(prefix) < size:
+        chunk = stream.read(size - len(prefix))
+        if not chunk:
+            break
+        prefix += chunk
+    return prefix
+
+
+def is_wfs_t_candidate(body_prefix):
+    # only XML bodies can be WFS-T and need to be inspected regardless of content type, other bodies are streamed
+    if body_prefix.startswith(XML_BOMS):
+        return True
+    return body_prefix.lstrip().startswith(b'<')
+
+
+def iter_stream(stream, chunk_size=STREAM_CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_response_content(response, chunk_size=STREAM_CHUNK_SIZE):
+    try:
+        yield from response.iter_content(chunk_size=chunk_size)
+    finally:
+        response.close()
 
 
 @bp.route('/<path:subpath>', methods=['POST', 'GET'])
@@ -173,38 +254,56 @@ def proxy(subpath):
 
     url = settings.LAYMAN_GS_URL + subpath + '?' + request.query_string.decode('UTF-8')
     headers_req = {key.lower(): value for (key, value) in request.headers if key.lower() not in ['host', settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE.lower()]}
-    data = request.get_data()
     authn_username = authn.get_authn_username()
     if is_user_with_name(authn_username):
         headers_req[settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE] = authn_username
 
     app.logger.info(f"{request.method} GeoServer proxy, headers_req={headers_req}, url={url}")
     changing_wfs_t_layers = set()
-    if data is not None and len(data) > 0:
+    wfs_t_lock_tokens = {}
+    body_prefix = read_stream_prefix(request.stream) if request.method == 'POST' else b''
+    if is_wfs_t_candidate(body_prefix):
+        data = body_prefix + request.stream.read()
         try:
             wfs_t_attribs, wfs_t_layers = extract_attributes_and_layers_from_wfs_t(data)
             changing_wfs_t_layers = {(workspace, layer) for workspace, layer in wfs_t_layers if authz.can_i_edit(LAYER_TYPE, workspace, layer)}
             for workspace, layer in changing_wfs_t_layers:
-                redis.create_lock(workspace, LAYER_TYPE, layer, 19, 'wfst')
+                wfs_t_lock_tokens[(workspace, layer)] = redis.create_lock(workspace, LAYER_TYPE, layer, 19, 'wfst')
             if wfs_t_attribs:
                 ensure_wfs_t_attributes(wfs_t_attribs)
         except BaseException as err:
             app.logger.warning(f"WFS Proxy: error={err}, trace={traceback.format_exc()}")
-    response = requests.request(method=request.method,
-                                url=url,
-                                data=data,
-                                headers=headers_req,
-                                cookies=request.cookies,
-                                allow_redirects=False
-                                )
-
-    for workspace, layername in changing_wfs_t_layers:
-        patch_after_wfst(workspace, layername)
-
-    excluded_headers = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
+    elif len(body_prefix) == BODY_PREFIX_SIZE:
+        # rest of the body is sent with chunked transfer encoding
+        headers_req.pop('content-length', None)
+        data = itertools.chain([body_prefix], iter_stream(request.stream))
+    else:
+        # whole body (if any) was already read
+        data = body_prefix if request.method == 'POST' else None
+    response = gs_session.proxy_request(method=request.method,
+                                        url=url,
+                                        data=data,
+                                        headers=headers_req,
+                                        cookies=request.cookies,
+                                        allow_redirects=False,
+                                        stream=True,
+                                        )
+
+    if changing_wfs_t_layers:
+        # transaction is finished when whole response is read
+        content = response.content
+        for workspace, layername in changing_wfs_t_layers:
+            patch_after_wfst(workspace, layername, wfs_t_lock_tokens.get((workspace, layername)))
+    else:
+        content = iter_response_content(response)
+
+    excluded_headers = ['content-encoding', 'transfer-encoding', 'connection']
+    # content is decoded by requests, so original length is valid only for not encoded content
+    if 'content-encoding' in response.headers or changing_wfs_t_layers:
+        excluded_headers.append('content-length')
     headers = {key: value for (key, value) in response.headers.items() if key.lower() not in excluded_headers}
 
-    final_response = Response(response.content,
+    final_response = Response(content,
                               response.status_code,
                               headers)
     return final_response
@@ -1,13 +1,16 @@
+import io
+import json
 import time
 from test import process_client as client_util, geoserver_client, util as test_util
 from test.process_client import get_authz_headers
 from test.data import wfs as data_wfs, SMALL_LAYER_BBOX
 import requests
+from lxml import etree as ET
 from owslib.feature.schema import get_schema as get_wfs_schema
 import pytest
 
 from geoserver.util import get_layer_thumbnail, get_square_bbox
-from layman import app, settings, util as layman_util
+from layman import app, settings, util as layman_util, geoserver_proxy, celery as celery_util
 from layman.common import bbox as bbox_util
 from layman.layer import db, util as layer_util
 from layman.layer.filesystem import thumbnail
@@ -159,6 +162,47 @@ def test_wms_ows_proxy(service_endpoint):
     client_util.delete_workspace_layer(username, layername, headers=authn_headers)
 
 
+@pytest.mark.usefixtures('ensure_layman', 'liferay_mock')
+def test_streamed_proxy():
+    username = 'test_streamed_proxy_user'
+    layername = 'test_streamed_proxy_layer'
+
+    authn_headers = get_authz_headers(username)
+
+    client_util.ensure_reserved_username(username, headers=authn_headers)
+    client_util.publish_workspace_layer(username, layername, file_paths=[
+        'tmp/naturalearth/110m/cultural/ne_110m_admin_0_countries.geojson',
+    ], headers=authn_headers)
+
+    wfs_url = geoserver_client.get_wfs_url(username)
+    params = {
+        'service': 'WFS',
+        'version': '2.0.0',
+        'request': 'GetFeature',
+        'typeNames': f'{username}:{layername}',
+        'outputFormat': 'application/json',
+    }
+    direct_url = f'{settings.LAYMAN_GS_URL}{username}/wfs'
+    direct_headers = {settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE: username}
+    r_direct = requests.get(direct_url, params=params, headers=direct_headers)
+    r_direct.raise_for_status()
+    features = r_direct.json()['features']
+    assert len(features) == 177
+
+    # streamed response
+    with requests.get(wfs_url, params=params, headers=authn_headers, stream=True) as r_get:
+        r_get.raise_for_status()
+        content = b''.join(r_get.iter_content(chunk_size=1024))
+    assert json.loads(content)['features'] == features
+
+    # streamed request body
+    r_post = requests.post(wfs_url, data=params, headers=authn_headers)
+    r_post.raise_for_status()
+    assert r_post.json()['features'] == features
+
+    client_util.delete_workspace_layer(username, layername, headers=authn_headers)
+
+
 @pytest.mark.usefixtures('ensure_layman', 'liferay_mock')
 @pytest.mark.parametrize('style_file', [
     None,
@@ -427,8 +471,7 @@ def test_wfs_bbox(style_file, thumbnail_style_postfix):
                           headers=headers)
         assert r.status_code == 200, r.text
 
-        # until there is way to check end of asynchronous task after WFS-T
-        time.sleep(5)
+        client_util.wait_for_workspace_layer_chain(workspace, layer)
 
         assert_all_sources_bbox(workspace, layer, exp_bbox)
 
@@ -439,3 +482,135 @@ def test_wfs_bbox(style_file, thumbnail_style_postfix):
         assert diffs < 100, expected_thumbnail_path
 
     client_util.delete_workspace_layer(workspace, layer, )
+
+
+@pytest.mark.usefixtures('ensure_layman')
+def test_wfst_refresh_coalesced():
+    workspace = 'test_wfst_refresh_coalesced_workspace'
+    layer = 'test_wfst_refresh_coalesced_layer'
+
+    client_util.publish_workspace_layer(workspace, layer)
+
+    rest_url = f"http://{settings.LAYMAN_SERVER_NAME}/geoserver/{workspace}/wfs?request=Transaction"
+    headers = {
+        'Accept': 'text/xml',
+        'Content-type': 'text/xml',
+    }
+
+    chain_ids = set()
+    for _ in range(3):
+        r = requests.post(rest_url,
+                          data=data_wfs.get_wfs20_insert_points(workspace, layer),
+                          headers=headers)
+        assert r.status_code == 200, r.text
+        with app.app_context():
+            chain_info = celery_util.get_publication_chain_info_dict(workspace, client_util.LAYER_TYPE, layer)
+        assert not chain_info['finished']
+        chain_ids.add(chain_info['last'])
+    assert len(chain_ids) == 1
+
+    client_util.wait_for_workspace_layer_chain(workspace, layer)
+    with app.app_context():
+        assert celery_util.is_chain_successful(celery_util.get_publication_chain_info(workspace, client_util.LAYER_TYPE, layer))
+    assert_all_sources_bbox(workspace, layer, (1571000.0, 6268800.0, 1572590.8542062, 6269876.33561699))
+
+    client_util.delete_workspace_layer(workspace, layer)
+
+
+@pytest.mark.parametrize('data_xml, exp_attribs, exp_layers', [
+    (data_wfs.get_wfs20_delete_point('ws_stream', 'layer1'), set(), {('ws_stream', 'layer1')}),
+    (data_wfs.get_wfs10_update_points_new('ws_stream', 'layer1', ['attr1'], with_attr_namespace=True, with_filter=True),
+     {('ws_stream', 'layer1', 'attr1')}, {('ws_stream', 'layer1')}),
+    (data_wfs.get_wfs20_complex_new_attr('ws_stream', 'layer1', 'layer2', ['attr1'], ['attr2'], ['attr3'], ['attr4']),
+     {('ws_stream', layer, attr) for layer, attr in [
+         ('layer1', 'wkb_geometry'), ('layer1', 'name'), ('layer1', 'labelrank'), ('layer1', 'attr1'), ('layer1', 'attr4'),
+         ('layer2', 'wkb_geometry'), ('layer2', 'name'), ('layer2', 'labelrank'), ('layer2', 'attr2'), ('layer2', 'attr3'),
+     ]}, {('ws_stream', 'layer1'), ('ws_stream', 'layer2')}),
+])
+def test_extract_attributes_and_layers_from_wfs_t(data_xml, exp_attribs, exp_layers):
+    with app.app_context():
+        attribs, layers = geoserver_proxy.extract_attributes_and_layers_from_wfs_t(data_xml.encode())
+    assert attribs == exp_attribs
+    assert layers == exp_layers
+
+
+def test_extract_attributes_and_layers_from_large_wfs_t():
+    workspace = 'ws_stream'
+    layername = 'layer1'
+    feature_count = 50000
+    attr_names = [f'attr{idx}' for idx in range(7)]
+    features = ''.join(
+        f"""<{workspace}:{layername}>
+               <{workspace}:wkb_geometry>
+                   <gml:Point srsName="urn:ogc:def:crs:EPSG::3857" srsDimension="2">
+                       <gml:pos>{1571000 + idx} 6268800</gml:pos>
+                   </gml:Point>
+               </{workspace}:wkb_geometry>
+               <{workspace}:{attr_names[idx % len(attr_names)]}>value {idx}</{workspace}:{attr_names[idx % len(attr_names)]}>
+           </{workspace}:{layername}>"""
+        for idx in range(feature_count)
+    )
+    data_xml = data_wfs.get_wfs20_insert_points(workspace, layername).replace('<wfs:Insert>', '<wfs:Insert>' + features)
+
+    with app.app_context():
+        attribs, layers = geoserver_proxy.extract_attributes_and_layers_from_wfs_t(data_xml.encode())
+    assert attribs == {(workspace, layername, attr_name) for attr_name in attr_names + ['wkb_geometry']}
+    assert layers == {(workspace, layername)}
+
+
+ENTITY_EXPANSION_WFS_T = """<?xml version="1.0"?>
+<!DOCTYPE lolz [
+ <!ENTITY lol "lol">
+ <!ENTITY lol1 "&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;">
+ <!ENTITY lol2 "&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;">
+ <!ENTITY lol3 "&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;">
+ <!ENTITY lol4 "&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;">
+ <!ENTITY lol5 "&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;">
+ <!ENTITY lol6 "&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;">
+ <!ENTITY lol7 "&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;">
+ <!ENTITY lol8 "&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;">
+ <!ENTITY lol9 "&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;">
+]>
+<wfs:Transaction xmlns:wfs="http://www.opengis.net/wfs/2.0" service="WFS" version="2.0.0">
+  <wfs:Update typeName="ws_stream:layer1">
+    <wfs:Property>
+      <wfs:ValueReference>&lol9;</wfs:ValueReference>
+    </wfs:Property>
+  </wfs:Update>
+</wfs:Transaction>"""
+
+DEEP_WFS_T = '<wfs:Transaction xmlns:wfs="http://www.opengis.net/wfs/2.0" service="WFS" version="2.0.0">' \
+             + '<wfs:Update typeName="ws_stream:layer1">' + '<a>' * 10000 + '</a>' * 10000 + '</wfs:Update>' \
+             + '</wfs:Transaction>'
+
+
+@pytest.mark.parametrize('data_xml', [
+    pytest.param(ENTITY_EXPANSION_WFS_T, id='entity_expansion'),
+    pytest.param(DEEP_WFS_T, id='deep_nesting'),
+])
+def test_extract_attributes_and_layers_from_malicious_wfs_t(data_xml):
+    with app.app_context(), pytest.raises((ET.XMLSyntaxError, ValueError)):
+        geoserver_proxy.extract_attributes_and_layers_from_wfs_t(data_xml.encode())
+
+
+@pytest.mark.parametrize('body, exp_result', [
+    pytest.param(b'<wfs:Transaction service="WFS"/>', True, id='xml'),
+    pytest.param(b'  \n<?xml version="1.0"?><wfs:Transaction/>', True, id='xml_with_leading_whitespace'),
+    pytest.param(b'\xef\xbb\xbf<wfs:Transaction/>', True, id='xml_with_utf8_bom'),
+    pytest.param('<wfs:Transaction/>'.encode('utf-16'), True, id='xml_utf16'),
+    pytest.param(b'SERVICE=WFS&REQUEST=GetFeature', False, id='form'),
+    pytest.param(b'', False, id='empty'),
+])
+def test_is_wfs_t_candidate(body, exp_result):
+    # decision does not depend on content type, WFS-T is often sent e.g. as text/plain
+    body_prefix = geoserver_proxy.read_stream_prefix(io.BytesIO(body))
+    assert body_prefix == body[:geoserver_proxy.BODY_PREFIX_SIZE]
+    assert geoserver_proxy.is_wfs_t_candidate(body_prefix) is exp_result
+
+
+def test_read_stream_prefix():
+    body = b'<' + b'x' * (2 * geoserver_proxy.BODY_PREFIX_SIZE)
+    stream = io.BytesIO(body)
+    body_prefix = geoserver_proxy.read_stream_prefix(stream)
+    assert len(body_prefix) == geoserver_proxy.BODY_PREFIX_SIZE
+    assert body_prefix + stream.read() == body
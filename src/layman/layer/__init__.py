@@ -56,7 +56,15 @@ PUBLICATION_TYPES = {
             ('layman.layer.filesystem.thumbnail', InternalSourceTypeDef(info_items=['thumbnail', ]),),
             ('layman.layer.micka.soap', InternalSourceTypeDef(info_items=['metadata', ]),),
         ]),
+        # internal sources whose tasks must be finished before the task of given internal source starts;
+        # task of internal source not listed here waits for task of preceding internal source
+        'task_dependencies': {
+            'layman.layer.geoserver.wfs': ['layman.layer.prime_db_schema.bbox', ],
+            'layman.layer.geoserver.wms': ['layman.layer.qgis.wms', 'layman.layer.geoserver.wfs', ],
+            'layman.layer.micka.soap': ['layman.layer.geoserver.wms', ],
+        },
         'task_modules': {
+            'layman.layer.tasks',
             'layman.layer.db.tasks',
             'layman.layer.prime_db_schema.tasks',
             'layman.layer.filesystem.tasks',
@@ -2,6 +2,10 @@ from collections import defaultdict, namedtuple
 import math
 import os
 import logging
+import re
+import selectors
+import subprocess
+import time
 
 from db import util as db_util, PG_CONN
 from layman.common.language import get_languages_iso639_2
@@ -11,6 +15,13 @@ from layman import settings
 FLASK_CONN_CUR_KEY = f'{__name__}:CONN_CUR'
 logger = logging.getLogger(__name__)
 
+IMPORT_CHECK_INTERVAL = 0.5  # seconds
+IMPORT_PROGRESS_PATTERN = re.compile(rb'(\d{1,3})(?:\.\.\.| - done)')
+# input files at least this big are imported in bulk mode
+BULK_IMPORT_MIN_FILE_SIZE = 64 * 1024 * 1024  # bytes
+# number of features inserted in one transaction in bulk mode
+BULK_IMPORT_TRANSACTION_SIZE = 100000
+
 
 ColumnInfo = namedtuple('ColumnInfo', 'name data_type')
 
@@ -81,23 +92,97 @@ def delete_whole_user(username):
 
 # def import_layer_vector_file(username, layername, main):
 def import_layer_vector_file(username, layername, main_filepath, crs_id):
+    bulk = is_bulk_import(main_filepath)
     p = import_layer_vector_file_async(username, layername, main_filepath,
-                                       crs_id)
-    while p.poll() is None:
-        pass
-    return_code = p.poll()
+                                       crs_id, bulk=bulk)
+    return_code, output = wait_for_import(p)
     if return_code != 0:
-        pg_error = str(p.stdout.read())
+        pg_error = str(output)
         raise LaymanError(11, private_data=pg_error)
+    if bulk:
+        create_geometry_index(username, layername)
+
+
+def is_bulk_import(main_filepath):
+    return os.path.getsize(main_filepath) >= BULK_IMPORT_MIN_FILE_SIZE
+
+
+def get_geometry_index_name(layername):
+    # the same name as ogr2ogr uses, so that the index looks the same regardless of import mode
+    return f'{layername}_wkb_geometry_geom_idx'
+
+
+def create_geometry_index(username, layername, conn_cur=None):
+    if conn_cur is None:
+        conn_cur = db_util.get_connection_cursor()
+    conn, cur = conn_cur
+    index_name = get_geometry_index_name(layername)
+    try:
+        cur.execute(f"""CREATE INDEX IF NOT EXISTS "{index_name}" ON "{username}"."{layername}" USING GIST (wkb_geometry)""")
+        cur.execute(f'ANALYZE "{username}"."{layername}"')
+        conn.commit()
+    except BaseException as exc:
+        logger.error(f'create_geometry_index ERROR')
+        raise LaymanError(7) from exc
+
+
+def wait_for_import(process, is_aborted_fn=None, progress_fn=None, check_interval=IMPORT_CHECK_INTERVAL):
+    """Wait for ogr2ogr process started by import_layer_vector_file_async without busy waiting.
+
+    Output of the process is read as it comes, so the pipe never fills up. Progress in percent reported by ogr2ogr
+    is passed to progress_fn, and is_aborted_fn is checked at least every check_interval seconds.
+
+    Returns tuple (return_code, output). Return code is None if the import was aborted; the process keeps running
+    in such case and it's up to caller to terminate it.
+    """
+    output = b''
+    last_progress = None
+    next_abort_check = time.monotonic()
+
+    def aborted():
+        nonlocal next_abort_check
+        if is_aborted_fn is None or time.monotonic() < next_abort_check:
+            return False
+        next_abort_check = time.monotonic() + check_interval
+        return is_aborted_fn()
+
+    fileno = process.stdout.fileno()
+    with selectors.DefaultSelector() as selector:
+        selector.register(fileno, selectors.EVENT_READ)
+        while True:
+            if aborted():
+                return None, output
+            if not selector.select(timeout=check_interval):
+                continue
+            chunk = os.read(fileno, 65536)
+            if not chunk:
+                break
+            # keep a few previous bytes, progress number can be split between two chunks
+            progress_matches = IMPORT_PROGRESS_PATTERN.findall(output[-8:] + chunk)
+            output += chunk
+            if progress_fn is not None and progress_matches:
+                progress = int(progress_matches[-1])
+                if progress != last_progress:
+                    last_progress = progress
+                    progress_fn(progress)
+
+    while True:
+        try:
+            return_code = process.wait(timeout=check_interval)
+            break
+        except subprocess.TimeoutExpired:
+            if aborted():
+                return None, output
+    return return_code, output
 
 
 def import_layer_vector_file_async(username, layername, main_filepath,
-                                   crs_id):
+                                   crs_id, bulk=False):
     # import file to database table
-    import subprocess
     pg_conn = ' '.join([f"{k}='{v}'" for k, v in PG_CONN.items()])
     bash_args = [
         'ogr2ogr',
+        '-progress',
         '-t_srs', 'EPSG:3857',
         '-nln', layername,
         '-nlt', 'GEOMETRY',
@@ -116,6 +201,13 @@ def import_layer_vector_file_async(username, layername, main_filepath,
         bash_args.extend([
             '-lco', 'PRECISION=NO',
         ])
+    if bulk:
+        # spatial index is created by create_geometry_index after all features are inserted
+        bash_args.extend([
+            '--config', 'PG_USE_COPY', 'YES',
+            '-gt', str(BULK_IMPORT_TRANSACTION_SIZE),
+            '-lco', 'SPATIAL_INDEX=NONE',
+        ])
     bash_args.extend([
         f'{main_filepath}',
     ])
@@ -6,6 +6,7 @@ import pytest
 
 del sys.modules['layman']
 
+from db import util as db_util
 from layman import app as layman, settings
 from layman.layer.filesystem.input_file import ensure_layer_input_file_dir
 from layman.layer.filesystem.util import get_layer_dir
@@ -181,6 +182,50 @@ def test_abort_import_layer_vector_file():
     shutil.rmtree(layerdir)
 
 
+@pytest.mark.usefixtures('client')
+def test_wait_for_import_progress_and_abort():
+    username = 'testuser1'
+    layername = 'ne_10m_admin_0_countries'
+    src_dir = 'tmp/naturalearth/10m/cultural'
+    input_file_dir = ensure_layer_input_file_dir(username, layername)
+    filename = layername + '.geojson'
+    main_filepath = os.path.join(input_file_dir, filename)
+    shutil.copy(
+        os.path.join(src_dir, filename),
+        input_file_dir
+    )
+
+    progress_list = []
+    p = db.import_layer_vector_file_async(username, layername, main_filepath, None)
+    return_code, _ = db.wait_for_import(p,
+                                        is_aborted_fn=lambda: len(progress_list) > 0,
+                                        progress_fn=progress_list.append,
+                                        check_interval=0.1)
+    assert return_code is None
+    p.terminate()
+    p.wait()
+    assert progress_list
+    assert all(0 <= progress <= 100 for progress in progress_list), progress_list
+
+    delete_layer(username, layername)
+    layerdir = get_layer_dir(username, layername)
+    shutil.rmtree(layerdir)
+
+
+@pytest.mark.usefixtures('client')
+def test_bulk_import_creates_geometry_index(testuser1, monkeypatch):
+    file_path = 'sample/data/upper_attr.geojson'
+    username = testuser1
+    layername = 'bulk_import'
+    monkeypatch.setattr(db, 'BULK_IMPORT_MIN_FILE_SIZE', 0)
+    db.import_layer_vector_file(username, layername, file_path, None)
+    _, cur = db_util.get_connection_cursor()
+    cur.execute(f"""select indexname from pg_indexes where schemaname = %s and tablename = %s""", (username, layername, ))
+    index_names = {row[0] for row in cur.fetchall()}
+    assert db.get_geometry_index_name(layername) in index_names
+    delete_layer(username, layername)
+
+
 @pytest.mark.usefixtures('client')
 def test_data_language(boundary_table):
     username, layername = boundary_table
@@ -4,6 +4,7 @@ from layman.common import empty_method, empty_method_returns_none, empty_method_
 from layman.http import LaymanError
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
 
 
 pre_publication_action_check = empty_method
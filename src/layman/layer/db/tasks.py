@@ -1,10 +1,12 @@
 from celery.utils.log import get_task_logger
 
+from layman import celery as celery_util
 from layman.celery import AbortedException
-from layman.common import empty_method_returns_true
+from layman.common import empty_method_returns_true, redis as redis_util
 from layman.layer.filesystem.input_file import get_layer_main_file_path
 from layman import celery_app
 from layman.http import LaymanError
+from layman.layer import LAYER_TYPE
 from .. import db
 from .table import delete_layer
 
@@ -31,21 +33,33 @@ def refresh_table(
     if self.is_aborted():
         raise AbortedException
     main_filepath = get_layer_main_file_path(username, layername)
-    p = db.import_layer_vector_file_async(username, layername, main_filepath, crs_id)
-    while p.poll() is None and not self.is_aborted():
-        pass
-    if self.is_aborted():
+    bulk = db.is_bulk_import(main_filepath)
+    p = db.import_layer_vector_file_async(username, layername, main_filepath, crs_id, bulk=bulk)
+
+    def update_progress(progress):
+        # do not overwrite ABORTED state
+        if not self.is_aborted():
+            self.update_state(state='STARTED', meta={'progress': progress})
+            celery_util.set_task_state(username, LAYER_TYPE, layername, self.request.id, 'STARTED', progress=progress)
+            # import of big file can take longer than LAYMAN_PUBLICATION_LOCK_TIMEOUT
+            redis_util.refresh_publication_lock(username, LAYER_TYPE, layername)
+            celery_util.refresh_running_chain(username, LAYER_TYPE, layername)
+
+    return_code, output = db.wait_for_import(p, is_aborted_fn=self.is_aborted, progress_fn=update_progress)
+    if return_code is None:
         logger.info(f'terminating {username} {layername}')
         p.terminate()
-        logger.info(f'terminating {username} {layername}')
+        p.wait()
+        logger.info(f'terminated {username} {layername}')
         delete_layer(username, layername)
         raise AbortedException
-    return_code = p.poll()
     if return_code != 0:
-        pg_error = str(p.stdout.read())
+        pg_error = str(output)
         logger.error(f"STDOUT: {pg_error}")
         if "ERROR:  zero-length delimited identifier at or near" in pg_error:
             err_code = 28
         else:
             err_code = 11
         raise LaymanError(err_code, private_data=pg_error)
+    if bulk:
+        db.create_geometry_index(username, layername)
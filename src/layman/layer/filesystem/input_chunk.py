@@ -3,6 +3,7 @@ import json
 import datetime
 import os
 import pathlib
+import shutil
 
 from flask import current_app
 
@@ -14,6 +15,8 @@ from . import input_file
 
 LAYER_SUBDIR = __name__.split('.')[-1]
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+# seconds
+ASSEMBLY_LOCK_BLOCKING_TIMEOUT = 1
 
 get_metadata_comparison = empty_method_returns_dict
 pre_publication_action_check = empty_method
@@ -34,8 +37,12 @@ def ensure_layer_resumable_dir(username, layername):
 
 def delete_layer(workspace, layername):
     util.delete_layer_subdir(workspace, layername, LAYER_SUBDIR)
-    chunk_key = get_layer_redis_total_chunks_key(workspace, layername)
-    settings.LAYMAN_REDIS.delete(chunk_key)
+    settings.LAYMAN_REDIS.delete(
+        get_layer_redis_total_chunks_key(workspace, layername),
+        get_layer_redis_assembled_chunks_key(workspace, layername),
+        get_layer_redis_upload_info_key(workspace, layername),
+        get_layer_redis_assembly_pending_key(workspace, layername),
+    )
 
 
 get_layer_info = input_file.get_layer_info
@@ -67,9 +74,11 @@ def save_layer_files_str(username, layername, files_str, check_crs):
     }
     resumable_dir = ensure_layer_resumable_dir(username, layername)
     os.mkdir(os.path.join(resumable_dir, 'chunks'))
+    os.mkdir(os.path.join(resumable_dir, 'assembled'))
     info_path = os.path.join(resumable_dir, 'info.json')
     with open(info_path, 'w') as file:
         json.dump(file_content, file)
+    settings.LAYMAN_REDIS.set(get_layer_redis_upload_info_key(username, layername), json.dumps(file_content))
     return [
         {
             'file': fo['input_file'],
@@ -82,132 +91,226 @@ def get_layer_redis_total_chunks_key(username, layername):
     return f'layman.users.{username}.layers.{layername}.total_chunks'
 
 
-def save_layer_file_chunk(username, layername, parameter_name, filename, chunk,
-                          chunk_number, total_chunks):
-    resumable_dir = get_layer_resumable_dir(username, layername)
-    info_path = os.path.join(resumable_dir, 'info.json')
-    chunk_dir = os.path.join(resumable_dir, 'chunks')
-    if os.path.isfile(info_path):
+def get_layer_redis_assembled_chunks_key(username, layername):
+    return f'layman.users.{username}.layers.{layername}.assembled_chunks'
+
+
+def get_layer_redis_upload_info_key(username, layername):
+    return f'layman.users.{username}.layers.{layername}.upload_info'
+
+
+def get_layer_redis_assembly_lock_key(username, layername):
+    return f'layman.users.{username}.layers.{layername}.assembly_lock'
+
+
+def get_layer_redis_assembly_pending_key(username, layername):
+    return f'layman.users.{username}.layers.{layername}.assembly_pending'
+
+
+def get_layer_redis_file_assembly_lock_key(username, layername, file_hash):
+    return f'{get_layer_redis_assembly_lock_key(username, layername)}:{file_hash}'
+
+
+def _get_upload_info(username, layername):
+    rds = settings.LAYMAN_REDIS
+    info_key = get_layer_redis_upload_info_key(username, layername)
+    info_str = rds.get(info_key)
+    if info_str is None:
+        info_path = os.path.join(get_layer_resumable_dir(username, layername), 'info.json')
+        if not os.path.isfile(info_path):
+            raise LaymanError(20)
         with open(info_path, 'r') as info_file:
-            info = json.load(info_file)
-            files_to_upload = info['files_to_upload']
-            file_info = next(
-                (
-                    fi for fi in files_to_upload
-                    if fi['input_file'] == filename and fi[
-                        'layman_original_parameter'] == parameter_name
-                ),
-                None
-            )
-            if file_info is None:
-                raise LaymanError(21, {
-                    'file': filename,
-                    'layman_original_parameter': parameter_name,
-                })
-            settings.LAYMAN_REDIS.hset(
-                get_layer_redis_total_chunks_key(username, layername),
-                f'{parameter_name}:{file_info["target_file"]}',
-                total_chunks
-            )
-            target_filename = os.path.basename(file_info['target_file'])
-            chunk_name = _get_chunk_name(target_filename, chunk_number)
-            chunk_path = os.path.join(chunk_dir, chunk_name)
-            chunk.save(chunk_path)
-            current_app.logger.info('Resumable chunk saved to: %s',
-                                    chunk_path)
+            info_str = info_file.read()
+        rds.set(info_key, info_str)
+    return json.loads(info_str)
 
-    else:
+
+def _get_file_info(username, layername, parameter_name, filename):
+    info = _get_upload_info(username, layername)
+    file_info = next(
+        (
+            fi for fi in info['files_to_upload']
+            if fi['input_file'] == filename and fi['layman_original_parameter'] == parameter_name
+        ),
+        None
+    )
+    if file_info is None:
+        raise LaymanError(21, {
+            'file': filename,
+            'layman_original_parameter': parameter_name,
+        })
+    return file_info
+
+
+def _get_file_hash(file_info):
+    return f'{file_info["layman_original_parameter"]}:{file_info["target_file"]}'
+
+
+def save_layer_file_chunk(username, layername, parameter_name, filename, chunk,
+                          chunk_number, total_chunks):
+    file_info = _get_file_info(username, layername, parameter_name, filename)
+    chunk_dir = os.path.join(get_layer_resumable_dir(username, layername), 'chunks')
+    if not os.path.isdir(chunk_dir):
         raise LaymanError(20)
+    settings.LAYMAN_REDIS.hset(
+        get_layer_redis_total_chunks_key(username, layername),
+        _get_file_hash(file_info),
+        total_chunks
+    )
+    target_filename = os.path.basename(file_info['target_file'])
+    chunk_name = _get_chunk_name(target_filename, chunk_number)
+    chunk_path = os.path.join(chunk_dir, chunk_name)
+    chunk.save(chunk_path)
+    current_app.logger.info('Resumable chunk saved to: %s',
+                            chunk_path)
 
 
 def layer_file_chunk_exists(username, layername, parameter_name, filename,
                             chunk_number):
+    file_info = _get_file_info(username, layername, parameter_name, filename)
+    chunk_dir = os.path.join(get_layer_resumable_dir(username, layername), 'chunks')
+    target_filepath = file_info['target_file']
+    target_filename = os.path.basename(target_filepath)
+    chunk_name = _get_chunk_name(target_filename, chunk_number)
+    chunk_path = os.path.join(chunk_dir, chunk_name)
+    assembled_chunks = settings.LAYMAN_REDIS.hget(get_layer_redis_assembled_chunks_key(username, layername),
+                                                  _get_file_hash(file_info))
+    return (assembled_chunks is not None and chunk_number <= int(assembled_chunks)) \
+        or os.path.exists(chunk_path) or os.path.exists(target_filepath)
+
+
+def _append_file(target_fd, source_path):
+    # copy in kernel, chunk content is never read into memory
+    with open(source_path, 'rb') as source_file:
+        size = os.fstat(source_file.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(target_fd, source_file.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+    return offset
+
+
+def assemble_layer_file_chunks(username, layername, file_info, total_chunks):
+    """Append all contiguous chunks that arrived since last call to partially assembled file.
+
+    Returns number of chunks assembled so far. When all chunks are assembled, the file is moved to its target path.
+    Assembly of one file is serialized by Redis lock. If the lock is not acquired in ASSEMBLY_LOCK_BLOCKING_TIMEOUT
+    seconds, the file is left to the caller holding the lock and number of chunks it assembled so far is returned.
+    """
+    rds = settings.LAYMAN_REDIS
+    file_hash = _get_file_hash(file_info)
+    lock = rds.lock(get_layer_redis_file_assembly_lock_key(username, layername, file_hash),
+                    timeout=settings.UPLOAD_MAX_INACTIVITY_TIME,
+                    blocking_timeout=ASSEMBLY_LOCK_BLOCKING_TIMEOUT)
+    if not lock.acquire():
+        assembled_chunks = rds.hget(get_layer_redis_assembled_chunks_key(username, layername), file_hash)
+        return int(assembled_chunks or 0)
+    try:
+        return _assemble_layer_file_chunks(username, layername, file_info, total_chunks)
+    finally:
+        lock.release()
+
+
+def _assemble_layer_file_chunks(username, layername, file_info, total_chunks):
+    rds = settings.LAYMAN_REDIS
     resumable_dir = get_layer_resumable_dir(username, layername)
-    info_path = os.path.join(resumable_dir, 'info.json')
     chunk_dir = os.path.join(resumable_dir, 'chunks')
-    if os.path.isfile(info_path):
-        with open(info_path, 'r') as info_file:
-            info = json.load(info_file)
-            files_to_upload = info['files_to_upload']
-            file_info = next(
-                (
-                    fi for fi in files_to_upload
-                    if fi['input_file'] == filename and fi[
-                        'layman_original_parameter'] == parameter_name
-                ),
-                None
-            )
-            if file_info is None:
-                raise LaymanError(21, {
-                    'file': filename,
-                    'layman_original_parameter': parameter_name,
+    assembled_key = get_layer_redis_assembled_chunks_key(username, layername)
+    file_hash = _get_file_hash(file_info)
+    size_hash = f'{file_hash}:size'
+    target_fn = os.path.basename(file_info['target_file'])
+    assembled_path = os.path.join(resumable_dir, 'assembled', target_fn)
+
+    assembled_chunks, assembled_size = [int(v or 0) for v in rds.hmget(assembled_key, file_hash, size_hash)]
+    next_chunk_path = os.path.join(chunk_dir, _get_chunk_name(target_fn, assembled_chunks + 1))
+    if assembled_chunks < total_chunks and os.path.exists(next_chunk_path):
+        assembled_fd = os.open(assembled_path, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            # drop data of chunk that was appended, but not recorded as assembled (e.g. process was killed)
+            os.ftruncate(assembled_fd, assembled_size)
+            os.lseek(assembled_fd, assembled_size, os.SEEK_SET)
+            while assembled_chunks < total_chunks and os.path.exists(next_chunk_path):
+                assembled_size += _append_file(assembled_fd, next_chunk_path)
+                assembled_chunks += 1
+                rds.hset(assembled_key, mapping={
+                    file_hash: assembled_chunks,
+                    size_hash: assembled_size,
                 })
-            target_filepath = file_info['target_file']
-            target_filename = os.path.basename(target_filepath)
-            chunk_name = _get_chunk_name(target_filename, chunk_number)
-            chunk_path = os.path.join(chunk_dir, chunk_name)
-            return os.path.exists(chunk_path) or os.path.exists(
-                target_filepath)
-    else:
-        raise LaymanError(20)
+                os.unlink(next_chunk_path)
+                next_chunk_path = os.path.join(chunk_dir, _get_chunk_name(target_fn, assembled_chunks + 1))
+        finally:
+            os.close(assembled_fd)
+
+    if assembled_chunks == total_chunks and os.path.exists(assembled_path):
+        current_app.logger.info('file_upload_complete ' + target_fn)
+        target_fp = file_info['target_file']
+        input_file.ensure_layer_input_file_dir(username, layername)
+        shutil.move(assembled_path, target_fp)
+        rds.hdel(get_layer_redis_total_chunks_key(username, layername), file_hash)
+        current_app.logger.info('Resumable file saved to: %s', target_fp)
+    return assembled_chunks
 
 
 def layer_file_chunk_info(username, layername):
-    # print('print layer_file_chunk_info')
-    resumable_dir = get_layer_resumable_dir(username, layername)
-    info_path = os.path.join(resumable_dir, 'info.json')
-    chunk_dir = os.path.join(resumable_dir, 'chunks')
-    if os.path.isfile(info_path):
-        # print('print layer_file_chunk_info info_path')
-        with open(info_path, 'r') as info_file:
-            info = json.load(info_file)
-            files_to_upload = info['files_to_upload']
-
-            r_key = get_layer_redis_total_chunks_key(username, layername)
-            for fi in files_to_upload:
-                rh_key = f'{fi["layman_original_parameter"]}:{fi["target_file"]}'
-                total_chunks = settings.LAYMAN_REDIS.hget(r_key, rh_key)
-                # print(f'file {rh_key} {total_chunks}')
-                if total_chunks is None:
-                    continue
-                total_chunks = int(total_chunks)
-                target_fn = os.path.basename(fi['target_file'])
-                chunk_paths = [
-                    os.path.join(chunk_dir, _get_chunk_name(target_fn, x))
-                    for x in range(1, total_chunks + 1)
-                ]
-                file_upload_complete = \
-                    all(os.path.exists(p) for p in chunk_paths)
-                if file_upload_complete:
-                    current_app.logger.info(
-                        'file_upload_complete ' + target_fn)
-                    target_fp = fi['target_file']
-                    input_file.ensure_layer_input_file_dir(username, layername)
-                    with open(target_fp, "ab") as target_file:
-                        for chunk_path in chunk_paths:
-                            stored_chunk_file = open(chunk_path, 'rb')
-                            target_file.write(stored_chunk_file.read())
-                            stored_chunk_file.close()
-                            os.unlink(chunk_path)
-                    target_file.close()
-                    settings.LAYMAN_REDIS.hdel(r_key, rh_key)
-                    current_app.logger.info('Resumable file saved to: %s',
-                                            target_fp)
-
-            num_files_saved = len([
-                fi for fi in files_to_upload
-                if os.path.exists(fi['target_file'])
-            ])
-            all_files_saved = num_files_saved == len(files_to_upload)
-            if all_files_saved:
-                delete_layer(username, layername)
-                num_chunks_saved = 0
-            else:
-                num_chunks_saved = len(os.listdir(chunk_dir))
-
-            return all_files_saved, num_files_saved, num_chunks_saved
+    info = _get_upload_info(username, layername)
+    files_to_upload = info['files_to_upload']
+    chunk_dir = os.path.join(get_layer_resumable_dir(username, layername), 'chunks')
+
+    r_key = get_layer_redis_total_chunks_key(username, layername)
+    num_chunks_assembled = 0
+    for fi in files_to_upload:
+        total_chunks = settings.LAYMAN_REDIS.hget(r_key, _get_file_hash(fi))
+        if total_chunks is None:
+            continue
+        num_chunks_assembled += assemble_layer_file_chunks(username, layername, fi, int(total_chunks))
+
+    num_files_saved = len([
+        fi for fi in files_to_upload
+        if os.path.exists(fi['target_file'])
+    ])
+    all_files_saved = num_files_saved == len(files_to_upload)
+    if all_files_saved:
+        delete_layer(username, layername)
+        num_chunks_saved = 0
     else:
-        raise LaymanError(20)
+        num_chunks_saved = num_chunks_assembled + len(os.listdir(chunk_dir))
+
+    return all_files_saved, num_files_saved, num_chunks_saved
+
+
+def complete_layer_file_upload(username, layername):
+    """Assemble chunks uploaded so far; concurrent callers are serialized.
+
+    Caller that does not get the lock in ASSEMBLY_LOCK_BLOCKING_TIMEOUT seconds returns False immediately. Its chunks
+    are assembled by the caller holding the lock, which repeats assembly as long as some caller is pending.
+
+    Returns True only to the caller whose call saved the last file, False otherwise.
+    """
+    rds = settings.LAYMAN_REDIS
+    pending_key = get_layer_redis_assembly_pending_key(username, layername)
+    rds.set(pending_key, 1, ex=settings.UPLOAD_MAX_INACTIVITY_TIME)
+    lock = rds.lock(get_layer_redis_assembly_lock_key(username, layername),
+                    timeout=settings.UPLOAD_MAX_INACTIVITY_TIME,
+                    blocking_timeout=ASSEMBLY_LOCK_BLOCKING_TIMEOUT)
+    all_files_saved = False
+    # pending flag is checked after the lock is released, so no chunk is left unassembled
+    while not all_files_saved and rds.exists(pending_key):
+        if not lock.acquire():
+            return False
+        try:
+            rds.delete(pending_key)
+            if not is_layer_upload_in_progress(username, layername):
+                return False
+            all_files_saved, _, _ = layer_file_chunk_info(username, layername)
+        finally:
+            lock.release()
+    return all_files_saved
+
+
+def is_layer_upload_in_progress(username, layername):
+    return os.path.isdir(get_layer_resumable_dir(username, layername))
 
 
 def _get_chunk_name(uploaded_filename, chunk_number):
@@ -0,0 +1,60 @@
+import os
+import types
+
+from layman import app, settings
+from . import input_chunk
+
+
+def create_chunk(content):
+    def save(path):
+        with open(path, 'wb') as file:
+            file.write(content)
+    return types.SimpleNamespace(save=save)
+
+
+def test_incremental_chunk_assembly():
+    workspace = 'test_incremental_chunk_assembly_workspace'
+    layername = 'test_incremental_chunk_assembly_layer'
+    filename = 'abc.geojson'
+    chunks = [b'{"type": "Feature", ', b'"geometry": null, ', b'"properties": null}']
+    total_chunks = len(chunks)
+
+    with app.app_context():
+        input_chunk.save_layer_files_str(workspace, layername, [filename], False)
+
+        def save_chunk(chunk_number):
+            input_chunk.save_layer_file_chunk(workspace, layername, 'file', filename,
+                                              create_chunk(chunks[chunk_number - 1]), chunk_number, total_chunks)
+
+        save_chunk(2)
+        assert input_chunk.layer_file_chunk_info(workspace, layername) == (False, 0, 1)
+        assert input_chunk.layer_file_chunk_exists(workspace, layername, 'file', filename, 2)
+        assert not input_chunk.layer_file_chunk_exists(workspace, layername, 'file', filename, 1)
+
+        save_chunk(1)
+        assert input_chunk.layer_file_chunk_info(workspace, layername) == (False, 0, 2)
+        # assembled chunks are deleted, but still reported as existing
+        assert input_chunk.layer_file_chunk_exists(workspace, layername, 'file', filename, 1)
+        assert input_chunk.layer_file_chunk_exists(workspace, layername, 'file', filename, 2)
+
+        save_chunk(3)
+        file_info = input_chunk._get_file_info(workspace, layername, 'file', filename)
+        lock_key = input_chunk.get_layer_redis_file_assembly_lock_key(workspace, layername,
+                                                                      input_chunk._get_file_hash(file_info))
+        with settings.LAYMAN_REDIS.lock(lock_key):
+            # file is being assembled by another caller
+            assert input_chunk.assemble_layer_file_chunks(workspace, layername, file_info, total_chunks) == 2
+            assert input_chunk.layer_file_chunk_exists(workspace, layername, 'file', filename, 3)
+        assert input_chunk.layer_file_chunk_info(workspace, layername) == (True, 1, 0)
+
+        target_path = os.path.join(input_chunk.input_file.get_layer_input_file_dir(workspace, layername),
+                                   f'{layername}.geojson')
+        with open(target_path, 'rb') as file:
+            assert file.read() == b''.join(chunks)
+        for key in [input_chunk.get_layer_redis_total_chunks_key(workspace, layername),
+                    input_chunk.get_layer_redis_assembled_chunks_key(workspace, layername),
+                    input_chunk.get_layer_redis_upload_info_key(workspace, layername),
+                    ]:
+            assert not settings.LAYMAN_REDIS.exists(key)
+
+        input_chunk.input_file.delete_layer(workspace, layername)
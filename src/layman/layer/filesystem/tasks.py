@@ -1,12 +1,12 @@
-import time
-
 from celery.utils.log import get_task_logger
 
 from layman.celery import AbortedException
+from layman import celery as celery_util
 from layman.common import empty_method_returns_true
 from layman import celery_app
 from layman.http import LaymanError
 from layman import settings
+from layman.layer import LAYER_TYPE
 from . import input_file, input_chunk, thumbnail
 
 logger = get_task_logger(__name__)
@@ -23,32 +23,14 @@ refresh_thumbnail_needed = empty_method_returns_true
 def refresh_input_chunk(self, username, layername, check_crs=True):
     if self.is_aborted():
         raise AbortedException
-    last_change = time.time()
-    num_files_saved = 0
-    num_chunks_saved = 0
-    chunk_info = input_chunk.layer_file_chunk_info(username, layername)
-
-    logger.debug(f'chunk_info {str(chunk_info)}')
-    while not chunk_info[0]:
-        if time.time() - last_change > settings.UPLOAD_MAX_INACTIVITY_TIME:
-            logger.info(
-                f'UPLOAD_MAX_INACTIVITY_TIME reached {username}.{layername}')
-            input_file.delete_layer(username, layername)
-            raise LaymanError(22)
-        time.sleep(0.5)
-        if self.is_aborted():
-            logger.info(f'Aborting for layer {username}.{layername}')
-            input_file.delete_layer(username, layername)
-            logger.info(f'Aborted for layer {username}.{layername}')
-            raise AbortedException
-
-        chunk_info = input_chunk.layer_file_chunk_info(username, layername)
-        logger.debug(f'chunk_info {str(chunk_info)}')
-        if num_files_saved != chunk_info[1] \
-                or num_chunks_saved != chunk_info[2]:
-            last_change = time.time()
-            num_files_saved = chunk_info[1]
-            num_chunks_saved = chunk_info[2]
+    # Normally the chain is sent by the chunk endpoint after the last chunk was assembled.
+    # If the upload is still in progress, the chain was sent by sweep_inactive_uploads.
+    input_chunk.complete_layer_file_upload(username, layername)
+    if input_chunk.is_layer_upload_in_progress(username, layername):
+        logger.info(
+            f'UPLOAD_MAX_INACTIVITY_TIME reached {username}.{layername}')
+        input_file.delete_layer(username, layername)
+        raise LaymanError(22)
     logger.info(f'Layer chunks uploaded {username}.{layername}')
 
     if check_crs:
@@ -56,6 +38,13 @@ def refresh_input_chunk(self, username, layername, check_crs=True):
         input_file.check_layer_crs(main_filepath)
 
 
+@celery_app.task(
+    name='layman.layer.filesystem.input_chunk.sweep',
+)
+def sweep_inactive_uploads():
+    celery_util.run_inactive_deferred_chains(LAYER_TYPE, settings.UPLOAD_MAX_INACTIVITY_TIME)
+
+
 @celery_app.task(
     name='layman.layer.filesystem.thumbnail.refresh',
     bind=True,
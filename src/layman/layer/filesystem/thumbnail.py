@@ -12,6 +12,7 @@ from .. import LAYER_TYPE
 LAYER_SUBDIR = __name__.split('.')[-1]
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
 
 get_metadata_comparison = empty_method_returns_dict
 pre_publication_action_check = empty_method
@@ -1,9 +1,8 @@
 import json
 from urllib.parse import urljoin
-import requests
 from flask import g
 
-from geoserver import util as gs_util, GS_REST_WORKSPACES
+from geoserver import util as gs_util, session as gs_session, GS_REST_WORKSPACES
 from layman.http import LaymanError
 from layman import settings, util as layman_util
 from layman.common import bbox as bbox_util, geoserver as gs_common, empty_method
@@ -61,7 +60,7 @@ def delete_workspace(workspace, auth=settings.LAYMAN_GS_AUTH):
 def get_all_rules(auth):
     key = FLASK_RULES_KEY
     if key not in g:
-        r = requests.get(
+        r = gs_session.get(
             settings.LAYMAN_GS_REST_SECURITY_ACL_LAYERS,
             # data=json.dumps(payload),
             headers=headers_json,
@@ -143,15 +142,15 @@ def publish_layer_from_db(workspace, layername, description, title, access_right
         },
         'nativeBoundingBox': get_layer_native_bbox(workspace, layername),
     }
-    r = requests.post(urljoin(GS_REST_WORKSPACES,
-                              geoserver_workspace + '/datastores/postgresql/featuretypes/'),
-                      data=json.dumps({
-                          "featureType": feature_type_def
-                      }),
-                      headers=headers_json,
-                      auth=settings.LAYMAN_GS_AUTH,
-                      timeout=5,
-                      )
+    r = gs_session.post(urljoin(GS_REST_WORKSPACES,
+                                geoserver_workspace + '/datastores/postgresql/featuretypes/'),
+                        data=json.dumps({
+                            "featureType": feature_type_def
+                        }),
+                        headers=headers_json,
+                        auth=settings.LAYMAN_GS_AUTH,
+                        timeout=5,
+                        )
     r.raise_for_status()
 
     set_security_rules(workspace, layername, access_rights, settings.LAYMAN_GS_AUTH, geoserver_workspace)
@@ -189,15 +188,15 @@ def publish_layer_from_qgis(workspace, layer, description, title, access_rights,
         },
         'nativeBoundingBox': get_layer_native_bbox(workspace, layer),
     }
-    r = requests.post(urljoin(GS_REST_WORKSPACES,
-                              geoserver_workspace + '/wmslayers/'),
-                      data=json.dumps({
-                          "wmsLayer": wms_layer_def
-                      }),
-                      headers=headers_json,
-                      auth=settings.LAYMAN_GS_AUTH,
-                      timeout=5,
-                      )
+    r = gs_session.post(urljoin(GS_REST_WORKSPACES,
+                                geoserver_workspace + '/wmslayers/'),
+                        data=json.dumps({
+                            "wmsLayer": wms_layer_def
+                        }),
+                        headers=headers_json,
+                        auth=settings.LAYMAN_GS_AUTH,
+                        timeout=5,
+                        )
     r.raise_for_status()
 
     set_security_rules(workspace, layer, access_rights, settings.LAYMAN_GS_AUTH, geoserver_workspace)
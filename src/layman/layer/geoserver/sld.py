@@ -8,6 +8,8 @@ from .. import LAYER_TYPE
 from ...util import url_for, get_publication_info
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
+CACHE_INFO_EXTERNAL = True
 
 get_metadata_comparison = empty_method_returns_dict
 pre_publication_action_check = empty_method
@@ -27,7 +29,7 @@ def delete_layer(workspace, layername):
     geoserver_workspace = layer_info.get('_wms', {}).get('workspace')
     sld_stream = gs_util.delete_workspace_style(geoserver_workspace, layername, auth=settings.LAYMAN_GS_AUTH) \
         if geoserver_workspace else None
-    wms.clear_cache(workspace)
+    wms.clear_cache(workspace, layername)
     if sld_stream:
         result = {
             'style': {
@@ -60,7 +62,7 @@ def create_layer_style(workspace, layername):
     geoserver_workspace = layer_info['_wms']['workspace']
     style_file = input_style.get_layer_file(workspace, layername)
     gs_util.post_workspace_sld_style(geoserver_workspace, layername, style_file, launder_attribute_name)
-    wms.clear_cache(workspace)
+    wms.clear_cache(workspace, layername)
 
 
 def get_style_response(workspace, layername, headers=None, auth=None):
@@ -59,7 +59,7 @@ def refresh_wms(
                                           access_rights,
                                           geoserver_workspace=geoserver_workspace,
                                           )
-    wms.clear_cache(username)
+    wms.clear_cache(username, layername)
 
     if self.is_aborted():
         wms.delete_layer(username, layername)
@@ -90,7 +90,7 @@ def refresh_wfs(
     if self.is_aborted():
         raise AbortedException
     geoserver.publish_layer_from_db(username, layername, description, title, access_rights)
-    wfs.clear_cache(username)
+    wfs.clear_cache(username, layername)
 
     if self.is_aborted():
         wfs.delete_layer(username, layername)
@@ -1,7 +1,9 @@
+import re
 from urllib.parse import urlparse
 from owslib.wms import WebMapService
 from owslib.wfs import WebFeatureService
 
+from geoserver import session as gs_session
 from geoserver.util import get_proxy_base_url
 from layman.cache.mem import CACHE as MEM_CACHE
 
@@ -19,6 +21,37 @@ def get_gs_proxy_base_url():
     return proxy_base_url
 
 
+def is_exception_report(xml_str):
+    return re.search(r'<(\w+:)?(Service)?ExceptionReport\b', xml_str[:1000]) is not None
+
+
+def get_capabilities_string(ows_url, service, version, headers):
+    """Return GetCapabilities document, or None if the service does not exist in GeoServer (yet)."""
+    r = gs_session.get(ows_url, params={
+        'SERVICE': service,
+        'REQUEST': 'GetCapabilities',
+        'VERSION': version,
+    }, headers=headers, timeout=5,)
+    r.encoding = 'UTF-8'
+    if r.status_code != 200 or is_exception_report(r.text):
+        result = None
+        if r.status_code not in (200, 404):
+            r.raise_for_status()
+            raise Exception(f'Status code = {r.status_code}')
+    else:
+        result = r.text
+    return result
+
+
+def get_workspace_service_url(layer_service_url, geoserver_workspace, layername):
+    """Turn URL of GeoServer's virtual service of the layer into URL of virtual service of its workspace."""
+    if layer_service_url is None:
+        return None
+    url_parts = urlparse(layer_service_url)
+    path = url_parts.path.replace(f'/{geoserver_workspace}/{layername}/', f'/{geoserver_workspace}/', 1)
+    return url_parts._replace(path=path).geturl()
+
+
 def wms_direct(wms_url, xml=None, version=None, headers=None):
     from layman.layer.geoserver.wms import VERSION
     version = version or VERSION
@@ -1,20 +1,20 @@
 from urllib.parse import urljoin
-import requests
 from flask import current_app
 
 from geoserver import util as gs_util
 from layman import settings, patch_mode
 from layman.cache import mem_redis
-from layman.common import geoserver as gs_common, empty_method_returns_none, empty_method
-from layman.layer.util import is_layer_chain_ready
-from layman import util as layman_util
 from layman.layer import LAYER_TYPE
-from .util import get_gs_proxy_base_url
+from layman.common import geoserver as gs_common, empty_method_returns_none, empty_method
+from layman import celery as celery_util
+from .util import get_gs_proxy_base_url, get_capabilities_string, get_workspace_service_url
 from . import wms
 
-FLASK_PROXY_KEY = f'{__name__}:PROXY:{{username}}'
+FLASK_PROXY_KEY = f'{__name__}:PROXY:{{username}}:{{layername}}'
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
+CACHE_INFO_EXTERNAL = True
 VERSION = '2.0.0'
 
 get_publication_uuid = empty_method_returns_none
@@ -22,13 +22,13 @@ pre_publication_action_check = empty_method
 post_layer = empty_method
 
 
-def get_flask_proxy_key(username):
-    return FLASK_PROXY_KEY.format(username=username)
+def get_flask_proxy_key(username, layername):
+    return FLASK_PROXY_KEY.format(username=username, layername=layername)
 
 
 def patch_layer(workspace, layername, title, description, access_rights=None):
     gs_util.patch_feature_type(workspace, layername, title=title, description=description, auth=settings.LAYMAN_GS_AUTH)
-    clear_cache(workspace)
+    clear_cache(workspace, layername)
 
     if access_rights and access_rights.get('read'):
         security_read_roles = gs_common.layman_users_to_geoserver_roles(access_rights['read'])
@@ -41,7 +41,7 @@ def patch_layer(workspace, layername, title, description, access_rights=None):
 
 def delete_layer(workspace, layername):
     gs_util.delete_feature_type(workspace, layername, settings.LAYMAN_GS_AUTH)
-    clear_cache(workspace)
+    clear_cache(workspace, layername)
 
     gs_util.delete_security_roles(f"{workspace}.{layername}.r", settings.LAYMAN_GS_AUTH)
     gs_util.delete_security_roles(f"{workspace}.{layername}.w", settings.LAYMAN_GS_AUTH)
@@ -53,41 +53,39 @@ def get_wfs_url(workspace, external_url=False):
     return urljoin(base_url, workspace + '/wfs')
 
 
-def get_wfs_direct(username):
+def get_layer_wfs_url(workspace, layername):
+    return urljoin(settings.LAYMAN_GS_URL, f'{workspace}/{layername}/wfs')
+
+
+def get_wfs_direct(username, layername):
+    """Capabilities of GeoServer's virtual service of the layer with URLs as published by GeoServer.
+
+    Capabilities document cached by get_wfs_proxy is used if available.
+    """
     headers = {
         settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE: settings.LAYMAN_GS_USER,
     }
-    ows_url = get_wfs_url(username)
+    ows_url = get_layer_wfs_url(username, layername)
+    string_value = settings.LAYMAN_REDIS.hget(get_flask_proxy_key(username, layername), 'value')
+    if string_value is None:
+        string_value = get_capabilities_string(ows_url, 'WFS', VERSION, headers)
+    if string_value is None:
+        return None
     from .util import wfs_direct
-    key = get_flask_proxy_key(username)
-    redis_obj = settings.LAYMAN_REDIS.hgetall(key)
-    string_value = redis_obj['value'] if redis_obj is not None else None
     return wfs_direct(ows_url, xml=string_value, headers=headers)
 
 
-def get_wfs_proxy(username):
+def get_wfs_proxy(username, layername):
+    """Capabilities of GeoServer's virtual service of the layer, containing only the layer."""
     headers = {
         settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE: settings.LAYMAN_GS_USER,
     }
-    key = get_flask_proxy_key(username)
+    key = get_flask_proxy_key(username, layername)
 
-    ows_url = get_wfs_url(username)
+    ows_url = get_layer_wfs_url(username, layername)
 
     def create_string_value():
-        r = requests.get(ows_url, params={
-            'SERVICE': 'WFS',
-            'REQUEST': 'GetCapabilities',
-            'VERSION': VERSION,
-        }, headers=headers, timeout=5,)
-        if r.status_code != 200:
-            result = None
-            if r.status_code != 404:
-                r.raise_for_status()
-                raise Exception(f'Status code = {r.status_code}')
-        else:
-            r.encoding = 'UTF-8'
-            result = r.text
-        return result
+        return get_capabilities_string(ows_url, 'WFS', VERSION, headers)
 
     def mem_value_from_string_value(string_value):
         from .util import wfs_proxy
@@ -95,25 +93,20 @@ def get_wfs_proxy(username):
         return wfs_proxy
 
     def currently_changing():
-        layerinfos = layman_util.get_publication_infos(username, LAYER_TYPE)
-        result = any((
-            not is_layer_chain_ready(username, layername)
-            for (_, _, layername) in layerinfos
-        ))
-        return result
+        return celery_util.is_publication_chain_running(username, LAYER_TYPE, layername)
 
     wfs_proxy = mem_redis.get(key, create_string_value, mem_value_from_string_value, currently_changing)
 
     return wfs_proxy
 
 
-def clear_cache(username):
-    key = get_flask_proxy_key(username)
+def clear_cache(username, layername):
+    key = get_flask_proxy_key(username, layername)
     mem_redis.delete(key)
 
 
 def get_layer_info(workspace, layername):
-    wfs = get_wfs_proxy(workspace)
+    wfs = get_wfs_proxy(workspace, layername)
     if wfs is None:
         return {}
     wfs_proxy_url = get_wfs_url(workspace, external_url=True)
@@ -131,7 +124,7 @@ def get_layer_info(workspace, layername):
 
 
 def get_metadata_comparison(workspace, layername):
-    wfs = get_wfs_direct(workspace)
+    wfs = get_wfs_direct(workspace, layername)
     if wfs is None:
         return {}
     cap_op = wfs.getOperationByName('GetCapabilities')
@@ -142,6 +135,8 @@ def get_metadata_comparison(workspace, layername):
             if m.get("type").lower() == 'get'
         ), None
     )
+    # metadata record refers to the service of the workspace
+    wfs_url = get_workspace_service_url(wfs_url, workspace, layername)
     wfs_layername = f"{workspace}:{layername}"
     wfs_layer = wfs.contents.get(wfs_layername, None)
     try:
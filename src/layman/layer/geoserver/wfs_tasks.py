@@ -22,7 +22,7 @@ def patch_after_wfst(
 
     bbox = geoserver.get_layer_bbox(workspace, layer)
     gs_util.patch_feature_type(workspace, layer, auth=settings.LAYMAN_GS_AUTH, bbox=bbox)
-    wfs.clear_cache(workspace)
+    wfs.clear_cache(workspace, layer)
 
     if self.is_aborted():
         raise AbortedException
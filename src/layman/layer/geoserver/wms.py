@@ -1,20 +1,21 @@
 from urllib.parse import urljoin
 from urllib.parse import urlencode, urlparse, urlunparse, parse_qs, parse_qsl
-import requests
 from flask import current_app
 
 from geoserver import util as gs_util
-from layman import settings, patch_mode, util as layman_util
+from layman import settings, patch_mode
 from layman.cache import mem_redis
 from layman.common import geoserver as gs_common, empty_method_returns_none, empty_method
-from layman.layer.util import is_layer_chain_ready
+from layman import celery as celery_util
 from layman.layer import LAYER_TYPE, util as layer_util
-from .util import get_gs_proxy_base_url
+from .util import get_gs_proxy_base_url, get_capabilities_string, get_workspace_service_url
 
-FLASK_PROXY_KEY = f'{__name__}:PROXY:{{username}}'
+FLASK_PROXY_KEY = f'{__name__}:PROXY:{{username}}:{{layername}}'
 DEFAULT_WMS_STORE_PREFIX = 'qgis'
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
+CACHE_INFO_EXTERNAL = True
 VERSION = '1.3.0'
 
 pre_publication_action_check = empty_method
@@ -22,8 +23,8 @@ post_layer = empty_method
 get_publication_uuid = empty_method_returns_none
 
 
-def get_flask_proxy_key(username):
-    return FLASK_PROXY_KEY.format(username=username)
+def get_flask_proxy_key(username, layername):
+    return FLASK_PROXY_KEY.format(username=username, layername=layername)
 
 
 def patch_layer(workspace, layername, title, description, access_rights=None):
@@ -31,7 +32,7 @@ def patch_layer(workspace, layername, title, description, access_rights=None):
     info = layer_util.get_layer_info(workspace, layername, context={'keys': ['style_type'], })
     if info['style_type'] == 'sld':
         gs_util.patch_feature_type(geoserver_workspace, layername, title=title, description=description, auth=settings.LAYMAN_GS_AUTH)
-        clear_cache(workspace)
+        clear_cache(workspace, layername)
 
     if access_rights and access_rights.get('read'):
         security_read_roles = gs_common.layman_users_to_geoserver_roles(access_rights['read'])
@@ -47,7 +48,7 @@ def delete_layer(workspace, layername):
     gs_util.delete_feature_type(geoserver_workspace, layername, settings.LAYMAN_GS_AUTH)
     gs_util.delete_wms_layer(geoserver_workspace, layername, settings.LAYMAN_GS_AUTH)
     gs_util.delete_wms_store(geoserver_workspace, settings.LAYMAN_GS_AUTH, get_qgis_store_name(layername))
-    clear_cache(workspace)
+    clear_cache(workspace, layername)
 
     gs_util.delete_security_roles(f"{geoserver_workspace}.{layername}.r", settings.LAYMAN_GS_AUTH)
     gs_util.delete_security_roles(f"{geoserver_workspace}.{layername}.w", settings.LAYMAN_GS_AUTH)
@@ -60,41 +61,40 @@ def get_wms_url(workspace, external_url=False):
     return urljoin(base_url, geoserver_workspace + '/ows')
 
 
-def get_wms_direct(username):
+def get_layer_wms_url(workspace, layername):
+    geoserver_workspace = get_geoserver_workspace(workspace)
+    return urljoin(settings.LAYMAN_GS_URL, f'{geoserver_workspace}/{layername}/ows')
+
+
+def get_wms_direct(username, layername):
+    """Capabilities of GeoServer's virtual service of the layer with URLs as published by GeoServer.
+
+    Capabilities document cached by get_wms_proxy is used if available.
+    """
     headers = {
         settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE: settings.LAYMAN_GS_USER,
     }
-    ows_url = get_wms_url(username)
+    ows_url = get_layer_wms_url(username, layername)
+    string_value = settings.LAYMAN_REDIS.hget(get_flask_proxy_key(username, layername), 'value')
+    if string_value is None:
+        string_value = get_capabilities_string(ows_url, 'WMS', VERSION, headers)
+    if string_value is None:
+        return None
     from .util import wms_direct
-    key = get_flask_proxy_key(username)
-    redis_obj = settings.LAYMAN_REDIS.hgetall(key)
-    string_value = redis_obj['value'] if redis_obj is not None else None
     return wms_direct(ows_url, xml=string_value, headers=headers)
 
 
-def get_wms_proxy(username):
+def get_wms_proxy(username, layername):
+    """Capabilities of GeoServer's virtual service of the layer, containing only the layer."""
     headers = {
         settings.LAYMAN_GS_AUTHN_HTTP_HEADER_ATTRIBUTE: settings.LAYMAN_GS_USER,
     }
-    key = get_flask_proxy_key(username)
+    key = get_flask_proxy_key(username, layername)
 
-    ows_url = get_wms_url(username)
+    ows_url = get_layer_wms_url(username, layername)
 
     def create_string_value():
-        r = requests.get(ows_url, params={
-            'SERVICE': 'WMS',
-            'REQUEST': 'GetCapabilities',
-            'VERSION': VERSION,
-        }, headers=headers, timeout=5,)
-        if r.status_code != 200:
-            result = None
-            if r.status_code != 404:
-                r.raise_for_status()
-                raise Exception(f'Status code = {r.status_code}')
-        else:
-            r.encoding = 'UTF-8'
-            result = r.text
-        return result
+        return get_capabilities_string(ows_url, 'WMS', VERSION, headers)
 
     def mem_value_from_string_value(string_value):
         from .util import wms_proxy
@@ -102,24 +102,19 @@ def get_wms_proxy(username):
         return wms_proxy
 
     def currently_changing():
-        layerinfos = layman_util.get_publication_infos(username, LAYER_TYPE)
-        result = any((
-            not is_layer_chain_ready(username, layername)
-            for (_, _, layername) in layerinfos
-        ))
-        return result
+        return celery_util.is_publication_chain_running(username, LAYER_TYPE, layername)
 
     wms_proxy = mem_redis.get(key, create_string_value, mem_value_from_string_value, currently_changing)
     return wms_proxy
 
 
-def clear_cache(username):
-    key = get_flask_proxy_key(username)
+def clear_cache(username, layername):
+    key = get_flask_proxy_key(username, layername)
     mem_redis.delete(key)
 
 
 def get_layer_info(workspace, layername):
-    wms = get_wms_proxy(workspace)
+    wms = get_wms_proxy(workspace, layername)
     if wms is None:
         return {}
     wms_proxy_url = get_wms_url(workspace, external_url=True)
@@ -140,7 +135,7 @@ def get_layer_info(workspace, layername):
 
 
 def get_metadata_comparison(workspace, layername):
-    wms = get_wms_direct(workspace)
+    wms = get_wms_direct(workspace, layername)
     if wms is None:
         return {}
     cap_op = wms.getOperationByName('GetCapabilities')
@@ -151,6 +146,8 @@ def get_metadata_comparison(workspace, layername):
             if m.get("type").lower() == 'get'
         ), None
     )
+    # metadata record refers to the service of the workspace
+    wms_url = get_workspace_service_url(wms_url, get_geoserver_workspace(workspace), layername)
     wms_layer = wms.contents.get(layername, None)
     try:
         title = wms_layer.title
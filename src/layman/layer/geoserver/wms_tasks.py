@@ -28,7 +28,7 @@ def patch_after_wfst(
     elif style_type == 'qml':
         gs_util.patch_wms_layer(geoserver_workspace, layer, auth=settings.LAYMAN_GS_AUTH, bbox=bbox)
 
-    wms.clear_cache(workspace)
+    wms.clear_cache(workspace, layer)
 
     if self.is_aborted():
         raise AbortedException
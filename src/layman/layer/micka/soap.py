@@ -5,6 +5,8 @@ from . import csw
 from .. import LAYER_TYPE
 
 PATCH_MODE = csw.PATCH_MODE
+CACHE_INFO = True
+CACHE_INFO_EXTERNAL = True
 
 pre_publication_action_check = empty_method
 post_layer = empty_method
@@ -8,14 +8,11 @@ get_metadata_comparison = empty_method_returns_dict
 
 
 def get_publication_uuid(workspace, publication_type, publication_name):
-    infos = pubs_util.get_publication_infos(workspace, publication_type)
-    return infos.get((workspace, publication_type, publication_name), dict()).get("uuid")
+    return pubs_util.get_publication_info(workspace, publication_type, publication_name).get("uuid")
 
 
 def get_layer_info(workspace, layername):
-    layers = pubs_util.get_publication_infos(workspace, LAYER_TYPE)
-    info = layers.get((workspace, LAYER_TYPE, layername), dict())
-    return info
+    return pubs_util.get_publication_info(workspace, LAYER_TYPE, layername)
 
 
 def delete_layer(workspace, layer_name):
@@ -7,6 +7,7 @@ from . import util
 from .. import db, qgis, util as layer_util
 
 PATCH_MODE = patch_mode.DELETE_IF_DEPENDANT
+CACHE_INFO = True
 VERSION = "1.1.1"
 
 get_metadata_comparison = empty_method_returns_dict
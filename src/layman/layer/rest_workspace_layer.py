@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request, current_app as app, g
 
-from layman.common import rest as rest_util
+from layman.common import rest as rest_util, redis as redis_util
 from layman.http import LaymanError
 from layman.util import check_username_decorator
 from layman import settings, authn, util as layman_util
@@ -158,7 +158,8 @@ def patch(workspace, layername):
         layername,
         kwargs,
         delete_from,
-        'layman.layer.filesystem.input_chunk' if use_chunk_upload else delete_from
+        'layman.layer.filesystem.input_chunk' if use_chunk_upload else delete_from,
+        redis_util.get_request_lock_token(),
     )
 
     app.logger.info('PATCH Layer changes done')
@@ -1,10 +1,10 @@
 from flask import Blueprint, jsonify, request, current_app as app, g
 
-from layman import LaymanError, util as layman_util
+from layman import LaymanError, util as layman_util, celery as celery_util
 from layman.util import check_username_decorator
 from layman.authn import authenticate
 from layman.authz import authorize_workspace_publications_decorator
-from . import util, LAYER_REST_PATH_NAME
+from . import util, LAYER_REST_PATH_NAME, LAYER_TYPE
 from .filesystem import input_chunk
 
 bp = Blueprint('rest_workspace_layer_chunk', __name__)
@@ -46,7 +46,9 @@ def post(workspace, layername):
     input_chunk.save_layer_file_chunk(workspace, layername, parameter_name,
                                       filename, chunk,
                                       chunk_number, total_chunks)
-    # time.sleep(5)
+    celery_util.touch_deferred_chain(workspace, LAYER_TYPE, layername)
+    if input_chunk.complete_layer_file_upload(workspace, layername):
+        celery_util.run_deferred_chain(workspace, LAYER_TYPE, layername)
 
     return jsonify({
         'message': 'Chunk saved.'
@@ -126,7 +126,7 @@ def post(workspace):
         filenames = [f.filename for f in files]
     input_file.check_filenames(workspace, layername, filenames, check_crs)
 
-    redis_util.lock_publication(workspace, LAYER_TYPE, layername, request.method)
+    lock_token = redis_util.lock_publication(workspace, LAYER_TYPE, layername, request.method)
 
     try:
         # register layer uuid
@@ -155,14 +155,15 @@ def post(workspace):
             workspace,
             layername,
             task_options,
-            'layman.layer.filesystem.input_chunk' if use_chunk_upload else 'layman.layer.filesystem.input_file'
+            'layman.layer.filesystem.input_chunk' if use_chunk_upload else 'layman.layer.filesystem.input_file',
+            lock_token,
         )
     except Exception as e:
         try:
             if util.is_layer_chain_ready(workspace, layername):
-                redis_util.unlock_publication(workspace, LAYER_TYPE, layername)
+                redis_util.unlock_publication(workspace, LAYER_TYPE, layername, token=lock_token)
         finally:
-            redis_util.unlock_publication(workspace, LAYER_TYPE, layername)
+            redis_util.unlock_publication(workspace, LAYER_TYPE, layername, token=lock_token)
         raise e
 
     # app.logger.info('uploaded layer '+layername)
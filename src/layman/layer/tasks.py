@@ -0,0 +1,29 @@
+import time
+
+from layman import celery as celery_util, celery_app, settings
+from . import LAYER_TYPE
+
+
+@celery_app.task(
+    name='layman.layer.run_patch_after_wfst',
+)
+def run_patch_after_wfst(workspace, layername, deferred_at):
+    """Send deferred patch_after_wfst chain to workers.
+
+    The chain is sent when no WFS-T request came for LAYMAN_WFST_REFRESH_DEBOUNCE_TIME, but not later than
+    LAYMAN_WFST_REFRESH_MAX_DELAY after the chain was deferred. Otherwise the check is scheduled again.
+    """
+    last_activity = celery_util.get_deferred_chain_activity(workspace, LAYER_TYPE, layername)
+    if last_activity is None:
+        return
+    run_at = min(last_activity + settings.LAYMAN_WFST_REFRESH_DEBOUNCE_TIME,
+                 deferred_at + settings.LAYMAN_WFST_REFRESH_MAX_DELAY)
+    countdown = run_at - time.time()
+    if countdown > 0:
+        run_patch_after_wfst.apply_async(
+            kwargs={'workspace': workspace, 'layername': layername, 'deferred_at': deferred_at},
+            countdown=countdown,
+            queue=settings.LAYMAN_CELERY_QUEUE,
+        )
+    else:
+        celery_util.run_deferred_chain(workspace, LAYER_TYPE, layername)
@@ -1,9 +1,10 @@
 from functools import wraps, partial
 import re
+import time
 
 from flask import current_app, request, g
 
-from layman import LaymanError, patch_mode, util as layman_util
+from layman import LaymanError, patch_mode, settings, util as layman_util
 from layman.util import call_modules_fn, get_providers_from_source_names, get_internal_sources, \
     to_safe_name, url_for
 from layman import celery as celery_util
@@ -38,7 +39,8 @@ def info_decorator(f):
     def decorated_function(*args, **kwargs):
         workspace = request.view_args['workspace']
         layername = request.view_args['layername']
-        info = get_complete_layer_info(workspace, layername)
+        # internal sources are asked in parallel only by read-only requests
+        info = get_complete_layer_info(workspace, layername, concurrent=request.method == 'GET')
         assert FLASK_INFO_KEY not in g, g.get(FLASK_INFO_KEY)
         # current_app.logger.info(f"Setting INFO of layer {username}:{layername}")
         g.setdefault(FLASK_INFO_KEY, info)
@@ -76,38 +78,37 @@ def check_new_layername(workspace, layername):
 def get_layer_info(workspace, layername, context=None):
     partial_info = layman_util.get_publication_info(workspace, LAYER_TYPE, layername, context)
 
-    chain_info = _get_layer_chain(workspace, layername)
-    if chain_info is None or celery_util.is_chain_successful(chain_info):
+    chain_state = celery_util.get_publication_chain_state(workspace, LAYER_TYPE, layername)
+    if chain_state is None or celery_util.is_chain_state_successful(chain_state):
         return partial_info
 
     failed = False
-    for res in chain_info['by_order']:
-        task_name = next(k for k, v in chain_info['by_name'].items() if v == res)
+    for task_name, task_state in chain_state:
         source_state = {
-            'status': res.state if not failed else 'NOT_AVAILABLE'
+            'status': task_state['state'] if not failed else 'NOT_AVAILABLE'
         }
-        if res.failed():
+        if 'progress' in task_state:
+            source_state['progress'] = task_state['progress']
+        if task_state['state'] == 'FAILURE':
             failed = True
-            res_exc = res.get(propagate=False)
-            # current_app.logger.info(f"Exception catched: {str(res_exc)}")
-            if isinstance(res_exc, LaymanError):
+            if 'error' in task_state:
                 source_state.update({
-                    'error': res_exc.to_dict()
+                    'error': task_state['error']
                 })
         if task_name not in TASKS_TO_LAYER_INFO_KEYS:
             continue
         for layerinfo_key in TASKS_TO_LAYER_INFO_KEYS[task_name]:
-            if layerinfo_key not in partial_info or not res.successful():
+            if layerinfo_key not in partial_info or task_state['state'] != 'SUCCESS':
                 partial_info[layerinfo_key] = source_state
 
     return partial_info
 
 
-def get_complete_layer_info(username=None, layername=None, cached=False):
+def get_complete_layer_info(username=None, layername=None, cached=False, concurrent=False):
     assert (username is not None and layername is not None) or cached
     if cached:
         return g.get(FLASK_INFO_KEY)
-    partial_info = get_layer_info(username, layername)
+    partial_info = get_layer_info(username, layername, context={'concurrent': concurrent})
 
     if not any(partial_info):
         raise LaymanError(15, {'layername': layername})
@@ -154,32 +155,45 @@ def pre_publication_action_check(workspace, layername, task_options):
     call_modules_fn(sources, 'pre_publication_action_check', [workspace, layername], kwargs=task_options)
 
 
-def post_layer(workspace, layername, task_options, start_async_at):
+def post_layer(workspace, layername, task_options, start_async_at, lock_token):
     # sync processing
     sources = get_sources()
     call_modules_fn(sources, 'post_layer', [workspace, layername], kwargs=task_options)
+    layman_util.invalidate_publication_info(workspace, LAYER_TYPE, layername)
 
     post_tasks = tasks_util.get_task_methods(get_layer_type_def(), workspace, layername, task_options, start_async_at)
-    post_chain = tasks_util.get_chain_of_methods(workspace, layername, post_tasks, task_options, 'layername')
-    # res = post_chain.apply_async()
-    res = post_chain()
+    post_chain = tasks_util.get_chain_of_methods(workspace, layername, post_tasks, task_options, 'layername',
+                                                 publ_type=get_layer_type_def())
+    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, post_tasks, post_chain,
+                                           lock_token=lock_token)
+    _run_or_defer_chain(workspace, layername, post_chain, start_async_at)
 
-    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, post_tasks, res)
 
-
-def patch_layer(workspace, layername, task_options, stop_sync_at, start_async_at):
+def patch_layer(workspace, layername, task_options, stop_sync_at, start_async_at, lock_token):
     # sync processing
     sources = get_sources()
     stop_idx = next((idx for idx, s in enumerate(sources) if s.__name__ == stop_sync_at), len(sources))
     sources = sources[:stop_idx]
     call_modules_fn(sources, 'patch_layer', [workspace, layername], kwargs=task_options)
+    layman_util.invalidate_publication_info(workspace, LAYER_TYPE, layername, [s.__name__ for s in sources])
 
     patch_tasks = tasks_util.get_task_methods(get_layer_type_def(), workspace, layername, task_options, start_async_at)
-    patch_chain = tasks_util.get_chain_of_methods(workspace, layername, patch_tasks, task_options, 'layername')
-    # res = patch_chain.apply_async()
-    res = patch_chain()
+    patch_chain = tasks_util.get_chain_of_methods(workspace, layername, patch_tasks, task_options, 'layername',
+                                                  publ_type=get_layer_type_def())
+    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, patch_tasks, patch_chain,
+                                           lock_token=lock_token)
+    _run_or_defer_chain(workspace, layername, patch_chain, start_async_at)
+
 
-    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, patch_tasks, res)
+def _run_or_defer_chain(workspace, layername, task_chain, start_async_at):
+    if start_async_at == 'layman.layer.filesystem.input_chunk':
+        # chain is sent to workers by the chunk endpoint once all chunks are uploaded,
+        # or by layman.layer.filesystem.tasks.sweep_inactive_uploads on inactivity
+        res = celery_util.defer_chain(workspace, LAYER_TYPE, layername, task_chain)
+    else:
+        # res = task_chain.apply_async()
+        res = task_chain()
+    return res
 
 
 TASKS_TO_LAYER_INFO_KEYS = {
@@ -193,12 +207,25 @@ TASKS_TO_LAYER_INFO_KEYS = {
 }
 
 
-def patch_after_wfst(workspace, layername, **kwargs):
+def patch_after_wfst(workspace, layername, lock_token, **kwargs):
+    # WFS-T requests coming in a burst are coalesced into one chain, that is sent to workers by run_patch_after_wfst
+    debounce = redis_util.get_publication_lock(workspace, LAYER_TYPE, layername) == 'wfst'
+    if debounce and celery_util.touch_deferred_chain(workspace, LAYER_TYPE, layername):
+        return
     task_methods = tasks_util.get_source_task_methods(get_layer_type_def(), 'patch_after_wfst')
     patch_chain = tasks_util.get_chain_of_methods(workspace, layername, task_methods, kwargs, 'layername')
-    res = patch_chain()
-
-    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, task_methods, res)
+    celery_util.set_publication_chain_info(workspace, LAYER_TYPE, layername, task_methods, patch_chain,
+                                           lock_token=lock_token)
+    if debounce:
+        celery_util.defer_chain(workspace, LAYER_TYPE, layername, patch_chain)
+        from .tasks import run_patch_after_wfst
+        run_patch_after_wfst.apply_async(
+            kwargs={'workspace': workspace, 'layername': layername, 'deferred_at': time.time()},
+            countdown=settings.LAYMAN_WFST_REFRESH_DEBOUNCE_TIME,
+            queue=settings.LAYMAN_CELERY_QUEUE,
+        )
+    else:
+        patch_chain()
 
 
 def delete_layer(workspace, layername, source=None, http_method='delete'):
@@ -217,6 +244,7 @@ def delete_layer(workspace, layername, source=None, http_method='delete'):
 
     result = {}
     results = call_modules_fn(sources, 'delete_layer', [workspace, layername])
+    layman_util.invalidate_publication_info(workspace, LAYER_TYPE, layername, [s.__name__ for s in sources])
     for r in results.values():
         if r is not None:
             result.update(r)
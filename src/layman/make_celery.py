@@ -23,6 +23,13 @@ def make_celery(app):
         },
         # https://stackoverflow.com/a/38267978
         task_track_started=True,
+        beat_schedule={
+            'sweep-inactive-uploads': {
+                'task': 'layman.layer.filesystem.input_chunk.sweep',
+                'schedule': settings.UPLOAD_SWEEP_INTERVAL,
+                'options': {'queue': settings.LAYMAN_CELERY_QUEUE},
+            },
+        },
     )
 
     class Task(celery_app.Task):
@@ -66,7 +73,8 @@ def on_task_prerun(**kwargs):
             ),
             None
         )
-        if publication_type is None:
+        # periodic tasks are not related to any publication
+        if publication_type is None or not kwargs['args']:
             return
         username = kwargs['args'][0]
         publication_name = kwargs['args'][1]
@@ -88,9 +96,11 @@ def on_task_postrun(**kwargs):
             ),
             None
         )
-        if publication_type is None:
+        # periodic tasks are not related to any publication
+        if publication_type is None or not kwargs['args']:
             return
         username = kwargs['args'][0]
         publication_name = kwargs['args'][1]
         task_id = kwargs['task_id']
-        task_postrun(username, publication_type, publication_name, task_id, task_name, kwargs['state'])
+        task_postrun(username, publication_type, publication_name, task_id, task_name, kwargs['state'],
+                     task_retval=kwargs.get('retval'))
@@ -22,6 +22,7 @@ MAP_SUBDIR = __name__.split('.')[-1]
 get_metadata_comparison = empty_method_returns_dict
 pre_publication_action_check = empty_method
 post_map = empty_method
+CACHE_INFO = True
 
 
 def get_map_thumbnail_dir(username, mapname):
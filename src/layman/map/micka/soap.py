@@ -5,6 +5,8 @@ from . import csw
 from .. import MAP_TYPE
 
 pre_publication_action_check = empty_method
+CACHE_INFO = True
+CACHE_INFO_EXTERNAL = True
 
 get_map_info = csw.get_map_info
 post_map = csw.post_map
@@ -5,7 +5,7 @@ from flask import Blueprint, jsonify, request, current_app as app, g
 from werkzeug.datastructures import FileStorage
 
 from layman import authn, util as layman_util
-from layman.common import rest as rest_util
+from layman.common import rest as rest_util, redis as redis_util
 from layman.util import check_username_decorator
 from layman.authn import authenticate
 from layman.authz import authorize_workspace_publications_decorator
@@ -103,7 +103,8 @@ def patch(workspace, mapname):
         workspace,
         mapname,
         kwargs,
-        'layman.map.filesystem.input_file' if file_changed else None
+        'layman.map.filesystem.input_file' if file_changed else None,
+        redis_util.get_request_lock_token(),
     )
 
     info = util.get_complete_map_info(workspace, mapname)
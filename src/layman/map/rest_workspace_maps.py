@@ -75,7 +75,7 @@ def post(workspace):
 
     mapurl = url_for('rest_workspace_map.get', mapname=mapname, workspace=workspace)
 
-    redis_util.lock_publication(workspace, MAP_TYPE, mapname, request.method)
+    lock_token = redis_util.lock_publication(workspace, MAP_TYPE, mapname, request.method)
 
     try:
         map_result = {
@@ -115,14 +115,15 @@ def post(workspace):
             workspace,
             mapname,
             kwargs,
-            'layman.map.filesystem.input_file'
+            'layman.map.filesystem.input_file',
+            lock_token,
         )
     except Exception as e:
         try:
             if util.is_map_chain_ready(workspace, mapname):
-                redis_util.unlock_publication(workspace, MAP_TYPE, mapname)
+                redis_util.unlock_publication(workspace, MAP_TYPE, mapname, token=lock_token)
         finally:
-            redis_util.unlock_publication(workspace, MAP_TYPE, mapname)
+            redis_util.unlock_publication(workspace, MAP_TYPE, mapname, token=lock_token)
         raise e
 
     # app.logger.info('uploaded map '+mapname)
@@ -6,7 +6,8 @@ import pytest
 
 del sys.modules['layman']
 
-from layman import app
+from layman import app, celery as celery_util
+from layman.map import MAP_TYPE
 
 
 @pytest.mark.usefixtures('ensure_layman')
@@ -55,3 +56,19 @@ def test_get_maps():
                                               internal=False)
 
     process_client.delete_workspace_map(username, mapname)
+
+
+@pytest.mark.usefixtures('ensure_layman')
+def test_chain_state_of_fast_chain():
+    workspace = 'test_chain_state_of_fast_chain_workspace'
+    mapname = 'test_chain_state_of_fast_chain_map'
+    # tasks of map chain finish quickly, the first one usually before the request is finished
+    process_client.publish_workspace_map(workspace, mapname)
+    process_client.wait_for_publication_chain(process_client.MAP_TYPE, workspace, mapname)
+
+    with app.app_context():
+        chain_state = celery_util.get_publication_chain_state(workspace, MAP_TYPE, mapname)
+    assert chain_state
+    assert celery_util.is_chain_state_successful(chain_state), chain_state
+
+    process_client.delete_workspace_map(workspace, mapname)
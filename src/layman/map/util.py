@@ -45,7 +45,8 @@ def info_decorator(f):
     def decorated_function(*args, **kwargs):
         workspace = request.view_args['workspace']
         mapname = request.view_args['mapname']
-        info = get_complete_map_info(workspace, mapname)
+        # internal sources are asked in parallel only by read-only requests
+        info = get_complete_map_info(workspace, mapname, concurrent=request.method == 'GET')
         assert FLASK_INFO_KEY not in g, g.get(FLASK_INFO_KEY)
         # current_app.logger.info(f"Setting INFO of map {username}:{mapname}")
         g.setdefault(FLASK_INFO_KEY, info)
@@ -84,27 +85,25 @@ TASKS_TO_MAP_INFO_KEYS = {
 def get_map_info(workspace, mapname, context=None):
     partial_info = layman_util.get_publication_info(workspace, MAP_TYPE, mapname, context)
 
-    chain_info = _get_map_chain(workspace, mapname)
-    if chain_info is None or celery_util.is_chain_successful(chain_info):
+    chain_state = celery_util.get_publication_chain_state(workspace, MAP_TYPE, mapname)
+    if chain_state is None or celery_util.is_chain_state_successful(chain_state):
         return partial_info
 
     failed = False
-    for res in chain_info['by_order']:
-        task_name = next(k for k, v in chain_info['by_name'].items() if v == res)
+    for task_name, task_state in chain_state:
         source_state = {
-            'status': res.state if not failed else 'NOT_AVAILABLE'
+            'status': task_state['state'] if not failed else 'NOT_AVAILABLE'
         }
-        if res.failed():
+        if task_state['state'] == 'FAILURE':
             failed = True
-            res_exc = res.get(propagate=False)
-            if isinstance(res_exc, LaymanError):
+            if 'error' in task_state:
                 source_state.update({
-                    'error': res_exc.to_dict()
+                    'error': task_state['error']
                 })
         if task_name not in TASKS_TO_MAP_INFO_KEYS:
             continue
         for mapinfo_key in TASKS_TO_MAP_INFO_KEYS[task_name]:
-            if mapinfo_key not in partial_info or not res.successful():
+            if mapinfo_key not in partial_info or task_state['state'] != 'SUCCESS':
                 partial_info[mapinfo_key] = source_state
 
     return partial_info
@@ -116,45 +115,48 @@ def pre_publication_action_check(workspace, mapname, task_options):
     call_modules_fn(sources, 'pre_publication_action_check', [workspace, mapname], kwargs=task_options)
 
 
-def post_map(workspace, mapname, task_options, start_at):
+def post_map(workspace, mapname, task_options, start_at, lock_token):
     # sync processing
     sources = get_sources()
     call_modules_fn(sources, 'post_map', [workspace, mapname], kwargs=task_options)
+    layman_util.invalidate_publication_info(workspace, MAP_TYPE, mapname)
 
     # async processing
     post_tasks = tasks_util.get_task_methods(get_map_type_def(), workspace, mapname, task_options, start_at)
-    post_chain = tasks_util.get_chain_of_methods(workspace, mapname, post_tasks, task_options, 'mapname')
-    # res = post_chain.apply_async()
-    res = post_chain()
+    post_chain = tasks_util.get_chain_of_methods(workspace, mapname, post_tasks, task_options, 'mapname',
+                                                 publ_type=get_map_type_def())
+    celery_util.set_publication_chain_info(workspace, MAP_TYPE, mapname, post_tasks, post_chain, lock_token=lock_token)
+    # post_chain.apply_async()
+    post_chain()
 
-    celery_util.set_publication_chain_info(workspace, MAP_TYPE, mapname, post_tasks, res)
 
-
-def patch_map(workspace, mapname, task_options, start_at):
+def patch_map(workspace, mapname, task_options, start_at, lock_token):
     # sync processing
     sources = get_sources()
     call_modules_fn(sources, 'patch_map', [workspace, mapname], kwargs=task_options)
+    layman_util.invalidate_publication_info(workspace, MAP_TYPE, mapname)
 
     # async processing
     patch_tasks = tasks_util.get_task_methods(get_map_type_def(), workspace, mapname, task_options, start_at)
-    patch_chain = tasks_util.get_chain_of_methods(workspace, mapname, patch_tasks, task_options, 'mapname')
-    # res = patch_chain.apply_async()
-    res = patch_chain()
-
-    celery_util.set_publication_chain_info(workspace, MAP_TYPE, mapname, patch_tasks, res)
+    patch_chain = tasks_util.get_chain_of_methods(workspace, mapname, patch_tasks, task_options, 'mapname',
+                                                  publ_type=get_map_type_def())
+    celery_util.set_publication_chain_info(workspace, MAP_TYPE, mapname, patch_tasks, patch_chain, lock_token=lock_token)
+    # patch_chain.apply_async()
+    patch_chain()
 
 
 def delete_map(workspace, mapname, kwargs=None):
     sources = get_sources()
     call_modules_fn(sources[::-1], 'delete_map', [workspace, mapname], kwargs=kwargs)
+    layman_util.invalidate_publication_info(workspace, MAP_TYPE, mapname)
     celery_util.delete_publication(workspace, MAP_TYPE, mapname)
 
 
-def get_complete_map_info(username=None, mapname=None, cached=False):
+def get_complete_map_info(username=None, mapname=None, cached=False, concurrent=False):
     assert (username is not None and mapname is not None) or cached
     if cached:
         return g.get(FLASK_INFO_KEY)
-    partial_info = get_map_info(username, mapname)
+    partial_info = get_map_info(username, mapname, context={'concurrent': concurrent})
 
     if not any(partial_info):
         raise LaymanError(26, {'mapname': mapname})
@@ -1,5 +1,7 @@
+import urllib.parse
 from test import process_client, prime_db_schema_client
 import pytest
+import requests
 
 from layman import LaymanError, settings
 
@@ -373,6 +375,52 @@ class TestGetPublications:
         response = process_client.get_publications_response(publication_type, headers=headers, query_params=query_params)
         TestGetPublications.assert_response(response, expected_publications, expected_headers)
 
+    @staticmethod
+    @pytest.mark.parametrize('query_params', [
+        {},
+        {'order_by': 'title'},
+        {'order_by': 'last_change'},
+        {'full_text_filter': 'kůň'},
+        {'ordering_bbox': ','.join(str(c) for c in (2999, 2999, 5001, 5001))},
+    ])
+    @pytest.mark.parametrize('publication_type', process_client.PUBLICATION_TYPES)
+    @pytest.mark.usefixtures('liferay_mock', 'ensure_layman', 'provide_data')
+    def test_get_publications_cursor(publication_type, query_params):
+        headers = TestGetPublications.authn_headers_user2
+        response = process_client.get_publications_response(publication_type, headers=headers, query_params=query_params)
+        expected_publications = [(info['workspace'], info['name']) for info in response.json()]
+
+        response = process_client.get_publications_response(publication_type, headers=headers,
+                                                            query_params={**query_params, 'limit': 2})
+        assert response.headers['X-Total-Count'] == str(len(expected_publications))
+        publications = [(info['workspace'], info['name']) for info in response.json()]
+        while 'next' in response.links:
+            response = requests.get(response.links['next']['url'], headers=headers)
+            assert response.status_code == 200, response.text
+            assert 'X-Total-Count' not in response.headers
+            assert 'Content-Range' not in response.headers
+            page = [(info['workspace'], info['name']) for info in response.json()]
+            assert 0 < len(page) <= 2
+            publications += page
+        assert publications == expected_publications
+
+        response = process_client.get_publications_response(publication_type, headers=headers,
+                                                            query_params={**query_params, 'limit': 1,
+                                                                          'total_count': 'estimate'})
+        assert 'X-Total-Count' not in response.headers
+        assert int(response.headers['X-Total-Count-Estimate']) >= 0
+        assert response.headers['Content-Range'] == 'items 1-1/*'
+
+        cursor = urllib.parse.parse_qs(urllib.parse.urlparse(response.links['next']['url']).query)['cursor'][0]
+        with pytest.raises(LaymanError) as exc_info:
+            process_client.get_publications(publication_type, headers=headers,
+                                            query_params={**query_params, 'cursor': cursor, 'offset': 1})
+        assert exc_info.value.code == 48
+        with pytest.raises(LaymanError) as exc_info:
+            process_client.get_publications(publication_type, headers=headers,
+                                            query_params={**query_params, 'cursor': 'not_a_cursor'})
+        assert exc_info.value.code == 2
+
     @staticmethod
     @pytest.mark.parametrize('workspace, headers, query_params, expected_publications, expected_headers', [
         (workspace1, authn_headers_user2, {}, [
@@ -34,6 +34,9 @@ MIGRATIONS = {
         ]),
         ((1, 13, 0), [
             upgrade_v1_13.rename_users_directory,
+            upgrade_v1_13.adjust_prime_db_schema_for_access_rights,
+            upgrade_v1_13.adjust_prime_db_schema_for_fulltext_index,
+            upgrade_v1_13.adjust_prime_db_schema_for_bbox_index,
         ]),
     ],
     consts.MIGRATION_TYPE_DATA: [
@@ -42,6 +45,10 @@ MIGRATIONS = {
             upgrade_v1_12.migrate_layer_metadata,
             upgrade_v1_12.adjust_data_for_bbox_search,
         ]),
+        ((1, 13, 0), [
+            upgrade_v1_13.adjust_data_for_access_rights,
+            upgrade_v1_13.adjust_data_for_fulltext_index,
+        ]),
     ],
 }
 
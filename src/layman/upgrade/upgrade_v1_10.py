@@ -104,7 +104,7 @@ where p.type = %s
                                             info.get('title'),
                                             info.get('access_rights'),
                                             geoserver_workspace=geoserver_workspace)
-            wms.clear_cache(workspace)
+            wms.clear_cache(workspace, layer)
         else:
             r.raise_for_status()
             logger.info(f'        Layer already migrated.')
@@ -116,7 +116,7 @@ where p.type = %s
                 sld_stream = io.BytesIO(sld_r.content)
                 gs_util.post_workspace_sld_style(geoserver_workspace, layer, sld_stream, launder_attribute_name)
                 gs_util.delete_workspace_style(workspace, layer, auth=settings.LAYMAN_GS_AUTH)
-                wms.clear_cache(workspace)
+                wms.clear_cache(workspace, layer)
             else:
                 logger.warning(f"      Error when loading SLD style from GeoServer, status code={sld_r.status_code}, response=\n{sld_r.content}")
         else:
@@ -186,7 +186,7 @@ def migrate_metadata_records(workspace_filter=None):
         params = params + (workspace_filter,)
     publications = db_util.run_query(query, params)
     for (workspace, layer) in publications:
-        wms.clear_cache(workspace)
+        wms.clear_cache(workspace, layer)
         logger.info(f'      Migrate layer {workspace}.{layer}')
         try:
             muuid = layer_csw.patch_layer(workspace, layer, ['wms_url', 'graphic_url', 'identifier', 'layer_endpoint', ],
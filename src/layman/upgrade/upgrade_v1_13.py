@@ -1,8 +1,11 @@
 import os
 import logging
 
+from db import util as db_util
 from layman import settings
 logger = logging.getLogger(__name__)
+DB_SCHEMA = settings.LAYMAN_PRIME_SCHEMA
+ROLE_EVERYONE = settings.RIGHTS_EVERYONE_ROLE
 
 
 def rename_users_directory():
@@ -12,3 +15,133 @@ def rename_users_directory():
     if os.path.exists(old_name):
         os.rename(old_name, new_name)
     logger.info(f'    DONE - Rename directory users to workspaces')
+
+
+def adjust_prime_db_schema_for_access_rights():
+    logger.info(f'    Alter DB prime schema for denormalized access rights')
+    statement = f'''
+    ALTER TABLE {DB_SCHEMA}.publications ADD COLUMN IF NOT EXISTS can_read_users text[] not null default '{{}}';
+    ALTER TABLE {DB_SCHEMA}.publications ADD COLUMN IF NOT EXISTS can_write_users text[] not null default '{{}}';
+    CREATE INDEX IF NOT EXISTS publications_can_read_users_idx ON {DB_SCHEMA}.publications USING GIN (can_read_users);
+    CREATE INDEX IF NOT EXISTS publications_can_write_users_idx ON {DB_SCHEMA}.publications USING GIN (can_write_users);
+
+    -- owner of personal workspace, users with explicit right ordered by name, and role EVERYONE
+    CREATE OR REPLACE FUNCTION {DB_SCHEMA}.get_access_rights(p_id_publication integer, p_id_workspace integer,
+                                                             p_everyone boolean, p_right_type text) RETURNS text[]
+    LANGUAGE SQL STABLE AS $$
+        select array(select w.name::text
+                     from {DB_SCHEMA}.workspaces w inner join
+                          {DB_SCHEMA}.users u on u.id_workspace = w.id
+                     where w.id = $2)
+            || array(select w2.name::text
+                     from {DB_SCHEMA}.rights r inner join
+                          {DB_SCHEMA}.users u2 on r.id_user = u2.id inner join
+                          {DB_SCHEMA}.workspaces w2 on w2.id = u2.id_workspace
+                     where r.id_publication = $1
+                       and r.type = $4
+                     order by w2.name)
+            || case when $3 then array['{ROLE_EVERYONE}'] else array[]::text[] end
+    $$;
+
+    CREATE OR REPLACE FUNCTION {DB_SCHEMA}.publications_set_access_rights() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.can_read_users := {DB_SCHEMA}.get_access_rights(NEW.id, NEW.id_workspace, NEW.everyone_can_read, 'read');
+        NEW.can_write_users := {DB_SCHEMA}.get_access_rights(NEW.id, NEW.id_workspace, NEW.everyone_can_write, 'write');
+        RETURN NEW;
+    END $$;
+
+    CREATE OR REPLACE FUNCTION {DB_SCHEMA}.rights_refresh_access_rights() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        update {DB_SCHEMA}.publications p set
+            can_read_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_read, 'read'),
+            can_write_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_write, 'write')
+        where p.id = (case when TG_OP = 'DELETE' then OLD.id_publication else NEW.id_publication end);
+        RETURN NULL;
+    END $$;
+
+    CREATE OR REPLACE FUNCTION {DB_SCHEMA}.users_refresh_access_rights() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        update {DB_SCHEMA}.publications p set
+            can_read_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_read, 'read'),
+            can_write_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_write, 'write')
+        where p.id_workspace = (case when TG_OP = 'DELETE' then OLD.id_workspace else NEW.id_workspace end);
+        RETURN NULL;
+    END $$;
+
+    DROP TRIGGER IF EXISTS publications_set_access_rights ON {DB_SCHEMA}.publications;
+    CREATE TRIGGER publications_set_access_rights
+        BEFORE INSERT OR UPDATE OF id_workspace, everyone_can_read, everyone_can_write ON {DB_SCHEMA}.publications
+        FOR EACH ROW EXECUTE PROCEDURE {DB_SCHEMA}.publications_set_access_rights();
+
+    DROP TRIGGER IF EXISTS rights_refresh_access_rights ON {DB_SCHEMA}.rights;
+    CREATE TRIGGER rights_refresh_access_rights
+        AFTER INSERT OR UPDATE OR DELETE ON {DB_SCHEMA}.rights
+        FOR EACH ROW EXECUTE PROCEDURE {DB_SCHEMA}.rights_refresh_access_rights();
+
+    DROP TRIGGER IF EXISTS users_refresh_access_rights ON {DB_SCHEMA}.users;
+    CREATE TRIGGER users_refresh_access_rights
+        AFTER INSERT OR UPDATE OF id_workspace OR DELETE ON {DB_SCHEMA}.users
+        FOR EACH ROW EXECUTE PROCEDURE {DB_SCHEMA}.users_refresh_access_rights();
+    '''
+    db_util.run_statement(statement)
+
+
+def adjust_data_for_access_rights():
+    logger.info(f'    Starting - Set access rights columns for all publications')
+    statement = f'''update {DB_SCHEMA}.publications p set
+        can_read_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_read, 'read'),
+        can_write_users = {DB_SCHEMA}.get_access_rights(p.id, p.id_workspace, p.everyone_can_write, 'write')
+    ;'''
+    db_util.run_statement(statement)
+    logger.info(f'    DONE - Set access rights columns for all publications')
+
+
+def adjust_prime_db_schema_for_fulltext_index():
+    logger.info(f'    Alter DB prime schema for indexed full-text search')
+    statement = f'''
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    ALTER TABLE {DB_SCHEMA}.publications ADD COLUMN IF NOT EXISTS title_tsv tsvector;
+    ALTER TABLE {DB_SCHEMA}.publications ADD COLUMN IF NOT EXISTS title_unaccent text;
+    drop index if exists {DB_SCHEMA}.title_tsv_idx;
+    CREATE INDEX IF NOT EXISTS publications_title_tsv_idx ON {DB_SCHEMA}.publications USING GIN (title_tsv);
+    CREATE INDEX IF NOT EXISTS publications_title_unaccent_trgm_idx ON {DB_SCHEMA}.publications
+        USING GIN (title_unaccent gin_trgm_ops);
+
+    CREATE OR REPLACE FUNCTION {DB_SCHEMA}.publications_set_title_search() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.title_tsv := {DB_SCHEMA}.my_unaccent(NEW.title);
+        NEW.title_unaccent := lower(unaccent(NEW.title));
+        RETURN NEW;
+    END $$;
+
+    DROP TRIGGER IF EXISTS publications_set_title_search ON {DB_SCHEMA}.publications;
+    CREATE TRIGGER publications_set_title_search
+        BEFORE INSERT OR UPDATE OF title ON {DB_SCHEMA}.publications
+        FOR EACH ROW EXECUTE PROCEDURE {DB_SCHEMA}.publications_set_title_search();
+    '''
+    db_util.run_statement(statement)
+
+
+def adjust_data_for_fulltext_index():
+    logger.info(f'    Starting - Set full-text search columns for all publications')
+    statement = f'''update {DB_SCHEMA}.publications set
+        title_tsv = {DB_SCHEMA}.my_unaccent(title),
+        title_unaccent = lower(unaccent(title))
+    ;'''
+    db_util.run_statement(statement)
+
+    statement = f'''ALTER TABLE {DB_SCHEMA}.publications ALTER COLUMN title_tsv SET NOT NULL;
+    ALTER TABLE {DB_SCHEMA}.publications ALTER COLUMN title_unaccent SET NOT NULL;'''
+    db_util.run_statement(statement)
+    logger.info(f'    DONE - Set full-text search columns for all publications')
+
+
+def adjust_prime_db_schema_for_bbox_index():
+    logger.info(f'    Alter DB prime schema for indexed search by bbox')
+    statement = f'''CREATE INDEX IF NOT EXISTS publications_bbox_idx ON {DB_SCHEMA}.publications
+        USING GIST ((bbox::geometry));'''
+    db_util.run_statement(statement)
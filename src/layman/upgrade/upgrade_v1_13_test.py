@@ -1,10 +1,16 @@
 import os
 import logging
 import pathlib
+from test import prime_db_schema_client
 
-from layman import settings
+from db import util as db_util
+from layman import app, settings
+from layman.common.prime_db_schema import publications
+from layman.layer import LAYER_TYPE
+from layman.map import MAP_TYPE
 from . import upgrade_v1_13
 logger = logging.getLogger(__name__)
+DB_SCHEMA = settings.LAYMAN_PRIME_SCHEMA
 
 
 def test_rename_users_directory():
@@ -18,3 +24,36 @@ def test_rename_users_directory():
     upgrade_v1_13.rename_users_directory()
 
     assert os.path.exists(new_name)
+
+
+def test_adjust_data_for_access_rights():
+    owner = 'test_adjust_data_for_access_rights_owner'
+    reader = 'test_adjust_data_for_access_rights_reader'
+    workspace = 'test_adjust_data_for_access_rights_workspace'
+    layer = 'test_adjust_data_for_access_rights_layer'
+    mapname = 'test_adjust_data_for_access_rights_map'
+    prime_db_schema_client.ensure_user(owner)
+    prime_db_schema_client.ensure_user(reader)
+    prime_db_schema_client.post_workspace_publication(LAYER_TYPE, owner, layer, actor=owner,
+                                                      access_rights={'read': {owner, reader}, 'write': {owner}})
+    prime_db_schema_client.post_workspace_publication(MAP_TYPE, workspace, mapname)
+
+    expected_rights = {
+        (owner, LAYER_TYPE, layer): {'read': [owner, reader], 'write': [owner]},
+        (workspace, MAP_TYPE, mapname): {'read': [settings.RIGHTS_EVERYONE_ROLE], 'write': [settings.RIGHTS_EVERYONE_ROLE]},
+    }
+
+    def assert_access_rights():
+        with app.app_context():
+            for (publ_workspace, publ_type, publ_name), access_rights in expected_rights.items():
+                info = publications.get_publication_info(publ_workspace, publ_type, publ_name)
+                assert info['access_rights'] == access_rights
+
+    assert_access_rights()
+    statement = f'''update {DB_SCHEMA}.publications set can_read_users = '{{}}', can_write_users = '{{}}';'''
+    with app.app_context():
+        db_util.run_statement(statement)
+        upgrade_v1_13.adjust_data_for_access_rights()
+    assert_access_rights()
+
+    prime_db_schema_client.clear_workspaces([owner, reader, workspace])
@@ -1,17 +1,23 @@
+from concurrent import futures
 from functools import wraps
 import importlib
 import inspect
+import os
 import re
+import threading
+import time
 import unicodedata
 import urllib.parse
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 import logging
 
-from flask import current_app, request, url_for as flask_url_for, jsonify
+from flask import current_app, g, request, url_for as flask_url_for, jsonify
 from unidecode import unidecode
 
 from layman import settings
 from layman.http import LaymanError
+from layman.cache import publication_info as publication_info_cache
+from layman.common import get_publications_consts
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +28,17 @@ USERNAME_PATTERN = r"^" + USERNAME_ONLY_PATTERN + r"$"
 FLASK_PROVIDERS_KEY = f'{__name__}:PROVIDERS'
 FLASK_PUBLICATION_TYPES_KEY = f'{__name__}:PUBLICATION_TYPES'
 FLASK_PUBLICATION_MODULES_KEY = f'{__name__}:PUBLICATION_MODULES'
+FLASK_CONCURRENT_CALL_KEY = f'{__name__}:CONCURRENT_CALL'
+
+_MODULE_FN_DISPATCH = {}
+
+_EXECUTOR = None
+# one slot per thread of the executor, slot is held until the call really ends, even if it timed out
+_EXECUTOR_SLOTS = None
+_EXECUTOR_PID = None
+_EXECUTOR_LOCK = threading.Lock()
+# result of function called by call_fns_concurrently that did not finish in time
+CALL_TIMED_OUT = object()
 
 
 def slugify(value):
@@ -212,37 +229,134 @@ def get_modules_from_names(module_names):
     return modules
 
 
-def call_modules_fn(modules, fn_name, args=None, kwargs=None, omit_duplicate_calls=True, until=None):
+def call_modules_fn(modules, fn_name, args=None, kwargs=None, omit_duplicate_calls=True, until=None, concurrent=False,
+                    timeout=None):
+    """Call function `fn_name` of each module and return results by module.
+
+    With `concurrent=True`, functions are called in parallel, see call_fns_concurrently. It is meant only for read-only
+    functions independent on each other, `until` is not supported and results are still ordered by `modules`.
+    """
     if args is None:
         args = []
     if kwargs is None:
         kwargs = {}
 
     fns = []
+    fn_defs = []
     for m in modules:
-        fn = getattr(m, fn_name, None)
-        if fn is None:
-            raise Exception(
-                f'Module {m.__name__} does not have {fn_name} method.')
-        if fn not in fns or not omit_duplicate_calls:
-            fns.append(fn)
+        fn_def = get_module_fn(m, fn_name)
+        if fn_def.fn not in fns or not omit_duplicate_calls:
+            fns.append(fn_def.fn)
+            fn_defs.append(fn_def)
+
+    if concurrent:
+        assert until is None
+        fn_results = call_fns_concurrently([(fn_def.fn, args, filter_fn_kwargs(fn_def, kwargs)) for fn_def in fn_defs],
+                                           timeout=timeout)
+        return {
+            fn_def.module: res for fn_def, res in zip(fn_defs, fn_results)
+        }
 
     results = dict()
-    for fn in fns:
-        fullargspec = inspect.getfullargspec(fn)
-        fn_arg_names = fullargspec[0]
-        final_kwargs = {
-            k: v for k, v in kwargs.items()
-            if k in fn_arg_names
-        }
-        res = fn(*args, **final_kwargs)
-        results[inspect.getmodule(fn)] = res
+    for fn_def in fn_defs:
+        res = fn_def.fn(*args, **filter_fn_kwargs(fn_def, kwargs))
+        results[fn_def.module] = res
         if until is not None and until(res):
             return results
 
     return results
 
 
+# function of a module resolved for call_modules_fn together with names of its arguments and its owning module
+ModuleFn = namedtuple('ModuleFn', ['fn', 'arg_names', 'module'])
+
+
+def filter_fn_kwargs(fn_def, kwargs):
+    return {
+        k: kwargs[k] for k in fn_def.arg_names.intersection(kwargs)
+    }
+
+
+def get_module_fn(module, fn_name):
+    fn = getattr(module, fn_name, None)
+    if fn is None:
+        raise Exception(
+            f'Module {module.__name__} does not have {fn_name} method.')
+    key = (module, fn_name)
+    fn_def = _MODULE_FN_DISPATCH.get(key)
+    # function can be replaced in the module, e.g. in tests
+    if fn_def is None or fn_def.fn is not fn:
+        fn_def = ModuleFn(fn=fn,
+                          arg_names=frozenset(inspect.getfullargspec(fn)[0]),
+                          module=inspect.getmodule(fn))
+        _MODULE_FN_DISPATCH[key] = fn_def
+    return fn_def
+
+
+def get_executor():
+    global _EXECUTOR, _EXECUTOR_SLOTS, _EXECUTOR_PID
+    # threads are not inherited by forked processes (gunicorn and celery workers)
+    pid = os.getpid()
+    if _EXECUTOR is None or _EXECUTOR_PID != pid:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None or _EXECUTOR_PID != pid:
+                _EXECUTOR = futures.ThreadPoolExecutor(max_workers=settings.LAYMAN_CONCURRENT_CALLS_POOL_SIZE,
+                                                       thread_name_prefix='layman_call')
+                _EXECUTOR_SLOTS = threading.BoundedSemaphore(settings.LAYMAN_CONCURRENT_CALLS_POOL_SIZE)
+                _EXECUTOR_PID = pid
+    return _EXECUTOR, _EXECUTOR_SLOTS
+
+
+def _call_in_app_context(slots, app, fn, args, kwargs):
+    try:
+        # each call has its own application context, e.g. its own DB connection
+        with app.app_context():
+            g.setdefault(FLASK_CONCURRENT_CALL_KEY, True)
+            return fn(*args, **kwargs)
+    finally:
+        slots.release()
+
+
+def _submit_if_free(executor, slots, app, fn, args, kwargs):
+    if not slots.acquire(blocking=False):
+        return None
+    return executor.submit(_call_in_app_context, slots, app, fn, args, kwargs)
+
+
+def call_fns_concurrently(calls, timeout=None):
+    """Call functions in parallel by thread pool of bounded size and return their results in order of `calls`.
+
+    Every call is triple (fn, args, kwargs). Exception raised by any function is re-raised. Result of function not
+    finished within `timeout` seconds is CALL_TIMED_OUT. Such function is not stopped, it keeps running and holding its
+    thread (and e.g. its DB connection) until it ends, so functions should rely on timeouts of their own HTTP calls.
+
+    Calls made from a function that is already called concurrently run sequentially, so that they do not wait for a
+    free thread of the same pool. If there is no free thread in the pool, e.g. because of calls that timed out, the call
+    is made sequentially in the current thread without timeout.
+    """
+    if g.get(FLASK_CONCURRENT_CALL_KEY) or len(calls) <= 1:
+        return [fn(*args, **kwargs) for fn, args, kwargs in calls]
+
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    executor, slots = get_executor()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    call_futures = [_submit_if_free(executor, slots, app, fn, args, kwargs) for fn, args, kwargs in calls]
+    results = [
+        fn(*args, **kwargs) if future is None else None
+        for (fn, args, kwargs), future in zip(calls, call_futures)
+    ]
+    for idx, ((fn, _, _), future) in enumerate(zip(calls, call_futures)):
+        if future is None:
+            continue
+        try:
+            results[idx] = future.result(timeout=max(0, deadline - time.monotonic()) if deadline is not None else None)
+        except futures.TimeoutError:
+            logger.warning(f"Function {fn.__module__}.{fn.__name__} did not finish within {timeout} seconds, "
+                           f"it keeps running.")
+            results[idx] = CALL_TIMED_OUT
+    return results
+
+
 DUMB_MAP_ADAPTER = None
 
 
@@ -301,21 +415,49 @@ def get_publication_info(workspace, publ_type, publ_name, context=None):
         LAYER_TYPE: 'get_layer_info',
         MAP_TYPE: 'get_map_info',
     }[publ_type]
-    partial_infos = call_modules_fn(sources, info_method, [workspace, publ_name])
+    # only read-only requests opt in to parallel calls, see call_fns_concurrently
+    concurrent = context.get('concurrent', False)
+    partial_infos = publication_info_cache.get_partial_infos(workspace, publ_type, publ_name, sources, info_method,
+                                                             concurrent=concurrent,
+                                                             timeout=settings.LAYMAN_PUBLICATION_INFO_SOURCE_TIMEOUT
+                                                             if concurrent else None)
 
     result = {}
-    for pi in partial_infos.values():
-        result.update(pi)
+    timed_out_sources = []
+    for source, pi in partial_infos.items():
+        if pi is CALL_TIMED_OUT:
+            timed_out_sources.append(source.__name__)
+        else:
+            result.update(pi)
+
+    internal_sources = get_publication_types()[publ_type]['internal_sources']
+    for source_name in timed_out_sources:
+        logger.error(f"Source {source_name} did not return info of {publ_type} {workspace}.{publ_name} within "
+                     f"{settings.LAYMAN_PUBLICATION_INFO_SOURCE_TIMEOUT} seconds.")
+        for key in internal_sources[source_name].info_items:
+            result.setdefault(key, {
+                'status': 'NOT_AVAILABLE',
+                'error': f'Internal source {source_name} did not respond in time.',
+            })
 
     if 'actor_name' in context:
         actor = context['actor_name']
-        read_access_users = result.get('access_rights').get('read')
-        if not authz.is_user_in_access_rule(actor, read_access_users):
+        read_access_users = result.get('access_rights', {}).get('read')
+        if read_access_users is None or not authz.is_user_in_access_rule(actor, read_access_users):
             result = {}
 
     return result
 
 
+def invalidate_publication_info(workspace, publ_type, publ_name, source_names=None):
+    """Drop cached partial infos of given internal sources (all by default) of the publication."""
+    if source_names is None:
+        source_names = get_publication_types()[publ_type]['internal_sources'].keys()
+    sources = get_modules_from_names(source_names)
+    source_names = [s.__name__ for s in sources if publication_info_cache.is_source_cached(s)]
+    publication_info_cache.invalidate(workspace, publ_type, publ_name, source_names)
+
+
 def get_publication_infos(workspace=None, publ_type=None, context=None, style_type=None,):
     return get_publication_infos_with_metainfo(workspace=workspace, publ_type=publ_type, context=context, style_type=style_type)['items']
 
@@ -327,6 +469,9 @@ def get_publication_infos_with_metainfo(workspace=None, publ_type=None, context=
                                         order_by_list=None,
                                         ordering_full_text=None,
                                         ordering_bbox=None,
+                                        after=None,
+                                        total_count_mode=get_publications_consts.TOTAL_COUNT_EXACT,
+                                        stream=False,
                                         ):
     from layman.common.prime_db_schema import publications
     context = context or {}
@@ -341,6 +486,9 @@ def get_publication_infos_with_metainfo(workspace=None, publ_type=None, context=
                                                              order_by_list=order_by_list,
                                                              ordering_full_text=ordering_full_text,
                                                              ordering_bbox=ordering_bbox,
+                                                             after=after,
+                                                             total_count_mode=total_count_mode,
+                                                             stream=stream,
                                                              )
 
     return infos
@@ -362,18 +510,18 @@ def delete_publications(user,
     whole_infos = get_publication_infos(user, publ_type, {'actor_name': actor_name, 'access_type': 'write'})
 
     for (_, _, publication) in whole_infos.keys():
-        redis_util.create_lock(user, publ_type, publication, error_code, method)
+        lock_token = redis_util.create_lock(user, publ_type, publication, error_code, method)
         try:
             abort_publication_fn(user, publication)
             delete_publication_fn(user, publication)
             if is_chain_ready_fn(user, publication):
-                redis_util.unlock_publication(user, publ_type, publication)
+                redis_util.unlock_publication(user, publ_type, publication, token=lock_token)
         except Exception as e:
             try:
                 if is_chain_ready_fn(user, publication):
-                    redis_util.unlock_publication(user, publ_type, publication)
+                    redis_util.unlock_publication(user, publ_type, publication, token=lock_token)
             finally:
-                redis_util.unlock_publication(user, publ_type, publication)
+                redis_util.unlock_publication(user, publ_type, publication, token=lock_token)
             raise e
 
     infos = [
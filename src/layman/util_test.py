@@ -1,6 +1,9 @@
 from test import process_client
 import importlib
+import time
+import types
 import pytest
+import flask
 
 from layman.layer import LAYER_TYPE
 from . import app, settings, LaymanError, util
@@ -15,6 +18,98 @@ def test_slugify():
         '01_stanice_vodnich_toku_26_4_2017_voda'
 
 
+def test_get_module_fn():
+    def get_info(workspace, publ_name, extra=None):
+        return workspace, publ_name, extra
+
+    def get_other_info(workspace, publ_name):
+        return workspace, publ_name
+
+    module = types.ModuleType(f'{__name__}.test_get_module_fn')
+    module.get_info = get_info
+    fn_def = util.get_module_fn(module, 'get_info')
+    assert fn_def.fn is get_info
+    assert fn_def.arg_names == {'workspace', 'publ_name', 'extra'}
+    assert util.filter_fn_kwargs(fn_def, {'extra': 'x', 'other': 'y'}) == {'extra': 'x'}
+    assert util.get_module_fn(module, 'get_info') is fn_def
+
+    module.get_info = get_other_info
+    fn_def = util.get_module_fn(module, 'get_info')
+    assert fn_def.fn is get_other_info
+    assert util.filter_fn_kwargs(fn_def, {'extra': 'x'}) == {}
+
+    with pytest.raises(Exception):
+        util.get_module_fn(module, 'get_nothing')
+
+
+def test_call_fns_concurrently():
+    def create_fn(delay, result):
+        def get_info(workspace, publ_name):
+            time.sleep(delay)
+            return {'result': result, 'args': (workspace, publ_name), 'in_call': flask.g.get(util.FLASK_CONCURRENT_CALL_KEY)}
+        return get_info
+
+    delays = [0.6, 0.1, 0.4]
+    calls = [(create_fn(delay, idx), ['ws', 'name'], {}) for idx, delay in enumerate(delays)]
+    with app.app_context():
+        start = time.monotonic()
+        results = util.call_fns_concurrently(calls)
+        duration = time.monotonic() - start
+        assert flask.g.get(util.FLASK_CONCURRENT_CALL_KEY) is None
+    assert duration < sum(delays)
+    assert [r['result'] for r in results] == [0, 1, 2]
+    assert all(r['args'] == ('ws', 'name') and r['in_call'] for r in results)
+
+    with app.app_context():
+        results = util.call_fns_concurrently(calls, timeout=0.3)
+    assert [None if r is util.CALL_TIMED_OUT else r['result'] for r in results] == [None, 1, None]
+
+
+def test_call_fns_concurrently_without_free_thread(monkeypatch):
+    def create_fn(delay, result):
+        def get_info():
+            time.sleep(delay)
+            return result
+        return get_info
+
+    monkeypatch.setattr(settings, 'LAYMAN_CONCURRENT_CALLS_POOL_SIZE', 1)
+    monkeypatch.setattr(util, '_EXECUTOR', None)
+    with app.app_context():
+        # the only thread of the pool is taken by the first call, the second one is called in current thread
+        results = util.call_fns_concurrently([(create_fn(1, 'slow'), [], {}), (create_fn(0, 'fast'), [], {})],
+                                             timeout=0.2)
+        assert results == [util.CALL_TIMED_OUT, 'fast']
+
+        # call that timed out still runs and holds the thread, so next calls do not wait for it and do not time out
+        results = util.call_fns_concurrently([(create_fn(0.1, 'a'), [], {}), (create_fn(0.1, 'b'), [], {})],
+                                             timeout=0.05)
+        assert results == ['a', 'b']
+    time.sleep(1)
+
+
+@pytest.mark.parametrize('concurrent', [True, False])
+def test_get_publication_info_timed_out_source(monkeypatch, concurrent):
+    workspace = 'test_get_publication_info_timed_out_source_workspace'
+    layername = 'test_get_publication_info_timed_out_source_layer'
+    timed_out_source = 'layman.layer.geoserver.wms'
+    called_with = {}
+
+    def get_partial_infos(_workspace, _publ_type, _publ_name, sources, _info_method, concurrent=False, timeout=None):
+        called_with.update({'concurrent': concurrent, 'timeout': timeout})
+        return {
+            source: util.CALL_TIMED_OUT if source.__name__ == timed_out_source else {}
+            for source in sources
+        }
+
+    monkeypatch.setattr(util.publication_info_cache, 'get_partial_infos', get_partial_infos)
+    with app.app_context():
+        info = util.get_publication_info(workspace, LAYER_TYPE, layername, context={'concurrent': concurrent})
+    assert called_with['concurrent'] is concurrent
+    assert (called_with['timeout'] is not None) is concurrent
+    assert info['wms']['status'] == 'NOT_AVAILABLE'
+    assert timed_out_source in info['wms']['error']
+
+
 def test_check_reserved_workspace_names():
     with app.app_context():
         for username in settings.RESERVED_WORKSPACE_NAMES:
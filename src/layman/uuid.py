@@ -163,10 +163,11 @@ def check_redis_consistency(expected_publ_num_by_type=None):
             t for t in task_names_tuples
             if t[1] == username and t[2] == pubname and t[0].startswith(publ_type_name)
         ), None) is None) is is_ready, f"{username}, {publ_type_name}, {pubname}: {is_ready}, {task_names_tuples}"
-        assert (redis.hget(celery_util.TASK_ID_TO_PUBLICATION, chain_info['last'].task_id) is None) is is_ready
+        assert all(redis.hget(celery_util.TASK_ID_TO_PUBLICATION, task_result.task_id) is None
+                   for task_result in chain_info['last_tasks']) is is_ready
 
     # publication locks
-    locks = redis.hgetall(redis_util.PUBLICATION_LOCKS_KEY)
+    locks = redis_util.get_publication_locks()
     assert len(locks) == len(task_names_tuples), f"{locks} != {task_names_tuples}"
     for k, _ in locks.items():
         username, publication_type, publication_name = k.split(':')
@@ -34,6 +34,17 @@ PG_CONN = {
 }
 db.PG_CONN = PG_CONN
 
+LAYMAN_PG_POOL_SIZE = int(os.getenv('LAYMAN_PG_POOL_SIZE', '') or 5)
+LAYMAN_PG_POOL_MAX_OVERFLOW = int(os.getenv('LAYMAN_PG_POOL_MAX_OVERFLOW', '') or 10)
+LAYMAN_PG_POOL_TIMEOUT = int(os.getenv('LAYMAN_PG_POOL_TIMEOUT', '') or 30)
+
+PG_POOL = {
+    'size': LAYMAN_PG_POOL_SIZE,
+    'max_overflow': LAYMAN_PG_POOL_MAX_OVERFLOW,
+    'timeout': LAYMAN_PG_POOL_TIMEOUT,
+}
+db.PG_POOL = PG_POOL
+
 GEOSERVER_ADMIN_USER = 'admin'
 GEOSERVER_ADMIN_PASSWORD = os.getenv('GEOSERVER_ADMIN_PASSWORD', None)
 GEOSERVER_ADMIN_AUTH = None if GEOSERVER_ADMIN_PASSWORD is None else (GEOSERVER_ADMIN_USER,
@@ -55,6 +66,17 @@ LAYMAN_GS_URL = f"http://{LAYMAN_GS_HOST}:{LAYMAN_GS_PORT}{LAYMAN_GS_PATH}"
 geoserver.set_settings(LAYMAN_GS_URL, LAYMAN_GS_ROLE_SERVICE, LAYMAN_GS_USER_GROUP_SERVICE, )
 geoserver.GS_AUTH = LAYMAN_GS_AUTH
 
+LAYMAN_GS_HTTP_POOL_SIZE = int(os.getenv('LAYMAN_GS_HTTP_POOL_SIZE', '') or 10)
+LAYMAN_GS_HTTP_RETRIES = int(os.getenv('LAYMAN_GS_HTTP_RETRIES', '') or 3)
+LAYMAN_GS_HTTP_BACKOFF_FACTOR = float(os.getenv('LAYMAN_GS_HTTP_BACKOFF_FACTOR', '') or 0.5)
+
+GS_HTTP_POOL = {
+    'size': LAYMAN_GS_HTTP_POOL_SIZE,
+    'retries': LAYMAN_GS_HTTP_RETRIES,
+    'backoff_factor': LAYMAN_GS_HTTP_BACKOFF_FACTOR,
+}
+geoserver.GS_HTTP_POOL = GS_HTTP_POOL
+
 LAYMAN_GS_ROLE = os.environ['LAYMAN_GS_ROLE']
 
 LAYMAN_GS_AUTHN_HTTP_HEADER_NAME = 'laymanHttpHeader'
@@ -161,10 +183,26 @@ if RIGHTS_EVERYONE_ROLE not in GRANT_PUBLISH_IN_PUBLIC_WORKSPACE:
 
 # UPLOAD_MAX_INACTIVITY_TIME = 10 # 10 seconds
 UPLOAD_MAX_INACTIVITY_TIME = 5 * 60  # 5 minutes
+# how often (in seconds) uploads are checked for UPLOAD_MAX_INACTIVITY_TIME
+UPLOAD_SWEEP_INTERVAL = 30
+
+LAYMAN_WFST_REFRESH_DEBOUNCE_TIME = int(os.getenv('LAYMAN_WFST_REFRESH_DEBOUNCE_TIME', '') or 5)
+LAYMAN_WFST_REFRESH_MAX_DELAY = int(os.getenv('LAYMAN_WFST_REFRESH_MAX_DELAY', '') or 60)
+
+LAYMAN_PUBLICATION_LOCK_TIMEOUT = int(os.getenv('LAYMAN_PUBLICATION_LOCK_TIMEOUT', '') or 60 * 60)
+
+LAYMAN_CONCURRENT_CALLS_POOL_SIZE = int(os.getenv('LAYMAN_CONCURRENT_CALLS_POOL_SIZE', '') or 8)
+LAYMAN_PUBLICATION_INFO_SOURCE_TIMEOUT = int(os.getenv('LAYMAN_PUBLICATION_INFO_SOURCE_TIMEOUT', '') or 15)
 
 # max time (in seconds) to cache GeoServer's requests like WMS capabilities
 LAYMAN_CACHE_GS_TIMEOUT = 1 * 60  # 1 minute
 
+# max time (in seconds) to cache partial infos of publications; they are also invalidated on every change
+LAYMAN_CACHE_PUBLICATION_INFO_TIMEOUT = 60 * 60  # 1 hour
+# max time (in seconds) to cache partial infos of publications read from GeoServer or Micka, that can be changed also
+# outside of Layman
+LAYMAN_CACHE_EXTERNAL_PUBLICATION_INFO_TIMEOUT = 1 * 60  # 1 minute
+
 LAYMAN_REDIS_URL = os.environ['LAYMAN_REDIS_URL']
 
 LAYMAN_REDIS = redis.Redis.from_url(LAYMAN_REDIS_URL, encoding="utf-8", decode_responses=True)
@@ -8,7 +8,7 @@ from collections import namedtuple
 import xml.etree.ElementTree as ET
 import requests
 
-from layman import app
+from layman import app, celery as celery_util
 from layman.layer.geoserver import wfs, wms
 from layman.http import LaymanError
 from .util import url_for
@@ -95,6 +95,19 @@ def wait_for_rest(url, max_attempts, sleeping_time, check_response, headers=None
             raise Exception('Max attempts reached!')
 
 
+def wait_for_publication_chain(publication_type, workspace, name, max_attempts=120, sleeping_time=0.5):
+    with app.app_context():
+        for _ in range(max_attempts):
+            chain_info = celery_util.get_publication_chain_info_dict(workspace, publication_type, name)
+            if chain_info is None or chain_info['finished']:
+                return
+            time.sleep(sleeping_time)
+    raise Exception('Max attempts reached!')
+
+
+wait_for_workspace_layer_chain = partial(wait_for_publication_chain, LAYER_TYPE)
+
+
 def raise_layman_error(response, status_codes_to_skip=None):
     status_codes_to_skip = status_codes_to_skip or set()
     status_codes_to_skip.add(200)
@@ -163,8 +176,8 @@ def patch_workspace_publication(publication_type,
                       workspace=workspace,
                       **{publication_type_def.url_param_name: name})
     wait_for_rest(url, 30, 0.5, check_response_fn, headers=headers)
-    wfs.clear_cache(workspace)
-    wms.clear_cache(workspace)
+    wfs.clear_cache(workspace, name)
+    wms.clear_cache(workspace, name)
     return r.json()
 
 
@@ -336,9 +349,12 @@ def finish_delete(workspace, url, headers, skip_404=False, ):
     r = requests.delete(url, headers=headers)
     status_codes_to_skip = {404} if skip_404 else set()
     raise_layman_error(r, status_codes_to_skip)
-    wfs.clear_cache(workspace)
-    wms.clear_cache(workspace)
-    return r.json()
+    result = r.json()
+    if r.status_code == 200:
+        for publication in (result if isinstance(result, list) else [result]):
+            wfs.clear_cache(workspace, publication['name'])
+            wms.clear_cache(workspace, publication['name'])
+    return result
 
 
 def delete_workspace_publication(publication_type, workspace, name, *, headers=None, skip_404=False, ):
@@ -82,7 +82,7 @@ def assert_same_bboxes(bbox1, bbox2, precision):
 def assert_wfs_bbox(workspace, layer, expected_bbox):
     wfs_layer = f"{workspace}:{layer}"
     with app.app_context():
-        wfs_get_capabilities = wfs.get_wfs_proxy(workspace)
+        wfs_get_capabilities = wfs.get_wfs_proxy(workspace, layer)
     wfs_bbox_4326 = wfs_get_capabilities.contents[wfs_layer].boundingBoxWGS84
     with app.app_context():
         wfs_bbox_3857 = bbox_util.transform(wfs_bbox_4326, 4326, 3857, )
@@ -91,7 +91,7 @@ def assert_wfs_bbox(workspace, layer, expected_bbox):
 
 def assert_wms_bbox(workspace, layer, expected_bbox):
     with app.app_context():
-        wms_get_capabilities = wms.get_wms_proxy(workspace)
+        wms_get_capabilities = wms.get_wms_proxy(workspace, layer)
     wms_layer = wms_get_capabilities.contents[layer]
     bbox_3857 = next(bbox[:4] for bbox in wms_layer.crs_list if bbox[4] == 'EPSG:3857')
     assert_same_bboxes(expected_bbox, bbox_3857, 0.00001)